@@ -0,0 +1,179 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+from .metricas import Contador
+
+# ---------- Caché de interpretaciones del modelo ----------
+# Guarda la salida cruda de Gemini (antes del postproceso) indexada por el contenido del texto,
+# el modelo y la versión del prompt. Los campos relativos al tiempo se limpian al guardar para
+# que postproceso_modelo los recalcule siempre contra la fecha de la petición.
+
+def normalizar_texto(texto: str) -> str:
+    """Normaliza el texto para la llave: Unicode NFC y espacios colapsados."""
+    t = unicodedata.normalize("NFC", texto or "")
+    return " ".join(t.split())
+
+def clave_cache(texto: str, model_name: str, system_instructions: str) -> str:
+    h_prompt = hashlib.sha256(system_instructions.encode("utf-8")).hexdigest()
+    base = "\x1f".join([normalizar_texto(texto), model_name, h_prompt])
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()
+
+def _sin_campos_temporales(interpretacion: Dict[str, Any]) -> Dict[str, Any]:
+    v = (interpretacion.get("detalles") or {}).get("ventana_entrega")
+    if isinstance(v, dict):
+        v["inicio_iso"] = None
+        v["fin_iso"] = None
+    return interpretacion
+
+
+class CacheInterpretaciones:
+    """
+    Interfaz común de los backends. Los valores se guardan serializados en JSON, así cada
+    lectura devuelve una copia nueva que el postproceso puede mutar sin afectar la caché.
+    """
+
+    def __init__(self, max_entradas: int = 1000, ttl_s: float = 3600):
+        self.max_entradas = max_entradas
+        self.ttl_s = ttl_s
+        # En el almacén de métricas: con varios workers el hit rate es el de todos los procesos
+        self._consultas = Contador("interprete_cache_total", "Consultas a la caché del modelo por resultado.", ("resultado",))
+
+    @property
+    def hits(self) -> int:
+        return self._consultas.valor("hit")
+
+    @property
+    def misses(self) -> int:
+        return self._consultas.valor("miss")
+
+    def obtener(self, clave: str) -> Optional[Dict[str, Any]]:
+        raw = self._leer(clave)
+        if raw is None:
+            self._consultas.incrementar("miss")
+            return None
+        self._consultas.incrementar("hit")
+        return json.loads(raw)
+
+    def guardar(self, clave: str, interpretacion: Dict[str, Any]) -> None:
+        raw = json.dumps(_sin_campos_temporales(json.loads(json.dumps(interpretacion))), ensure_ascii=False)
+        self._escribir(clave, raw)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "backend": type(self).__name__,
+            "entradas": self._tamano(),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+        }
+
+    # Métodos que implementa cada backend
+    def _leer(self, clave: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def _escribir(self, clave: str, raw: str) -> None:
+        raise NotImplementedError
+
+    def _tamano(self) -> int:
+        raise NotImplementedError
+
+
+class CacheMemoria(CacheInterpretaciones):
+    """LRU + TTL en memoria del proceso."""
+
+    def __init__(self, max_entradas: int = 1000, ttl_s: float = 3600, reloj=time.monotonic):
+        super().__init__(max_entradas, ttl_s)
+        self._reloj = reloj
+        self._datos: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _leer(self, clave: str) -> Optional[str]:
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            expira, raw = entrada
+            if expira < self._reloj():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return raw
+
+    def _escribir(self, clave: str, raw: str) -> None:
+        with self._lock:
+            self._datos[clave] = (self._reloj() + self.ttl_s, raw)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def _tamano(self) -> int:
+        return len(self._datos)
+
+
+class CacheSQLite(CacheInterpretaciones):
+    """LRU + TTL en un archivo SQLite; sobrevive a reinicios del contenedor."""
+
+    def __init__(self, ruta: str, max_entradas: int = 1000, ttl_s: float = 3600, reloj=time.time):
+        super().__init__(max_entradas, ttl_s)
+        self._reloj = reloj  # reloj de pared: las marcas se comparten entre procesos
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS interpretaciones ("
+            " clave TEXT PRIMARY KEY, valor TEXT NOT NULL,"
+            " expira REAL NOT NULL, ultimo_uso REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ultimo_uso ON interpretaciones(ultimo_uso)")
+
+    def _leer(self, clave: str) -> Optional[str]:
+        ahora = self._reloj()
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT valor, expira FROM interpretaciones WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is None:
+                return None
+            if fila[1] < ahora:
+                self._conn.execute("DELETE FROM interpretaciones WHERE clave = ?", (clave,))
+                return None
+            self._conn.execute("UPDATE interpretaciones SET ultimo_uso = ? WHERE clave = ?", (ahora, clave))
+            return fila[0]
+
+    def _escribir(self, clave: str, raw: str) -> None:
+        ahora = self._reloj()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO interpretaciones (clave, valor, expira, ultimo_uso) VALUES (?, ?, ?, ?)",
+                (clave, raw, ahora + self.ttl_s, ahora),
+            )
+            # Expulsa vencidas y, si seguimos sobre el límite, las menos usadas
+            self._conn.execute("DELETE FROM interpretaciones WHERE expira < ?", (ahora,))
+            self._conn.execute(
+                "DELETE FROM interpretaciones WHERE clave IN ("
+                " SELECT clave FROM interpretaciones ORDER BY ultimo_uso DESC LIMIT -1 OFFSET ?)",
+                (self.max_entradas,),
+            )
+
+    def _tamano(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM interpretaciones").fetchone()[0]
+
+
+def crear_cache(backend: str, max_entradas: int, ttl_s: float, ruta_sqlite: str) -> Optional[CacheInterpretaciones]:
+    """Construye el backend indicado ("memoria", "sqlite" o "ninguno")."""
+    backend = (backend or "").lower()
+    if backend == "memoria":
+        return CacheMemoria(max_entradas, ttl_s)
+    if backend == "sqlite":
+        return CacheSQLite(ruta_sqlite, max_entradas, ttl_s)
+    return None
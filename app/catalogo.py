@@ -0,0 +1,166 @@
+import os
+import re
+import json
+import unicodedata
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+# ---------- Catálogo de productos e índice de coincidencias ----------
+# El catálogo se carga de un archivo JSON y se compila una sola vez en:
+#   - un mapa hash de sinónimos plegados (sin tildes, minúsculas) -> producto
+#   - un trie por tokens para encontrar todos los items del texto en una sola pasada;
+#     cada paso es un lookup en dict, así que el costo depende del largo del texto y no
+#     del tamaño del catálogo.
+
+CATALOGO_PATH = os.getenv("CATALOGO_PATH", str(Path(__file__).resolve().parent / "data" / "catalogo.json"))
+
+# Plegado de tildes que conserva la longitud (índices del texto plegado == índices del original)
+_TABLA_PLEGADO = {
+    cp: unicodedata.normalize("NFD", chr(cp))[0].lower()
+    for cp in range(0xC0, 0x250)
+    if len(unicodedata.normalize("NFD", chr(cp))) > 1
+}
+_RE_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Unidades explícitas que pueden ir entre la cantidad y el producto ("5 litros de chocolate")
+UNIDADES = {
+    "unidad": "unidad", "unidades": "unidad", "und": "unidad", "unds": "unidad",
+    "docena": "docena", "docenas": "docena",
+    "kg": "kg", "kilo": "kg", "kilos": "kg", "kilogramo": "kg", "kilogramos": "kg",
+    "g": "g", "gr": "g", "gramos": "g",
+    "litro": "litro", "litros": "litro", "lt": "litro", "l": "litro",
+    "bandeja": "bandeja", "bandejas": "bandeja",
+    "paquete": "paquete", "paquetes": "paquete",
+    "caja": "caja", "cajas": "caja",
+    "bolsa": "bolsa", "bolsas": "bolsa",
+    "porcion": "porción", "porciones": "porción",
+}
+_CONECTORES = {"de", "del"}
+_FIN = ""  # llave del nodo terminal en el trie
+
+
+def plegar(texto: str) -> str:
+    """Minúsculas y sin tildes/diéresis/ñ (ñ -> n), conservando la longitud del texto."""
+    bajo = texto.lower()
+    return bajo.translate(_TABLA_PLEGADO) if len(bajo) == len(texto) else texto.translate(_TABLA_PLEGADO).lower()
+
+
+def _variantes(frase: str) -> List[str]:
+    """La frase y su singular/plural simple (solo sobre el último token)."""
+    toks = frase.split()
+    if not toks:
+        return []
+    ultimo = toks[-1]
+    extra = [ultimo[:-1]] if ultimo.endswith("s") and len(ultimo) > 3 else [ultimo + "s"]
+    return [frase] + [" ".join(toks[:-1] + [e]) for e in extra]
+
+
+class Catalogo:
+    def __init__(self, productos: List[Dict[str, Any]]):
+        self.productos: Dict[str, Dict[str, Any]] = {}
+        self._por_sinonimo: Dict[str, Dict[str, Any]] = {}
+        self._trie: Dict[str, Any] = {}
+        for p in productos:
+            self.productos[p["sku"]] = p
+            # El nombre canónico y los sinónimos explícitos tienen prioridad sobre las variantes generadas
+            explicitas = [p["nombre"]] + list(p.get("sinonimos", []))
+            for frase in explicitas:
+                self._indexar(plegar(frase), p, forzar=True)
+            for frase in explicitas:
+                for v in _variantes(plegar(frase))[1:]:
+                    self._indexar(v, p, forzar=False)
+
+    def _indexar(self, frase: str, producto: Dict[str, Any], forzar: bool) -> None:
+        toks = _RE_TOKEN.findall(frase)
+        if not toks:
+            return
+        clave = " ".join(toks)
+        if not forzar and clave in self._por_sinonimo:
+            return
+        self._por_sinonimo[clave] = producto
+        nodo = self._trie
+        for t in toks:
+            nodo = nodo.setdefault(t, {})
+        nodo[_FIN] = producto
+
+    def sinonimos(self) -> Dict[str, List[str]]:
+        return {p["nombre"]: list(p.get("sinonimos", [])) for p in self.productos.values()}
+
+    def _coincidencia_mas_larga(self, toks: List[str], i: int) -> Tuple[Optional[Dict[str, Any]], int]:
+        """Producto de la frase más larga del trie que empieza en toks[i] y el índice donde termina."""
+        nodo, mejor, fin = self._trie, None, i
+        j = i
+        while j < len(toks):
+            nodo = nodo.get(toks[j])
+            if nodo is None:
+                break
+            j += 1
+            if _FIN in nodo:
+                mejor, fin = nodo[_FIN], j
+        return mejor, fin
+
+    def buscar(self, nombre: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Producto para un nombre: lookup exacto del sinónimo o, tras cantidad/unidad ("docena de
+        pandebonos"), una frase del trie que cubra el resto del nombre. Una mención parcial no
+        cuenta ("galletas de queso" no es "galletas"): sin SKU el pedido queda con advertencia.
+        """
+        if not nombre:
+            return None
+        toks = _RE_TOKEN.findall(plegar(nombre))
+        producto = self._por_sinonimo.get(" ".join(toks))
+        if producto is not None:
+            return producto
+        i, n = 0, len(toks)
+        while i < n and (toks[i].isdigit() or toks[i] in UNIDADES or toks[i] in _CONECTORES):
+            i += 1
+        producto, fin = self._coincidencia_mas_larga(toks, i) if i < n else (None, i)
+        return producto if fin == n else None
+
+    def extraer_items(self, texto: str) -> List[Dict[str, Any]]:
+        """
+        Items "cantidad [unidad] [de] producto" del texto, en una sola pasada de tokens.
+        Solo se cuentan productos precedidos por una cantidad (p. ej. "reemplazar por pan de yuca" no es item).
+        """
+        plegado = plegar(texto)
+        spans = [(m.group(0), m.start(), m.end()) for m in _RE_TOKEN.finditer(plegado)]
+        toks = [s[0] for s in spans]
+        items: List[Dict[str, Any]] = []
+        i, n = 0, len(toks)
+        while i < n:
+            if not toks[i].isdigit():
+                i += 1
+                continue
+            cantidad = int(toks[i])
+            j = i + 1
+            unidad = None
+            if j < n and toks[j] in UNIDADES:
+                unidad = UNIDADES[toks[j]]
+                j += 1
+            while j < n and toks[j] in _CONECTORES:
+                j += 1
+            producto, fin = self._coincidencia_mas_larga(toks, j) if j < n else (None, j)
+            if producto is None:
+                i += 1
+                continue
+            items.append({
+                "sku": producto["sku"],
+                "nombre_detectado": texto[spans[j][1]:spans[fin - 1][2]],
+                "nombre_normalizado": producto["nombre"],
+                "cantidad": cantidad,
+                "unidad": unidad or producto.get("unidad") or "unidad",
+                "peso_kg": None,
+                "volumen_m3": None,
+                "nivel_confianza": 0.9,
+            })
+            i = fin
+        return items
+
+
+def cargar_catalogo(ruta: str = CATALOGO_PATH) -> Catalogo:
+    with open(ruta, encoding="utf-8") as f:
+        datos = json.load(f)
+    return Catalogo(datos.get("productos", []))
+
+
+CATALOGO = cargar_catalogo()
@@ -0,0 +1,308 @@
+import os
+import time
+import fcntl
+import struct
+import asyncio
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional, Callable, Awaitable, Any
+
+from .metricas import Contador
+
+# ---------- Cliente resiliente del modelo ----------
+# Envuelve cada llamada a Gemini con:
+#  - circuit breaker: tras N fallos seguidos deja de llamar al modelo durante un enfriamiento y las
+#    peticiones van directo al fallback local; después deja pasar una sola llamada de prueba.
+#  - token bucket ajustado a la cuota (RPM), compartido entre workers si hay estado compartido.
+#    Es adaptativo: un 429/ResourceExhausted baja la tasa a la mitad y cada éxito la recupera de a poco.
+#  - cobertura (hedging) opcional: si la llamada pasa del p95 observado se lanza una segunda y se
+#    usa la primera que responda.
+
+CERRADO, ABIERTO, SEMIABIERTO = "cerrado", "abierto", "semiabierto"
+
+COBERTURAS = Contador("interprete_modelo_coberturas_total", "Llamadas de cobertura al modelo por resultado.", ("resultado",))
+
+
+class ModeloNoDisponible(Exception):
+    """La llamada no se hizo: circuito abierto o sin cupo en el limitador."""
+
+    def __init__(self, motivo: str):
+        super().__init__(motivo)
+        self.motivo = motivo
+
+
+def es_cuota_excedida(e: BaseException) -> bool:
+    return type(e).__name__ in ("ResourceExhausted", "TooManyRequests") or "429" in str(e)
+
+
+class Circuito:
+    def __init__(self, umbral_fallos: int = 5, enfriamiento_s: float = 30.0, reloj: Callable[[], float] = time.monotonic):
+        self.umbral_fallos = umbral_fallos
+        self.enfriamiento_s = enfriamiento_s
+        self._reloj = reloj
+        self.estado = CERRADO
+        self.fallos_seguidos = 0
+        self.aperturas = 0
+        self._abierto_desde = 0.0
+        self._prueba_en_vuelo = False
+
+    def admitir(self) -> bool:
+        if self.estado == CERRADO:
+            return True
+        if self.estado == ABIERTO and self._reloj() - self._abierto_desde >= self.enfriamiento_s:
+            self.estado = SEMIABIERTO
+        if self.estado == SEMIABIERTO and not self._prueba_en_vuelo:
+            self._prueba_en_vuelo = True
+            return True
+        return False
+
+    def exito(self) -> None:
+        self.estado = CERRADO
+        self.fallos_seguidos = 0
+        self._prueba_en_vuelo = False
+
+    def fallo(self) -> None:
+        self.fallos_seguidos += 1
+        self._prueba_en_vuelo = False
+        if self.estado == SEMIABIERTO or self.fallos_seguidos >= self.umbral_fallos:
+            if self.estado != ABIERTO:
+                self.aperturas += 1
+            self.estado = ABIERTO
+            self._abierto_desde = self._reloj()
+
+    def liberar(self) -> None:
+        """La llamada se canceló sin resultado: no cambia el estado, solo libera la prueba."""
+        self._prueba_en_vuelo = False
+
+
+class LimitadorTokens:
+    """
+    Token bucket de `tasa_por_s` con ráfaga `rafaga`. Con `ruta` el estado (tokens, último
+    relleno, tasa actual) vive en un archivo bloqueado con fcntl y lo comparten todos los workers.
+    Los métodos async no bloquean el event loop: si otro worker tiene el archivo, ceden y reintentan.
+    """
+
+    _ESTADO = struct.Struct("<ddd")
+
+    def __init__(self, tasa_por_s: float, rafaga: float, ruta: Optional[str] = None, tasa_min_fraccion: float = 0.1,
+                 reloj: Callable[[], float] = time.time, espera_lock_s: float = 0.001):
+        self.tasa_base = tasa_por_s
+        self.rafaga = rafaga
+        self.tasa_min = tasa_por_s * tasa_min_fraccion
+        self.espera_lock_s = espera_lock_s
+        self._reloj = reloj
+        self._lock = threading.Lock()
+        self._estado = [rafaga, reloj(), tasa_por_s]
+        self._fd: Optional[int] = None
+        if ruta:
+            # Abierto una vez: cada operación es lockf + pread/pwrite de 24 bytes
+            self._fd = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            if len(os.pread(self._fd, self._ESTADO.size, 0)) < self._ESTADO.size:
+                os.pwrite(self._fd, self._ESTADO.pack(*self._estado), 0)
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def _actualizar(self, fn):
+        """Aplica fn(estado) -> resultado sobre el estado rellenado, en exclusión mutua (bloqueante)."""
+        with self._lock:
+            if self._fd is None:
+                return self._rellenar_y(self._estado, fn)
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                return self._en_archivo(fn)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    async def _actualizar_async(self, fn):
+        """Como _actualizar, sin bloquear el loop: el lock del archivo se pide con LOCK_NB."""
+        if self._fd is None:
+            return self._actualizar(fn)
+        while True:
+            with self._lock:
+                try:
+                    fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except (BlockingIOError, PermissionError):  # EAGAIN/EACCES: lo tiene otro worker
+                    pass
+                else:
+                    try:
+                        return self._en_archivo(fn)
+                    finally:
+                        fcntl.lockf(self._fd, fcntl.LOCK_UN)
+            await asyncio.sleep(self.espera_lock_s)
+
+    def _en_archivo(self, fn):
+        estado = list(self._ESTADO.unpack(os.pread(self._fd, self._ESTADO.size, 0)))
+        resultado = self._rellenar_y(estado, fn)
+        os.pwrite(self._fd, self._ESTADO.pack(*estado), 0)
+        return resultado
+
+    def _rellenar_y(self, estado: list, fn):
+        ahora = self._reloj()
+        tokens, ultimo, tasa = estado
+        estado[0] = min(self.rafaga, tokens + (ahora - ultimo) * tasa)
+        estado[1] = ahora
+        return fn(estado)
+
+    async def intentar(self) -> float:
+        """Toma un token si hay; si no, retorna los segundos que faltan para el siguiente (0 = tomado)."""
+        def tomar(estado):
+            if estado[0] >= 1:
+                estado[0] -= 1
+                return 0.0
+            return (1 - estado[0]) / estado[2]
+        return await self._actualizar_async(tomar)
+
+    async def adquirir(self, espera_max_s: float) -> bool:
+        limite = time.monotonic() + espera_max_s
+        while True:
+            falta = await self.intentar()
+            if falta == 0.0:
+                return True
+            if time.monotonic() + falta > limite:
+                return False
+            await asyncio.sleep(falta)
+
+    async def penalizar(self) -> None:
+        """429 de la API: la cuota real es menor de lo configurado, baja la tasa a la mitad."""
+        def bajar(estado):
+            estado[2] = max(self.tasa_min, estado[2] / 2)
+        await self._actualizar_async(bajar)
+
+    async def recuperar(self) -> None:
+        def subir(estado):
+            if estado[2] < self.tasa_base:
+                estado[2] = min(self.tasa_base, estado[2] + self.tasa_base * 0.05)
+        await self._actualizar_async(subir)
+
+    @property
+    def tasa_actual(self) -> float:
+        return self._actualizar(lambda estado: estado[2])
+
+
+class ClienteModelo:
+    def __init__(
+        self,
+        circuito: Circuito,
+        limitador: Optional[LimitadorTokens] = None,
+        espera_cuota_s: float = 0.5,
+        cobertura: bool = False,
+        percentil_cobertura: float = 95,
+        min_muestras_cobertura: int = 20,
+        retraso_min_cobertura_s: float = 0.05,
+    ):
+        self.circuito = circuito
+        self.limitador = limitador
+        self.espera_cuota_s = espera_cuota_s
+        self.cobertura = cobertura
+        self.percentil_cobertura = percentil_cobertura
+        self.min_muestras_cobertura = min_muestras_cobertura
+        self.retraso_min_cobertura_s = retraso_min_cobertura_s
+        self._latencias: deque = deque(maxlen=500)
+        self._retraso_cache: Optional[float] = None
+        self._nuevas_desde_calculo = 0
+
+    # ---------- Admisión y resultado ----------
+    @asynccontextmanager
+    async def sesion(self):
+        """
+        Admite una llamada (circuito + cuota) y registra su resultado al salir. Lanza
+        ModeloNoDisponible si no se debe llamar. Un ValueError (JSON inválido) no cuenta como
+        caída del modelo: respondió, solo que mal.
+        """
+        if not self.circuito.admitir():
+            raise ModeloNoDisponible("circuito_abierto")
+        if self.limitador is not None and not await self.limitador.adquirir(self.espera_cuota_s):
+            self.circuito.liberar()
+            raise ModeloNoDisponible("limite_cuota")
+        try:
+            yield self
+        except asyncio.CancelledError:
+            self.circuito.liberar()
+            raise
+        except ValueError:
+            await self._exito()
+            raise
+        except Exception as e:
+            self.circuito.fallo()
+            if self.limitador is not None and es_cuota_excedida(e):
+                await self.limitador.penalizar()
+            raise
+        else:
+            await self._exito()
+
+    async def _exito(self) -> None:
+        self.circuito.exito()
+        if self.limitador is not None:
+            await self.limitador.recuperar()
+
+    def estadisticas(self) -> dict:
+        retraso = self.retraso_cobertura() if self.cobertura else None
+        coberturas = {"lanzadas": 0, "ganadas": 0}
+        coberturas.update({r: v for (r,), v in COBERTURAS.valores().items()})
+        return {
+            "circuito": {
+                "estado": self.circuito.estado,
+                "fallos_seguidos": self.circuito.fallos_seguidos,
+                "aperturas": self.circuito.aperturas,
+            },
+            "cuota": None if self.limitador is None else {
+                "rpm_configurada": round(self.limitador.tasa_base * 60, 2),
+                "rpm_actual": round(self.limitador.tasa_actual * 60, 2),
+                "rafaga": self.limitador.rafaga,
+            },
+            "cobertura": {
+                "habilitada": self.cobertura,
+                "retraso_ms": None if retraso is None else round(retraso * 1000, 1),
+                **coberturas,
+            },
+        }
+
+    # ---------- Cobertura (hedging) ----------
+    def _registrar_latencia(self, segundos: float) -> None:
+        self._latencias.append(segundos)
+        self._nuevas_desde_calculo += 1
+
+    def retraso_cobertura(self) -> Optional[float]:
+        """Percentil configurado de las latencias recientes; None si aún no hay muestras suficientes."""
+        if len(self._latencias) < self.min_muestras_cobertura:
+            return None
+        if self._retraso_cache is None or self._nuevas_desde_calculo >= 20:
+            orden = sorted(self._latencias)
+            k = min(len(orden) - 1, int(self.percentil_cobertura / 100.0 * len(orden)))
+            self._retraso_cache = max(self.retraso_min_cobertura_s, orden[k])
+            self._nuevas_desde_calculo = 0
+        return self._retraso_cache
+
+    async def llamar(self, llamada: Callable[[], Awaitable[Any]]) -> Any:
+        """Ejecuta la llamada; con cobertura activa lanza una segunda si la primera tarda más del p95."""
+        t0 = time.perf_counter()
+        retraso = self.retraso_cobertura() if self.cobertura else None
+        if retraso is None:
+            resp = await llamada()
+            self._registrar_latencia(time.perf_counter() - t0)
+            return resp
+
+        primera = asyncio.ensure_future(llamada())
+        tareas = [primera]
+        try:
+            hechas, _ = await asyncio.wait({primera}, timeout=retraso)
+            if not hechas and (self.limitador is None or await self.limitador.intentar() == 0.0):
+                COBERTURAS.incrementar("lanzadas")
+                tareas.append(asyncio.ensure_future(llamada()))
+            pendientes = set(tareas)
+            error: Optional[BaseException] = None
+            while pendientes:
+                hechas, pendientes = await asyncio.wait(pendientes, return_when=asyncio.FIRST_COMPLETED)
+                for t in hechas:
+                    if t.exception() is None:
+                        if t is not primera:
+                            COBERTURAS.incrementar("ganadas")
+                        self._registrar_latencia(time.perf_counter() - t0)
+                        return t.result()
+                    error = t.exception()
+            raise error
+        finally:
+            for t in tareas:
+                if not t.done():
+                    t.cancel()
@@ -0,0 +1,155 @@
+import os
+import mmap
+import struct
+import threading
+from typing import Dict, Optional
+
+# ---------- Estado compartido entre procesos ----------
+# Con varios workers (python -m app.servidor) cada proceso tiene su propia memoria. Los contadores
+# y histogramas se guardan entonces en un archivo mmap por proceso dentro de ESTADO_COMPARTIDO_DIR:
+# cada proceso solo escribe el suyo (sin locks entre procesos) y al leer se suman todos los archivos,
+# incluidos los de workers que ya terminaron, así las métricas no se reparten entre workers.
+# Sin ESTADO_COMPARTIDO_DIR (un solo proceso) los valores quedan en una lista en memoria.
+
+DIRECTORIO_COMPARTIDO = os.getenv("ESTADO_COMPARTIDO_DIR") or None
+
+# Archivo de valores: [u64 bytes usados] y luego entradas [u32 largo][clave utf-8][relleno a 8][f64 valor]
+_CABECERA = struct.Struct("<Q")
+_LARGO = struct.Struct("<I")
+_VALOR = struct.Struct("<d")
+_TAMANO_INICIAL = 64 * 1024
+
+
+def _numero(v: float):
+    return int(v) if float(v).is_integer() else v
+
+
+def nombre_proceso() -> str:
+    """Identificador del proceso actual dentro del directorio compartido."""
+    return f"w{os.getpid()}"
+
+
+class AlmacenLocal:
+    """Valores numéricos por clave en memoria del proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ranuras: Dict[str, int] = {}
+        self._valores: list = []
+
+    def ranura(self, clave: str) -> int:
+        r = self._ranuras.get(clave)
+        if r is None:
+            with self._lock:
+                r = self._ranuras.get(clave)
+                if r is None:
+                    self._valores.append(0.0)
+                    r = self._ranuras[clave] = len(self._valores) - 1
+        return r
+
+    # Las sumas se hacen sin lock, igual que los contadores en proceso de antes: se llaman desde el
+    # event loop y una carrera con un hilo del threadpool a lo sumo pierde una observación.
+    def sumar(self, ranura: int, delta: float) -> None:
+        self._valores[ranura] += delta
+
+    def observar(self, ranura_bucket: int, ranura_suma: int, ranura_total: int, valor: float) -> None:
+        v = self._valores
+        v[ranura_bucket] += 1
+        v[ranura_suma] += valor
+        v[ranura_total] += 1
+
+    def valores(self, prefijo: str = "") -> Dict[str, float]:
+        with self._lock:
+            return {k: _numero(self._valores[r]) for k, r in self._ranuras.items() if k.startswith(prefijo)}
+
+
+class AlmacenCompartido:
+    """Valores numéricos por clave en un archivo mmap del proceso; la lectura suma los de todos."""
+
+    def __init__(self, directorio: str):
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+        self._ruta = os.path.join(directorio, f"valores-{nombre_proceso()}.bin")
+        self._lock = threading.Lock()
+        self._ranuras: Dict[str, int] = {}
+        self._archivo = open(self._ruta, "w+b")
+        self._archivo.truncate(_TAMANO_INICIAL)
+        self._mm = mmap.mmap(self._archivo.fileno(), _TAMANO_INICIAL)
+        self._usado = _CABECERA.size
+        _CABECERA.pack_into(self._mm, 0, self._usado)
+
+    def ranura(self, clave: str) -> int:
+        r = self._ranuras.get(clave)
+        if r is not None:
+            return r
+        with self._lock:
+            r = self._ranuras.get(clave)
+            if r is not None:
+                return r
+            datos = clave.encode("utf-8")
+            inicio_valor = self._usado + _LARGO.size + len(datos)
+            inicio_valor += (-inicio_valor) % 8
+            fin = inicio_valor + _VALOR.size
+            if fin > len(self._mm):
+                self._crecer(fin)
+            _LARGO.pack_into(self._mm, self._usado, len(datos))
+            self._mm[self._usado + _LARGO.size:self._usado + _LARGO.size + len(datos)] = datos
+            _VALOR.pack_into(self._mm, inicio_valor, 0.0)
+            # La cabecera se actualiza al final: un lector nunca ve una entrada a medio escribir
+            self._usado = fin
+            _CABECERA.pack_into(self._mm, 0, fin)
+            self._ranuras[clave] = inicio_valor
+            return inicio_valor
+
+    def _crecer(self, minimo: int) -> None:
+        nuevo = len(self._mm)
+        while nuevo < minimo:
+            nuevo *= 2
+        self._mm.close()
+        self._archivo.truncate(nuevo)
+        self._mm = mmap.mmap(self._archivo.fileno(), nuevo)
+
+    def sumar(self, ranura: int, delta: float) -> None:
+        with self._lock:
+            _VALOR.pack_into(self._mm, ranura, _VALOR.unpack_from(self._mm, ranura)[0] + delta)
+
+    def observar(self, ranura_bucket: int, ranura_suma: int, ranura_total: int, valor: float) -> None:
+        """Las tres sumas de una observación de histograma bajo un solo lock."""
+        leer, escribir = _VALOR.unpack_from, _VALOR.pack_into
+        with self._lock:
+            mm = self._mm  # dentro del lock: _crecer puede haber cerrado y reemplazado el mapa
+            escribir(mm, ranura_bucket, leer(mm, ranura_bucket)[0] + 1)
+            escribir(mm, ranura_suma, leer(mm, ranura_suma)[0] + valor)
+            escribir(mm, ranura_total, leer(mm, ranura_total)[0] + 1)
+
+    def valores(self, prefijo: str = "") -> Dict[str, float]:
+        total: Dict[str, float] = {}
+        for nombre in os.listdir(self.directorio):
+            if not (nombre.startswith("valores-") and nombre.endswith(".bin")):
+                continue
+            try:
+                with open(os.path.join(self.directorio, nombre), "rb") as f:
+                    datos = f.read()
+            except OSError:
+                continue
+            if len(datos) < _CABECERA.size:
+                continue
+            usado = min(_CABECERA.unpack_from(datos, 0)[0], len(datos))
+            pos = _CABECERA.size
+            while pos + _LARGO.size <= usado:
+                largo = _LARGO.unpack_from(datos, pos)[0]
+                clave = datos[pos + _LARGO.size:pos + _LARGO.size + largo].decode("utf-8")
+                inicio_valor = pos + _LARGO.size + largo
+                inicio_valor += (-inicio_valor) % 8
+                if clave.startswith(prefijo):
+                    total[clave] = total.get(clave, 0.0) + _VALOR.unpack_from(datos, inicio_valor)[0]
+                pos = inicio_valor + _VALOR.size
+        return {k: _numero(v) for k, v in total.items()}
+
+
+def crear_almacen(directorio: Optional[str]):
+    return AlmacenCompartido(directorio) if directorio else AlmacenLocal()
+
+
+# Almacén de métricas y contadores de este proceso
+ALMACEN = crear_almacen(DIRECTORIO_COMPARTIDO)
@@ -0,0 +1,149 @@
+"""
+Sustituto local de GenerativeModel para pruebas y benchmarks sin red ni credenciales
+(MODELO_SIMULADO=true en el servicio, o importado desde bench/).
+
+Responde con la interpretación heurística del propio backend tras una latencia simulada
+(base con jitter log-normal, exponencial o fija, una fracción opcional de llamadas lentas y un
+costo opcional por token de salida), y puede inyectar una tasa de errores y de 429 por cuota. Si generation_config trae response_schema responde en el
+formato compacto.
+"""
+import re
+import json
+import time
+import random
+import asyncio
+from typing import Any, List, Optional
+
+from .logic import interpretacion_fallback
+
+_MARCA_TEXTO = "Texto del cliente:\n\n"
+_MARCA_FIN = "\n\nDevuelve SOLO"
+_RE_PIEZA = re.compile(r"\w+|[^\w\s]")
+DISTRIBUCIONES = ("lognormal", "exponencial", "fija")
+
+
+def estimar_tokens(texto: str) -> int:
+    """Aproximación offline al tokenizador: palabras y signos por separado (~1 token cada uno)."""
+    return len(_RE_PIEZA.findall(texto or ""))
+
+
+def compactar(interpretacion: dict) -> dict:
+    """Proyecta una interpretacion_IA completa sobre app.prompts.RESPONSE_SCHEMA."""
+    det = interpretacion.get("detalles") or {}
+    dir_ = det.get("direccion_entrega") or {}
+    ven = det.get("ventana_entrega") or {}
+    return {
+        "detalles": {
+            "cliente": dict(det.get("cliente") or {}),
+            "direccion_entrega": {k: dir_.get(k) for k in ("texto", "ciudad", "barrio", "observaciones_entrega")},
+            "ventana_entrega": {"expresion_detectada": ven.get("expresion_detectada")},
+            "items": [
+                {k: it.get(k) for k in ("nombre_detectado", "cantidad", "unidad")}
+                for it in det.get("items") or []
+            ],
+            "restricciones": {"notas": list((det.get("restricciones") or {}).get("notas") or [])},
+        },
+        "ambiguedades": list((interpretacion.get("validaciones") or {}).get("ambiguedades") or []),
+    }
+
+
+class ResourceExhausted(Exception):
+    """Mismo nombre que la excepción de google.api_core para un 429 de cuota."""
+
+
+class _Respuesta:
+    def __init__(self, text: str):
+        self.text = text
+        self.candidates = []
+
+
+class GeminiSimulado:
+    def __init__(
+        self,
+        latencia_ms: float = 800.0,
+        jitter: float = 0.3,
+        tasa_error: float = 0.0,
+        tasa_cuota: float = 0.0,
+        semilla: Optional[int] = None,
+        ms_por_token_salida: float = 0.0,
+        distribucion: str = "lognormal",
+        tasa_lenta: float = 0.0,
+        factor_lento: float = 10.0,
+    ):
+        if distribucion not in DISTRIBUCIONES:
+            raise ValueError(f"distribucion debe ser una de {DISTRIBUCIONES}, no {distribucion!r}")
+        self.latencia_ms = latencia_ms
+        self.ms_por_token_salida = ms_por_token_salida
+        self.jitter = jitter
+        self.tasa_error = tasa_error
+        self.tasa_cuota = tasa_cuota
+        self.distribucion = distribucion
+        self.tasa_lenta = tasa_lenta
+        self.factor_lento = factor_lento
+        self.llamadas = 0
+        self.tokens_salida = 0
+        self._rnd = random.Random(semilla)
+
+    def _latencia_s(self) -> float:
+        if self.latencia_ms <= 0:
+            return 0.0
+        if self.distribucion == "exponencial":       # media = latencia_ms
+            factor = self._rnd.expovariate(1.0)
+        elif self.distribucion == "lognormal" and self.jitter > 0:   # mediana = latencia_ms
+            factor = self._rnd.lognormvariate(0, self.jitter)
+        else:
+            factor = 1.0
+        # Cola: una fracción de llamadas tarda factor_lento veces más (reintentos, colas de Vertex)
+        if self.tasa_lenta and self._rnd.random() < self.tasa_lenta:
+            factor *= self.factor_lento
+        return self.latencia_ms * factor / 1000.0
+
+    @staticmethod
+    def _texto_cliente(contents: List[Any]) -> str:
+        ultimo = str(contents[-1]) if contents else ""
+        if _MARCA_TEXTO in ultimo:
+            ultimo = ultimo.split(_MARCA_TEXTO, 1)[1].split(_MARCA_FIN, 1)[0]
+        return ultimo
+
+    def _responder(self, contents: List[Any], generation_config=None) -> _Respuesta:
+        self.llamadas += 1
+        interpretacion = interpretacion_fallback(self._texto_cliente(contents))
+        if (generation_config or {}).get("response_schema"):
+            interpretacion = compactar(interpretacion)
+        texto = json.dumps(interpretacion, ensure_ascii=False)
+        self.tokens_salida += estimar_tokens(texto)
+        return _Respuesta(texto)
+
+    def _quizas_fallar(self) -> None:
+        if self.tasa_cuota and self._rnd.random() < self.tasa_cuota:
+            raise ResourceExhausted("429 GeminiSimulado: cuota excedida")
+        if self.tasa_error and self._rnd.random() < self.tasa_error:
+            raise RuntimeError("GeminiSimulado: error inyectado")
+
+    def _latencia_total_s(self, respuesta: _Respuesta) -> float:
+        return self._latencia_s() + self.ms_por_token_salida * estimar_tokens(respuesta.text) / 1000.0
+
+    async def generate_content_async(self, contents, generation_config=None, stream=False, **kwargs):
+        if stream:
+            return self._stream(contents, generation_config)
+        respuesta = self._responder(contents, generation_config)
+        await asyncio.sleep(self._latencia_total_s(respuesta))
+        self._quizas_fallar()
+        return respuesta
+
+    async def _stream(self, contents, generation_config=None, trozos: int = 8):
+        """Reparte la respuesta en `trozos` pedazos y la latencia entre ellos."""
+        respuesta = self._responder(contents, generation_config)
+        self._quizas_fallar()
+        latencia = self._latencia_total_s(respuesta)
+        texto = respuesta.text
+        paso = max(1, len(texto) // trozos + 1)
+        for i in range(0, len(texto), paso):
+            await asyncio.sleep(latencia / trozos)
+            yield _Respuesta(texto[i:i + paso])
+
+    def generate_content(self, contents, generation_config=None, **kwargs):
+        respuesta = self._responder(contents, generation_config)
+        time.sleep(self._latencia_total_s(respuesta))
+        self._quizas_fallar()
+        return respuesta
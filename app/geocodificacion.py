@@ -0,0 +1,311 @@
+import os
+import re
+import json
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+from .catalogo import plegar
+
+# ---------- Geocodificación local (sin servicios externos) ----------
+# La nomenclatura de Bogotá es una malla: las calles crecen hacia el norte (sur = negativas) y las
+# carreras hacia el occidente (este = negativas). "Calle 93 # 12-45" es el punto (calle 93,
+# carrera 12.45): la placa son los metros desde la esquina, ~ una fracción de cuadra.
+# El gazetteer (app/data/gazetteer_bogota.json) se carga una vez y se compila en:
+#   - un ajuste afín malla -> lat/lng a partir de puntos ancla, más una corrección por celda
+#   - un índice de celdas de la malla (_CELDA x _CELDA) -> barrios cuyo rectángulo la toca,
+#     del más pequeño al más grande; ubicar un punto es un lookup en dict y pocas comparaciones
+#   - un mapa de nombres plegados (sin tildes) -> barrio, para pedidos que solo dicen el barrio;
+#     los que también son fechas, apellidos, verbos o palabras comunes ("20 de julio", "restrepo",
+#     "suba", "la soledad") o nombres de ciudad van en "solo_con_barrio" y en el texto solo cuentan
+#     después de la palabra "barrio" ("en el barrio Suba")
+# geocodificar() va con lru_cache: las direcciones de clientes frecuentes se repiten.
+
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", str(Path(__file__).resolve().parent / "data" / "gazetteer_bogota.json"))
+GEOCODIFICACION_CACHE = int(os.getenv("GEOCODIFICACION_CACHE", "4096"))
+
+_CELDA = 10  # números de calle/carrera por celda del índice
+_PESO_SIN_ANCLA = 1.0 / 25 ** 2  # lejos (~25 cuadras) de toda ancla la corrección se apaga
+
+# Tipo de vía por abreviatura (ya plegada); calle y diagonal cruzan carreras, carrera y transversal cruzan calles
+TIPOS_VIA = {
+    "avenida calle": "calle", "av calle": "calle", "ac": "calle",
+    "calle": "calle", "clle": "calle", "cll": "calle", "cl": "calle",
+    "diagonal": "diagonal", "diag": "diagonal", "dg": "diagonal",
+    "avenida carrera": "carrera", "av carrera": "carrera", "av cra": "carrera", "ak": "carrera",
+    "carrera": "carrera", "carr": "carrera", "cra": "carrera", "kra": "carrera", "kr": "carrera", "cr": "carrera",
+    "transversal": "transversal", "transv": "transversal", "tv": "transversal", "tr": "transversal",
+}
+_EJE = {"calle": "calle", "diagonal": "calle", "carrera": "carrera", "transversal": "carrera"}
+_GRUPOS_DIRECCION = ("via", "numero", "letra", "bis", "avenida", "cuadrante",
+                     "cruce", "letra_cruce", "bis_cruce", "placa", "cuadrante_cruce", "complemento")
+# Lo que sigue a la placa y también es parte de la dirección ("apto 301", "torre 2", "int 4")
+_COMPLEMENTOS = r"apartamento|apto|apt|torre|interior|int|casa|bloque|oficina|ofi|of|local|lc|piso"
+
+# Letras de la variante plegada -> clase que acepta la forma con tilde en el texto original
+_CON_TILDE = {"a": "[aá]", "e": "[eé]", "i": "[ií]", "o": "[oó]", "u": "[uúü]", "n": "[nñ]"}
+
+
+def _alternancia(frases: List[str], separador: str = r"\s+") -> str:
+    """Alternancia de regex con las frases (la más larga primero) y espacios flexibles."""
+    unicas = sorted(set(frases), key=len, reverse=True)
+    return "|".join(separador.join(re.escape(p) for p in f.split()) for f in unicas)
+
+
+def patron_con_tildes(frase: str) -> str:
+    """Regex para una frase plegada que también encuentra su forma con tildes/ñ en minúsculas."""
+    return r"\s+".join("".join(_CON_TILDE.get(c, re.escape(c)) for c in tok) for tok in frase.split())
+
+
+@dataclass(frozen=True, slots=True)
+class Barrio:
+    nombre: str
+    localidad: str
+    calles: Tuple[float, float]     # [desde, hasta) en la malla
+    carreras: Tuple[float, float]
+    lat: float                      # centro del rectángulo
+    lng: float
+
+
+@dataclass(frozen=True, slots=True)
+class Direccion:
+    """Componentes de una dirección en nomenclatura ("Calle 93 # 12-45")."""
+    texto: str               # el tramo del texto original que es la dirección
+    via: str                 # calle | carrera | diagonal | transversal
+    numero: str              # "93", "45a", "45 bis"
+    cruce: Optional[str]     # "12"
+    placa: Optional[str]     # "45"
+    cuadrante: Optional[str]  # sur | este
+    calle: Optional[float]   # posición en la malla (None sin cruce/placa)
+    carrera: Optional[float]
+    complemento: Optional[str] = None  # "apto 301", "torre 2"
+
+
+@dataclass(frozen=True, slots=True)
+class Geocodificacion:
+    lat: float
+    lng: float
+    barrio: Optional[str]
+    localidad: Optional[str]
+    precision: str                    # direccion | barrio
+    direccion: Optional[Direccion]
+
+
+def _valor(numero: str, letra: Optional[str], bis: Optional[str]) -> float:
+    """Número de vía con su letra/bis en la malla: la 45A queda entre la 45 y la 46."""
+    v = float(numero)
+    if letra:
+        v += min(0.25 * (ord(letra) - ord("a") + 1), 0.9)
+    if bis:
+        v += 0.1
+    return v
+
+
+def _ajuste_afin(anclas: List[Dict[str, Any]], campo: str) -> Tuple[float, float, float]:
+    """Mínimos cuadrados de campo ~ a + b*calle + c*carrera (ecuaciones normales 3x3)."""
+    filas = [(1.0, float(a["calle"]), float(a["carrera"]), float(a[campo])) for a in anclas]
+    m = [[sum(f[i] * f[j] for f in filas) for j in range(3)] + [sum(f[i] * f[3] for f in filas)] for i in range(3)]
+    for col in range(3):
+        piv = max(range(col, 3), key=lambda r: abs(m[r][col]))
+        m[col], m[piv] = m[piv], m[col]
+        for r in range(3):
+            if r != col:
+                k = m[r][col] / m[col][col]
+                m[r] = [x - k * y for x, y in zip(m[r], m[col])]
+    return tuple(m[i][3] / m[i][i] for i in range(3))
+
+
+class Gazetteer:
+    def __init__(self, datos: Dict[str, Any]):
+        self.ciudad = datos["ciudad"]
+        self._lat = _ajuste_afin(datos["anclas"], "lat")
+        self._lng = _ajuste_afin(datos["anclas"], "lng")
+        # La malla no es exactamente afín (se curva hacia el norte): lo que el ajuste no explica en
+        # cada ancla se reparte por distancia inversa, precalculado en las esquinas de las celdas
+        self._residuos: List[Tuple[float, float, float, float]] = []
+        for a in datos["anclas"]:
+            lat, lng = self._afin(a["calle"], a["carrera"])
+            self._residuos.append((a["calle"], a["carrera"], a["lat"] - lat, a["lng"] - lng))
+        self._esquinas: Dict[Tuple[int, int], Tuple[float, float]] = {}
+        cobertura = datos.get("cobertura") or {}
+        self._calles = tuple(cobertura.get("calles") or (-math.inf, math.inf))
+        self._carreras = tuple(cobertura.get("carreras") or (-math.inf, math.inf))
+
+        # Ciudades por nombre plegado; solo la del gazetteer se geocodifica
+        self._ciudades: Dict[str, str] = {plegar(a): self.ciudad for a in [self.ciudad] + datos.get("alias_ciudad", [])}
+        for c in datos.get("otras_ciudades", []):
+            self._ciudades[plegar(c)] = c
+
+        self.barrios: List[Barrio] = []
+        self._por_nombre: Dict[str, Barrio] = {}
+        self._solo_con_barrio: set = set()
+        self._celdas: Dict[Tuple[int, int], List[Barrio]] = {}
+        for b in datos.get("barrios", []):
+            (c0, c1), (k0, k1) = b["calles"], b["carreras"]
+            lat, lng = self.coordenadas((c0 + c1) / 2, (k0 + k1) / 2)
+            barrio = Barrio(b["nombre"], b.get("localidad"), (c0, c1), (k0, k1), lat, lng)
+            self.barrios.append(barrio)
+            for nombre in [b["nombre"]] + b.get("alias", []) + b.get("solo_con_barrio", []):
+                self._por_nombre[" ".join(plegar(nombre).split())] = barrio
+            self._solo_con_barrio.update(" ".join(plegar(n).split()) for n in b.get("solo_con_barrio", []))
+            for ci in range(math.floor(c0 / _CELDA), math.ceil(c1 / _CELDA)):
+                for ki in range(math.floor(k0 / _CELDA), math.ceil(k1 / _CELDA)):
+                    self._celdas.setdefault((ci, ki), []).append(barrio)
+        # Un barrio que se llama como una ciudad conocida ("Madrid") también necesita el "barrio" delante
+        self._solo_con_barrio.update(n for n in self._por_nombre if n in self._ciudades)
+        # En cada celda, el barrio más pequeño primero: el más específico gana si se solapan
+        for lista in self._celdas.values():
+            lista.sort(key=lambda b: (b.calles[1] - b.calles[0]) * (b.carreras[1] - b.carreras[0]))
+
+        self._avenidas = {plegar(k): (v[0], float(v[1])) for k, v in (datos.get("avenidas") or {}).items()}
+        numero = r"(?P<{0}>\d{{1,3}})(?:\s?(?P<{1}>[a-h])(?![a-z]))?(?P<{2}>\s?bis\b(?:\s?[a-h](?![a-z]))?)?"
+        # Sobre el texto en minúsculas (sin plegar): los nombres de avenida aceptan la forma con tildes
+        vias = _alternancia(list(TIPOS_VIA), r"\.?\s+")
+        avenidas = "|".join(patron_con_tildes(a) for a in sorted(self._avenidas, key=len, reverse=True))
+        self._re_direccion = re.compile(
+            rf"\b(?:(?P<via>{vias})\.?\s*{numero.format('numero', 'letra', 'bis')}"
+            rf"|(?:avenida|av)\.?\s+(?P<avenida>{avenidas})\b)"
+            r"(?P<cuadrante>\s+(?:sur|este)\b)?"
+            rf"(?:\s*(?:#|n[°º]|nro\b\.?|n[uú]mero\b|no\b\.?)?\s*{numero.format('cruce', 'letra_cruce', 'bis_cruce')}"
+            r"\s*[-–]\s*(?P<placa>\d{1,3})\b(?P<cuadrante_cruce>\s+(?:sur|este)\b)?)?"
+            rf"(?P<complemento>(?:\s*,?\s*(?:{_COMPLEMENTOS})\.?\s*[a-z]?\d+[a-z]?\b)*)"
+        )
+
+    # ---------- Nombres ----------
+    def patron_barrios(self, ambiguos: bool = True) -> str:
+        """
+        Alternancia de nombres de barrio (con o sin tildes) para escanear el texto en minúsculas;
+        con ambiguos=False quedan fuera los que solo cuentan después de "barrio".
+        """
+        nombres = [n for n in self._por_nombre if ambiguos or n not in self._solo_con_barrio]
+        return "|".join(patron_con_tildes(n) for n in sorted(nombres, key=len, reverse=True))
+
+    def patron_ciudades(self) -> str:
+        return "|".join(patron_con_tildes(n) for n in sorted(self._ciudades, key=len, reverse=True))
+
+    def barrio(self, nombre: Optional[str]) -> Optional[Barrio]:
+        """Barrio por nombre o alias, con o sin la palabra "barrio" delante ("Barrio Castilla")."""
+        return self._por_nombre.get(" ".join(plegar(nombre).split()).removeprefix("barrio ")) if nombre else None
+
+    def nombre_ciudad(self, nombre: Optional[str]) -> Optional[str]:
+        """Nombre canónico de una ciudad conocida; None si no está en el gazetteer."""
+        return self._ciudades.get(" ".join(plegar(nombre).split())) if nombre else None
+
+    def cubre(self, ciudad: Optional[str]) -> bool:
+        """True si la ciudad es la del gazetteer o no se sabe (se asume la del gazetteer)."""
+        if not ciudad:
+            return True
+        nombre = self.nombre_ciudad(ciudad) or self.nombre_ciudad(ciudad.split(",")[0])
+        return nombre == self.ciudad or (nombre is None and plegar(ciudad).startswith(plegar(self.ciudad)))
+
+    # ---------- Malla ----------
+    def _afin(self, calle: float, carrera: float) -> Tuple[float, float]:
+        a, b, c = self._lat
+        d, e, f = self._lng
+        return a + b * calle + c * carrera, d + e * calle + f * carrera
+
+    def _correccion(self, calle: float, carrera: float) -> Tuple[float, float]:
+        peso_total, d_lat, d_lng = _PESO_SIN_ANCLA, 0.0, 0.0
+        for c, k, r_lat, r_lng in self._residuos:
+            peso = 1.0 / ((calle - c) ** 2 + (carrera - k) ** 2 + 1.0)
+            peso_total += peso
+            d_lat += peso * r_lat
+            d_lng += peso * r_lng
+        return d_lat / peso_total, d_lng / peso_total
+
+    def _esquina(self, ci: int, ki: int) -> Tuple[float, float]:
+        # Corrección en la esquina de una celda del índice; se calcula una vez por esquina
+        esquina = self._esquinas.get((ci, ki))
+        if esquina is None:
+            esquina = self._esquinas[(ci, ki)] = self._correccion(ci * _CELDA, ki * _CELDA)
+        return esquina
+
+    def coordenadas(self, calle: float, carrera: float) -> Tuple[float, float]:
+        """Afín + corrección interpolada (bilineal) desde las esquinas de la celda."""
+        a, b, c = self._lat
+        d, e, f = self._lng
+        x, y = calle / _CELDA, carrera / _CELDA
+        ci, ki = math.floor(x), math.floor(y)
+        fx, fy = x - ci, y - ki
+        esquina = self._esquina
+        (a_lat, a_lng), (b_lat, b_lng) = esquina(ci, ki), esquina(ci + 1, ki)
+        (c_lat, c_lng), (d_lat, d_lng) = esquina(ci, ki + 1), esquina(ci + 1, ki + 1)
+        lat = a + b * calle + c * carrera + (a_lat + (b_lat - a_lat) * fx) * (1 - fy) + (c_lat + (d_lat - c_lat) * fx) * fy
+        lng = d + e * calle + f * carrera + (a_lng + (b_lng - a_lng) * fx) * (1 - fy) + (c_lng + (d_lng - c_lng) * fx) * fy
+        return round(lat, 6), round(lng, 6)
+
+    def ubicar(self, calle: float, carrera: float) -> Optional[Barrio]:
+        """Barrio cuyo rectángulo contiene el punto de la malla."""
+        for b in self._celdas.get((math.floor(calle / _CELDA), math.floor(carrera / _CELDA)), ()):
+            if b.calles[0] <= calle < b.calles[1] and b.carreras[0] <= carrera < b.carreras[1]:
+                return b
+        return None
+
+    def parsear(self, texto: Optional[str]) -> Optional[Direccion]:
+        """Primera dirección en nomenclatura del texto, con su posición en la malla si trae cruce y placa."""
+        if not texto:
+            return None
+        low = texto.lower()
+        m = self._re_direccion.search(low)
+        if m is None:
+            return None
+        # lower() nunca acorta un carácter: con la misma longitud los índices valen en el original;
+        # si alguno creció ("İ" -> "i̇") se recorta del texto sobre el que se buscó
+        fuente = texto if len(low) == len(texto) else low
+        (via, numero, letra, bis, avenida, cuadrante, cruce, letra_cruce, bis_cruce, placa,
+         cuadrante_cruce, complemento) = m.group(*_GRUPOS_DIRECCION)
+        if avenida:
+            numero = " ".join(plegar(avenida).split())
+            via, valor = self._avenidas[numero]
+        else:
+            via = TIPOS_VIA[" ".join(via.replace(".", " ").split())]
+            valor = _valor(numero, letra, bis)
+            numero += (letra or "") + (" bis" if bis else "")
+        cuadrante = (cuadrante or cuadrante_cruce or "").strip() or None
+        calle = carrera = None
+        if cruce:
+            punto = _valor(cruce, letra_cruce, bis_cruce) + min(int(placa), 99) / 100
+            calle, carrera = (valor, punto) if _EJE[via] == "calle" else (punto, valor)
+            if cuadrante == "sur":
+                calle = -calle
+            elif cuadrante == "este":
+                carrera = -carrera
+        return Direccion(
+            fuente[m.start():m.end()], via, numero, cruce, placa, cuadrante, calle, carrera,
+            complemento.strip(" ,") or None,
+        )
+
+    def geocodificar(self, direccion: Optional[str], barrio: Optional[str] = None,
+                     ciudad: Optional[str] = None) -> Optional[Geocodificacion]:
+        """
+        Coordenadas de la dirección (precisión "direccion") o, si no se puede ubicar en la malla,
+        del centro del barrio (precisión "barrio"). None si la ciudad es otra o no hay con qué.
+        """
+        if not self.cubre(ciudad):
+            return None
+        partes = self.parsear(direccion)
+        if partes is not None and partes.calle is not None:
+            if self._calles[0] <= partes.calle <= self._calles[1] and self._carreras[0] <= partes.carrera <= self._carreras[1]:
+                lat, lng = self.coordenadas(partes.calle, partes.carrera)
+                b = self.ubicar(partes.calle, partes.carrera)
+                return Geocodificacion(lat, lng, b and b.nombre, b and b.localidad, "direccion", partes)
+        b = self.barrio(barrio)
+        if b is not None:
+            return Geocodificacion(b.lat, b.lng, b.nombre, b.localidad, "barrio", partes)
+        return None
+
+
+def cargar_gazetteer(ruta: str = GAZETTEER_PATH) -> Gazetteer:
+    with open(ruta, encoding="utf-8") as f:
+        return Gazetteer(json.load(f))
+
+
+GAZETTEER = cargar_gazetteer()
+
+
+@lru_cache(maxsize=GEOCODIFICACION_CACHE)
+def geocodificar(direccion: Optional[str], barrio: Optional[str] = None,
+                 ciudad: Optional[str] = None) -> Optional[Geocodificacion]:
+    return GAZETTEER.geocodificar(direccion, barrio, ciudad)
@@ -0,0 +1,232 @@
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Callable, Awaitable, Tuple
+
+from .cache import normalizar_texto
+from .metricas import Contador
+from .respuesta import serializar
+
+# ---------- Idempotencia de peticiones ----------
+# Los clientes (WhatsApp, formulario) reintentan al vencerse su timeout. Cada petición se asocia
+# a una llave: el header Idempotency-Key si viene, o (opt-in, IDEMPOTENCIA_VENTANA_S > 0) un hash
+# de canal + texto normalizado. Los duplicados concurrentes esperan a la misma ejecución en vuelo
+# (single-flight) y los que llegan después reciben la respuesta ya emitida, con el mismo pedido_id,
+# desde un almacén LRU + TTL. Con cada llave explícita se guarda la huella del cuerpo: la misma
+# llave con otro cuerpo es un error del cliente (ConflictoIdempotencia -> 422), no un reintento.
+# Con el backend sqlite el almacén y la reserva de la ejecución se comparten entre workers.
+
+class ConflictoIdempotencia(Exception):
+    """La Idempotency-Key ya se usó con otro cuerpo."""
+
+
+def clave_idempotencia(canal: str, texto: str, usar_modelo: Optional[bool], clave_cliente: Optional[str]) -> Tuple[str, bool, str]:
+    """
+    Retorna (llave, explícita, huella del cuerpo). Las llaves implícitas solo valen dentro de la
+    ventana corta; la huella solo se compara con llaves explícitas.
+    """
+    huella = hashlib.sha256("\x1f".join([canal, str(usar_modelo), texto]).encode("utf-8")).hexdigest()
+    if clave_cliente:
+        return "k\x1f" + clave_cliente.strip(), True, huella
+    base = "\x1f".join([canal, str(usar_modelo), normalizar_texto(texto)])
+    return "h\x1f" + hashlib.sha256(base.encode("utf-8")).hexdigest(), False, huella
+
+
+class _RespuestasMemoria:
+    """Respuestas terminadas en memoria del proceso (LRU + TTL)."""
+
+    def __init__(self, max_entradas: int):
+        self.max_entradas = max_entradas
+        self._datos: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def obtener(self, clave: str) -> Optional[Tuple[Dict[str, Any], Optional[str]]]:
+        entrada = self._datos.get(clave)
+        if entrada is None:
+            return None
+        expira, respuesta, huella = entrada
+        if expira < time.monotonic():
+            del self._datos[clave]
+            return None
+        self._datos.move_to_end(clave)
+        return respuesta, huella
+
+    def reservar(self, clave: str, plazo_s: float) -> bool:
+        # En un solo proceso la reserva es el futuro en vuelo de Idempotencia
+        return True
+
+    def liberar(self, clave: str) -> None:
+        pass
+
+    def guardar(self, clave: str, respuesta: Dict[str, Any], ttl_s: float, huella: Optional[str] = None) -> None:
+        self._datos[clave] = (time.monotonic() + ttl_s, respuesta, huella)
+        self._datos.move_to_end(clave)
+        while len(self._datos) > self.max_entradas:
+            self._datos.popitem(last=False)
+
+    def tamano(self) -> int:
+        return len(self._datos)
+
+
+class _RespuestasSQLite:
+    """
+    Respuestas terminadas y reservas de ejecución en SQLite, compartidas entre procesos.
+    Una fila con respuesta NULL es una ejecución en vuelo; su `expira` es el plazo de la reserva.
+    """
+
+    def __init__(self, ruta: str, max_entradas: int):
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS idempotencia ("
+            " clave TEXT PRIMARY KEY, respuesta TEXT, expira REAL NOT NULL, huella TEXT)"
+        )
+        try:  # almacenes creados antes de guardar la huella del cuerpo
+            self._conn.execute("ALTER TABLE idempotencia ADD COLUMN huella TEXT")
+        except sqlite3.OperationalError:
+            pass
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_idempotencia_expira ON idempotencia(expira)")
+
+    def obtener(self, clave: str) -> Optional[Tuple[Dict[str, Any], Optional[str]]]:
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT respuesta, huella FROM idempotencia WHERE clave = ? AND respuesta IS NOT NULL AND expira >= ?",
+                (clave, time.time()),
+            ).fetchone()
+        return (json.loads(fila[0]), fila[1]) if fila else None
+
+    def reservar(self, clave: str, plazo_s: float) -> bool:
+        """True si este proceso queda a cargo; False si otro ya la está calculando."""
+        ahora = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO idempotencia (clave, respuesta, expira) VALUES (?, NULL, ?)"
+                " ON CONFLICT(clave) DO UPDATE SET respuesta = NULL, expira = excluded.expira"
+                " WHERE idempotencia.expira < ?",
+                (clave, ahora + plazo_s, ahora),
+            )
+            return cur.rowcount == 1
+
+    def liberar(self, clave: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM idempotencia WHERE clave = ? AND respuesta IS NULL", (clave,))
+
+    def guardar(self, clave: str, respuesta: Dict[str, Any], ttl_s: float, huella: Optional[str] = None) -> None:
+        ahora = time.time()
+        raw = serializar(respuesta).decode("utf-8")
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO idempotencia (clave, respuesta, expira, huella) VALUES (?, ?, ?, ?)",
+                (clave, raw, ahora + ttl_s, huella),
+            )
+            self._conn.execute("DELETE FROM idempotencia WHERE expira < ?", (ahora,))
+            self._conn.execute(
+                "DELETE FROM idempotencia WHERE clave IN ("
+                " SELECT clave FROM idempotencia WHERE respuesta IS NOT NULL"
+                " ORDER BY expira DESC LIMIT -1 OFFSET ?)",
+                (self.max_entradas,),
+            )
+
+    def tamano(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM idempotencia WHERE respuesta IS NOT NULL").fetchone()[0]
+
+
+class Idempotencia:
+    def __init__(
+        self,
+        max_entradas: int = 10000,
+        ttl_s: float = 86400,
+        ventana_s: float = 0,
+        ruta_sqlite: Optional[str] = None,
+        plazo_en_vuelo_s: float = 60,
+        espera_s: float = 0.05,
+    ):
+        self.ttl_s = ttl_s                        # vigencia de respuestas con Idempotency-Key
+        self.ventana_s = ventana_s                # vigencia de respuestas deduplicadas por contenido (0 = no)
+        self.plazo_en_vuelo_s = plazo_en_vuelo_s  # reserva entre procesos; vencida, otro la retoma
+        self.espera_s = espera_s                  # sondeo mientras otro proceso calcula
+        self._respuestas = _RespuestasSQLite(ruta_sqlite, max_entradas) if ruta_sqlite else _RespuestasMemoria(max_entradas)
+        self._en_vuelo: Dict[str, Tuple[asyncio.Future, Optional[str]]] = {}   # clave -> (futuro, huella)
+        self._resultados = Contador(
+            "interprete_idempotencia_total", "Peticiones /interpretar por resultado de deduplicación.", ("resultado",)
+        )
+
+    async def ejecutar(
+        self,
+        clave: str,
+        explicita: bool,
+        calcular: Callable[[], Awaitable[Dict[str, Any]]],
+        huella: Optional[str] = None,
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Retorna (respuesta, repetida). Si la ejecución en vuelo falla (p. ej. su cliente se
+        desconectó y se canceló), quien esperaba la reintenta como nueva ejecución.
+        Con llave explícita y otra huella de cuerpo lanza ConflictoIdempotencia.
+        """
+        while True:
+            guardada = self._respuestas.obtener(clave)
+            if guardada is not None:
+                respuesta, huella_guardada = guardada
+                self._verificar(explicita, huella, huella_guardada)
+                self._resultados.incrementar("repetidas")
+                return respuesta, True
+
+            en_vuelo = self._en_vuelo.get(clave)
+            if en_vuelo is not None:
+                futuro, huella_en_vuelo = en_vuelo
+                self._verificar(explicita, huella, huella_en_vuelo)
+                try:
+                    respuesta = await asyncio.shield(futuro)
+                except Exception:
+                    continue
+                self._resultados.incrementar("coalescidas")
+                return respuesta, True
+
+            if not self._respuestas.reservar(clave, self.plazo_en_vuelo_s):
+                # Otro worker la está calculando: esperamos su respuesta en el almacén compartido
+                await asyncio.sleep(self.espera_s)
+                continue
+
+            futuro = asyncio.get_running_loop().create_future()
+            self._en_vuelo[clave] = futuro, huella
+            try:
+                respuesta = await calcular()
+            except BaseException as e:
+                self._respuestas.liberar(clave)
+                futuro.set_exception(e if isinstance(e, Exception) else RuntimeError("Ejecución cancelada."))
+                futuro.exception()  # marca la excepción como leída aunque nadie espere
+                raise
+            else:
+                self._resultados.incrementar("ejecutadas")
+                ttl_s = self.ttl_s if explicita else self.ventana_s
+                if ttl_s > 0:
+                    self._respuestas.guardar(clave, respuesta, ttl_s, huella)
+                else:  # sin ventana no hay nada que repetir; solo soltamos la reserva
+                    self._respuestas.liberar(clave)
+                futuro.set_result(respuesta)
+                return respuesta, False
+            finally:
+                self._en_vuelo.pop(clave, None)
+
+    def _verificar(self, explicita: bool, huella: Optional[str], guardada: Optional[str]) -> None:
+        # Sin huella guardada (almacén anterior) o sin huella nueva no hay con qué comparar
+        if explicita and huella and guardada and huella != guardada:
+            self._resultados.incrementar("conflictos")
+            raise ConflictoIdempotencia("Idempotency-Key ya usada con otro cuerpo.")
+
+    def estadisticas(self) -> Dict[str, Any]:
+        resultados = {(r,): 0 for r in ("ejecutadas", "repetidas", "coalescidas", "conflictos")}
+        resultados.update(self._resultados.valores())
+        return {
+            "backend": type(self._respuestas).__name__.lstrip("_"),
+            "entradas": self._respuestas.tamano(),
+            "en_vuelo": len(self._en_vuelo),
+            **{r: v for (r,), v in resultados.items()},
+        }
@@ -0,0 +1,132 @@
+import json
+from typing import Any, Callable, List, Optional, Tuple
+
+# ---------- Parser JSON incremental ----------
+# Recibe el texto del modelo por trozos (streaming) y emite cada objeto/arreglo apenas se cierra,
+# si su ruta es de interés (p. ej. detalles.cliente o cada detalles.items[i]). Solo recorre cada
+# carácter una vez para seguir strings y anidamiento; el valor emitido se decodifica con json.loads
+# sobre su propio fragmento. Falla en cuanto el texto deja de ser JSON plausible, sin esperar al final.
+
+Ruta = Tuple[Any, ...]
+
+
+class JSONIncrementalError(ValueError):
+    pass
+
+
+def rutas_interpretacion(ruta: Ruta) -> bool:
+    """Rutas de interpretacion_IA que vale la pena mostrar antes de que termine la respuesta."""
+    if len(ruta) == 2 and ruta[0] == "detalles":
+        return ruta[1] in ("cliente", "direccion_entrega", "ventana_entrega", "restricciones")
+    return len(ruta) == 3 and ruta[0] == "detalles" and ruta[1] == "items" and isinstance(ruta[2], int)
+
+
+class _Marco:
+    __slots__ = ("tipo", "inicio", "ruta", "clave", "esperando_clave", "indice")
+
+    def __init__(self, tipo: str, inicio: int, ruta: Ruta):
+        self.tipo = tipo            # "{" o "["
+        self.inicio = inicio        # offset del delimitador de apertura en el buffer
+        self.ruta = ruta
+        self.clave = None           # última clave leída (objetos)
+        self.esperando_clave = tipo == "{"
+        self.indice = 0             # posición del siguiente elemento (arreglos)
+
+
+class ParserJSONIncremental:
+    def __init__(self, interes: Callable[[Ruta], bool] = rutas_interpretacion):
+        self._interes = interes
+        self._texto = ""
+        self._pos = 0
+        self._pila: List[_Marco] = []
+        self._en_string = False
+        self._escape = False
+        self._inicio_string = -1
+        self._empezo = False
+        self._termino = False
+
+    def _ruta_hijo(self) -> Ruta:
+        padre = self._pila[-1]
+        return padre.ruta + ((padre.clave,) if padre.tipo == "{" else (padre.indice,))
+
+    def alimentar(self, trozo: str) -> List[Tuple[Ruta, Any]]:
+        """Agrega un trozo del stream y retorna los (ruta, valor) que se completaron con él."""
+        eventos: List[Tuple[Ruta, Any]] = []
+        self._texto += trozo
+        texto = self._texto
+        i = self._pos
+        n = len(texto)
+        while i < n:
+            c = texto[i]
+            if self._en_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._en_string = False
+                    marco = self._pila[-1] if self._pila else None
+                    if marco is not None and marco.tipo == "{" and marco.esperando_clave:
+                        marco.clave = json.loads(texto[self._inicio_string:i + 1])
+                        marco.esperando_clave = False
+                i += 1
+                continue
+
+            if c in " \t\r\n":
+                i += 1
+                continue
+            if self._termino:
+                raise JSONIncrementalError(f"Contenido después del JSON en la posición {i}.")
+            if not self._empezo:
+                if c != "{":
+                    raise JSONIncrementalError(f"Se esperaba '{{' al inicio y llegó {c!r}.")
+                self._empezo = True
+
+            if c == '"':
+                self._en_string = True
+                self._inicio_string = i
+            elif c in "{[":
+                ruta = self._ruta_hijo() if self._pila else ()
+                self._pila.append(_Marco(c, i, ruta))
+            elif c in "}]":
+                if not self._pila or self._pila[-1].tipo != ("{" if c == "}" else "["):
+                    raise JSONIncrementalError(f"Cierre {c!r} inesperado en la posición {i}.")
+                marco = self._pila.pop()
+                if not self._pila:
+                    self._termino = True
+                if self._interes(marco.ruta):
+                    try:
+                        eventos.append((marco.ruta, json.loads(texto[marco.inicio:i + 1])))
+                    except ValueError as e:
+                        raise JSONIncrementalError(f"Valor inválido en {'.'.join(map(str, marco.ruta))}: {e}")
+            elif c == ",":
+                if not self._pila:
+                    raise JSONIncrementalError(f"',' fuera de un contenedor en la posición {i}.")
+                marco = self._pila[-1]
+                if marco.tipo == "{":
+                    marco.esperando_clave = True
+                else:
+                    marco.indice += 1
+            elif c == ":":
+                if not self._pila or self._pila[-1].tipo != "{":
+                    raise JSONIncrementalError(f"':' inesperado en la posición {i}.")
+            elif not (c.isalnum() or c in "+-."):
+                raise JSONIncrementalError(f"Carácter inesperado {c!r} en la posición {i}.")
+            elif self._pila and self._pila[-1].tipo == "{" and self._pila[-1].esperando_clave:
+                raise JSONIncrementalError(f"Se esperaba una clave entre comillas en la posición {i}.")
+            i += 1
+        self._pos = i
+        return eventos
+
+    @property
+    def completo(self) -> bool:
+        return self._termino
+
+    def resultado(self) -> Optional[Any]:
+        """Documento completo (validado con json.loads) o error si el stream quedó incompleto."""
+        if not self._termino:
+            raise JSONIncrementalError("La respuesta del modelo terminó antes de cerrar el JSON.")
+        try:
+            return json.loads(self._texto)
+        except ValueError as e:
+            raise JSONIncrementalError(str(e))
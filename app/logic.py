@@ -1,71 +1,109 @@
 import re
 import uuid
-import pytz
-from datetime import datetime, timedelta
-from dateutil import parser as dateparser
+from datetime import datetime
 from typing import Tuple, Optional, Dict, Any, List
+from .catalogo import CATALOGO
+from .tiempo import TZ, interpretar_ventana
+from .respuesta import RespuestaPedido, EntradaOriginal, Metadatos
+from .geocodificacion import GAZETTEER, geocodificar
 
-TZ = pytz.timezone("America/Bogota")
-
-SINONIMOS = {
-    "buñuelos": ["bunuelos", "buñuelo", "bunelo", "bunuelos"],
-    "arepas de maíz": ["arepas", "arepa de maiz", "arepa", "arepas de maiz"]
-}
+# Nombre canónico -> sinónimos, derivado del catálogo (app/data/catalogo.json)
+SINONIMOS = CATALOGO.sinonimos()
 
 def now_iso() -> str:
     return datetime.now(TZ).isoformat()
 
 def generar_pedido_id() -> str:
-    return f"ORD-{str(uuid.uuid4())[:8].upper()}"
+    return f"ORD-{uuid.uuid4().hex[:16].upper()}"  # 64 bits: 8 hex chocaban desde ~10^4-10^5 pedidos
 
 def generar_uuid_operacion() -> str:
     return str(uuid.uuid4())
 
 def normalizar_item_nombre(nombre_detectado: str) -> str:
+    producto = CATALOGO.buscar(nombre_detectado)
+    if producto is not None:
+        return producto["nombre"]
     nd = (nombre_detectado or "").strip().lower()
-    for canonico, lista in SINONIMOS.items():
-        if nd == canonico.lower() or nd in [x.lower() for x in lista]:
-            return canonico
     # simplificación: mayúscula inicial para "desconocidos"
     return nd.capitalize() if nd else nd
 
+# ---------- Patrones precompilados ----------
+# Los patrones que operan sobre el texto en minúsculas se aplican al `low` calculado una sola vez
+_RE_FRAGIL = re.compile(r"\b(frágil|fragil)\b")
+_RE_TEMP = re.compile(r"\b(frío|frio|refrigerad|congelad|temperatura controlada)\b")
+_RE_ACCESO = re.compile(r"\b(portería|porteria|acceso restringido|autorización|autorizacion)\b")
+_RE_TELEFONO = re.compile(r"(?:\+?57)?\s?3\d{9}")
+_RE_EMAIL = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+_RE_DIRECCION = re.compile(
+    r"\b(?:cra|cr|carrera|calle|cll|av|avenida|transv|transversal|diag|diagonal)\b\.?\s?[0-9a-zA-Z#\s\-\.\,]+",
+    re.IGNORECASE,
+)
+# Ciudades y barrios salen del gazetteer (app/data/gazetteer_bogota.json), con o sin tildes
+_CIUDADES = GAZETTEER.patron_ciudades()
+_BARRIOS = GAZETTEER.patron_barrios(ambiguos=False)
+_BARRIOS_TODOS = GAZETTEER.patron_barrios()
+_RE_OBS = re.compile(r"(entregar en [^\.]+|port[eí]a|recepci[oó]n|piso\s?\d+)")
+
+# Escáner combinado de palabras clave: una sola pasada sobre `low` para ciudad, barrio y restricciones.
+# Las alternativas no se solapan entre sí, así que la primera coincidencia de cada grupo es la misma
+# que daría su re.search por separado. Dirección, observaciones y horas quedan fuera porque sus
+# coincidencias sí pueden envolver a otras (p. ej. "entregar en ... antes de las 3").
+_RE_CLAVES = re.compile(
+    rf"\b(?P<ciudad>{_CIUDADES})\b"
+    rf"|\b(?P<barrio>barrio\s+(?:{_BARRIOS_TODOS})|{_BARRIOS})\b"  # "20 de julio", "polo": solo tras "barrio"
+    r"|\b(?P<fragil>frágil|fragil)\b"
+    r"|\b(?P<temp>frío|frio|refrigerad|congelad|temperatura controlada)\b"
+    r"|\b(?P<acceso>portería|porteria|acceso restringido|autorización|autorizacion)\b"
+)
+_GRUPOS_CLAVES = ("ciudad", "barrio", "fragil", "temp", "acceso")
+
 def detectar_manejo_fragil(texto: str) -> bool:
-    return bool(re.search(r"\b(frágil|fragil)\b", texto.lower()))
+    return bool(_RE_FRAGIL.search(texto.lower()))
 
 def detectar_temp_controlada(texto: str) -> bool:
-    return bool(re.search(r"\b(frío|frio|refrigerad|congelad|temperatura controlada)\b", texto.lower()))
+    return bool(_RE_TEMP.search(texto.lower()))
 
 def detectar_acceso_restringido(texto: str) -> bool:
-    return bool(re.search(r"\b(portería|porteria|acceso restringido|autorización|autorizacion)\b", texto.lower()))
+    return bool(_RE_ACCESO.search(texto.lower()))
 
 def extraer_telefono(texto: str) -> Optional[str]:
-    m = re.search(r"(?:\+?57)?\s?3\d{9}", texto.replace(" ", ""))
+    m = _RE_TELEFONO.search(texto.replace(" ", ""))
     return m.group(0)[-10:] if m else None
 
 def extraer_email(texto: str) -> Optional[str]:
-    m = re.search(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}", texto)
+    m = _RE_EMAIL.search(texto)
     return m.group(0) if m else None
 
+def _escanear_claves(low: str) -> Dict[str, str]:
+    """Primera coincidencia de cada grupo de _RE_CLAVES (se detiene cuando ya están todos)."""
+    encontrados: Dict[str, str] = {}
+    for m in _RE_CLAVES.finditer(low):
+        grupo = m.lastgroup
+        if grupo not in encontrados:
+            encontrados[grupo] = m.group(grupo)
+            if len(encontrados) == len(_GRUPOS_CLAVES):
+                break
+    return encontrados
+
+def _direccion_desde(texto: str, low: str, claves: Dict[str, str]) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]:
+    # Primero la nomenclatura completa ("Calle 93 # 12-45 apto 301"); si no hay, la heurística amplia
+    partes = GAZETTEER.parsear(texto)
+    if partes is not None:
+        direccion = partes.texto
+    else:
+        m = _RE_DIRECCION.search(texto)
+        direccion = m.group(0).strip(" .,") if m else None
+    ciudad = GAZETTEER.nombre_ciudad(claves["ciudad"]) if "ciudad" in claves else None
+    barrio = GAZETTEER.barrio(claves["barrio"]).nombre if "barrio" in claves else None
+    obs_m = _RE_OBS.search(low)
+    obs = obs_m.group(0).strip().capitalize() if obs_m else None
+    return direccion, ciudad, barrio, obs
+
 def extraer_direccion_y_ciudad(texto: str) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]:
-    # Heurística simple: busca "Cra|Calle|Av|Carrera|Transv|#|N°", barrio y ciudad comunes (ej: Bogotá)
+    # Heurística simple: busca "Cra|Calle|Av|Carrera|Transv|#|N°", barrio y ciudad del gazetteer
     t = texto.strip()
-    dir_pat = r"(?:cra|cr|carrera|calle|cll|av|avenida|transv|transversal|diag|diagonal)\s?[0-9a-zA-Z#\s\-\.\,]+"
-    m = re.search(dir_pat, t, re.IGNORECASE)
-    direccion = m.group(0).strip(" .,") if m else None
-
-    ciudad = None
-    if re.search(r"\b(bogotá|bogota)\b", t, re.IGNORECASE): ciudad = "Bogotá"
-
-    # Barrio: extrae después de "en|para|a|en el barrio|barrio" + palabra capitalizada o conocida
-    barrio = None
-    b = re.search(r"(?:barrio\s+)?(chapinero|cedritos|usaqu[eé]n|suba|kennedy|fontib[oó]n|teusaquillo)", t, re.IGNORECASE)
-    if b: barrio = b.group(1).capitalize()
-
-    obs = None
-    obs_m = re.search(r"(entregar en [^\.]+|port[eí]a|recepci[oó]n|piso\s?\d+)", t, re.IGNORECASE)
-    if obs_m: obs = obs_m.group(0).strip().capitalize()
-
-    return direccion, ciudad, barrio, obs
+    low = t.lower()
+    return _direccion_desde(t, low, _escanear_claves(low))
 
 def parse_exp_tiempo_relativa(texto: str, now: Optional[datetime] = None) -> Tuple[Optional[str], Optional[str], Optional[str]]:
     """
@@ -73,72 +111,54 @@ def parse_exp_tiempo_relativa(texto: str, now: Optional[datetime] = None) -> Tup
       - "mañana antes de las 3 pm"
       - "hoy entre 2 y 4 pm"
       - "pasado mañana a las 10am"
+      - "el domingo antes de las 8:30 a.m.", "el sábado al mediodía", "del lunes al miércoles"
     Retorna (inicio_iso, fin_iso, expresion_detectada)
     """
-    if now is None:
-        now = datetime.now(TZ)
+    # Una pasada anclada en el día + tabla de reglas de hora (app/tiempo.py)
+    return interpretar_ventana(texto.lower(), now)
 
-    low = texto.lower()
-
-    # Detecta el día base
-    if "pasado mañana" in low:
-        base = (now + timedelta(days=2)).replace(hour=0, minute=0, second=0, microsecond=0)
-    elif "mañana" in low:
-        base = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
-    elif "hoy" in low:
-        base = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    else:
-        base = None
-
-    # Rangos "antes de las X"
-    m_antes = re.search(r"antes de las\s+(\d{1,2})(?::(\d{2}))?\s*(am|pm)?", low)
-    if base and m_antes:
-        hh = int(m_antes.group(1))
-        mm = int(m_antes.group(2) or 0)
-        ampm = (m_antes.group(3) or "").lower()
-        if ampm == "pm" and hh < 12: hh += 12
-        fin = base.replace(hour=hh, minute=mm)
-        return base.isoformat(), fin.isoformat(), m_antes.group(0)
-
-    # Rangos "entre X y Y"
-    m_entre = re.search(r"entre\s+(\d{1,2})(?::(\d{2}))?\s*(am|pm)?\s+y\s+(\d{1,2})(?::(\d{2}))?\s*(am|pm)?", low)
-    if base and m_entre:
-        h1 = int(m_entre.group(1)); m1 = int(m_entre.group(2) or 0); ap1 = (m_entre.group(3) or "").lower()
-        h2 = int(m_entre.group(4)); m2 = int(m_entre.group(5) or 0); ap2 = (m_entre.group(6) or "").lower()
-        if ap1 == "pm" and h1 < 12: h1 += 12
-        if ap2 == "pm" and h2 < 12: h2 += 12
-        ini = base.replace(hour=h1, minute=m1)
-        fin = base.replace(hour=h2, minute=m2)
-        return ini.isoformat(), fin.isoformat(), m_entre.group(0)
-
-    # Puntos "a las X"
-    m_a = re.search(r"a las\s+(\d{1,2})(?::(\d{2}))?\s*(am|pm)?", low)
-    if base and m_a:
-        h = int(m_a.group(1)); m = int(m_a.group(2) or 0); ap = (m_a.group(3) or "").lower()
-        if ap == "pm" and h < 12: h += 12
-        ini = base.replace(hour=h, minute=m)
-        fin = ini + timedelta(minutes=90)  # ventana de 90 min por defecto si no hay rango
-        return ini.isoformat(), fin.isoformat(), m_a.group(0)
-
-    # Si solo dice "mañana" sin hora, asumimos 00:00 a 15:00 como en tu ejemplo
-    if base and "mañana" in low:
-        return base.isoformat(), base.replace(hour=15).isoformat(), "mañana"
-
-    return None, None, None
+def extraer_campos_heuristicos(texto: str, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Motor de extracción: normaliza el texto una sola vez y produce todos los campos heurísticos
+    (los mismos que dan extraer_telefono, extraer_email, extraer_direccion_y_ciudad,
+    parse_exp_tiempo_relativa y los detectar_*).
+    """
+    low_completo = texto.lower()
+    low = low_completo.strip()
+    claves = _escanear_claves(low)
+    direccion, ciudad, barrio, obs = _direccion_desde(texto.strip(), low, claves)
+    return {
+        "telefono": extraer_telefono(texto),
+        "email": extraer_email(texto),
+        "direccion": direccion,
+        "ciudad": ciudad,
+        "barrio": barrio,
+        "observaciones_entrega": obs,
+        "ventana": interpretar_ventana(low_completo, now),
+        "manejo_fragil": "fragil" in claves,
+        "temperatura_controlada": "temp" in claves,
+        "acceso_restringido": "acceso" in claves,
+    }
 
 def postproceso_modelo(interpretacion: Dict[str, Any], texto_libre: str) -> Dict[str, Any]:
+    # Todos los campos heurísticos en una sola pasada sobre el texto
+    campos_local = extraer_campos_heuristicos(texto_libre)
+
     # Telef/Email locales (si el modelo no los puso)
     tel = interpretacion["detalles"]["cliente"].get("telefono")
     if not tel:
-        interpretacion["detalles"]["cliente"]["telefono"] = extraer_telefono(texto_libre)
+        interpretacion["detalles"]["cliente"]["telefono"] = campos_local["telefono"]
 
     email = interpretacion["detalles"]["cliente"].get("email")
     if not email:
-        interpretacion["detalles"]["cliente"]["email"] = extraer_email(texto_libre)
+        interpretacion["detalles"]["cliente"]["email"] = campos_local["email"]
 
     # Dirección/ciudad/barrio/obs (si faltan)
     dir_info = interpretacion["detalles"].get("direccion_entrega", {}) or {}
-    d_txt, ciudad, barrio, obs = extraer_direccion_y_ciudad(texto_libre)
+    d_txt = campos_local["direccion"]
+    ciudad = campos_local["ciudad"]
+    barrio = campos_local["barrio"]
+    obs = campos_local["observaciones_entrega"]
     if not dir_info.get("texto"): dir_info["texto"] = d_txt
     if not dir_info.get("ciudad"): dir_info["ciudad"] = ciudad
     if not dir_info.get("barrio"): dir_info["barrio"] = barrio
@@ -146,14 +166,19 @@ def postproceso_modelo(interpretacion: Dict[str, Any], texto_libre: str) -> Dict
         dir_info["observaciones_entrega"] = obs
     if "nivel_confianza" not in dir_info or dir_info["nivel_confianza"] is None:
         dir_info["nivel_confianza"] = 0.80 if d_txt else 0.40
-    dir_info["lat"] = None
-    dir_info["lng"] = None
+    # Geocodificación local: malla de nomenclatura + gazetteer de barrios (app/geocodificacion.py)
+    geo = geocodificar(dir_info.get("texto"), dir_info.get("barrio"), dir_info.get("ciudad"))
+    dir_info["lat"] = geo.lat if geo else None
+    dir_info["lng"] = geo.lng if geo else None
+    dir_info["precision_coordenadas"] = geo.precision if geo else None  # direccion | barrio (centro)
+    if geo and geo.barrio and not dir_info.get("barrio"):
+        dir_info["barrio"] = geo.barrio
     interpretacion["detalles"]["direccion_entrega"] = dir_info
 
     # Ventana de entrega desde expresiones relativas si vienen en el texto original
     v = interpretacion["detalles"].get("ventana_entrega", {}) or {}
     if not v.get("inicio_iso") or not v.get("fin_iso"):
-        ini, fin, expr = parse_exp_tiempo_relativa(texto_libre)
+        ini, fin, expr = campos_local["ventana"]
         v["inicio_iso"] = ini
         v["fin_iso"] = fin
         if expr and not v.get("expresion_detectada"):
@@ -162,25 +187,32 @@ def postproceso_modelo(interpretacion: Dict[str, Any], texto_libre: str) -> Dict
             v["nivel_confianza"] = 0.85 if (ini and fin) else 0.5
         interpretacion["detalles"]["ventana_entrega"] = v
 
-    # Items: normaliza nombres y completa unidad si falta
+    # Items: normaliza nombres contra el catálogo, asigna SKU y completa unidad si falta
     items = interpretacion["detalles"].get("items", []) or []
     for it in items:
-        it["nombre_normalizado"] = normalizar_item_nombre(it.get("nombre_detectado") or it.get("nombre_normalizado"))
+        nombre = it.get("nombre_detectado") or it.get("nombre_normalizado")
+        producto = CATALOGO.buscar(nombre)
+        if producto is not None:
+            it["nombre_normalizado"] = producto["nombre"]
+            it["sku"] = producto["sku"]
+        else:
+            it["nombre_normalizado"] = normalizar_item_nombre(nombre)
+            it["sku"] = None
         if not it.get("unidad"):
             it["unidad"] = "unidad"
-        it["sku"] = None
         it["peso_kg"] = it.get("peso_kg", None)
         it["volumen_m3"] = it.get("volumen_m3", None)
         if "nivel_confianza" not in it or it["nivel_confianza"] is None:
             it["nivel_confianza"] = 0.80
 
     interpretacion["detalles"]["items"] = items
+    interpretacion["normalizacion"] = normalizacion_pedido(items)
 
     # Restricciones
     restr = interpretacion["detalles"].get("restricciones", {}) or {}
-    restr["manejo_fragil"] = detectar_manejo_fragil(texto_libre)
-    restr["temperatura_controlada"] = detectar_temp_controlada(texto_libre)
-    restr["acceso_restringido"] = detectar_acceso_restringido(texto_libre)
+    restr["manejo_fragil"] = campos_local["manejo_fragil"]
+    restr["temperatura_controlada"] = campos_local["temperatura_controlada"]
+    restr["acceso_restringido"] = campos_local["acceso_restringido"]
     if "notas" not in restr or restr["notas"] is None:
         restr["notas"] = []
     if restr["manejo_fragil"]:
@@ -197,42 +229,143 @@ def postproceso_modelo(interpretacion: Dict[str, Any], texto_libre: str) -> Dict
     val["campos_obligatorios"] = campos
 
     advertencias: List[str] = val.get("advertencias", []) or []
-    advertencias.append("No se detectó SKU para los items; se requiere mapeo en la fase de coordinación.")
+    if any(not it.get("sku") for it in interpretacion["detalles"]["items"]):
+        advertencias.append("No se detectó SKU para los items; se requiere mapeo en la fase de coordinación.")
     if not interpretacion["detalles"]["direccion_entrega"].get("lat") or not interpretacion["detalles"]["direccion_entrega"].get("lng"):
         advertencias.append("No hay coordenadas (lat/lng); se recomienda geocodificación en la fase de coordinación.")
+    elif interpretacion["detalles"]["direccion_entrega"].get("precision_coordenadas") == "barrio":
+        advertencias.append("Coordenadas aproximadas (centro del barrio); se recomienda geocodificar la dirección en la fase de coordinación.")
     val["advertencias"] = list(dict.fromkeys(advertencias))  # quita duplicados
     val["ambiguedades"] = val.get("ambiguedades", []) or []
     interpretacion["validaciones"] = val
 
     return interpretacion
 
-def armar_respuesta_final(
-    texto_libre: str,
-    canal: str,
-    interpretacion: Dict[str, Any],
-    nivel_confianza: float = 0.92
-) -> Dict[str, Any]:
-    now = datetime.now(TZ)
+# Bloque normalizacion de interpretacion_IA: lo agrega el backend, el modelo no lo genera.
+# La parte estática se comparte entre respuestas (nadie la modifica); postproceso_modelo le pone
+# solo los sinónimos de los productos del pedido (normalizacion_pedido), no el catálogo entero.
+NORMALIZACION = {
+    "diccionario_sinonimos": {},
+    "reglas_tiempo": "Expresiones relativas convertidas a rango de fecha y hora en zona America/Bogota (UTC-5).",
+    "politica_unidades": "Si no se especifica, unidad = 'unidad'."
+}
+
+def normalizacion_pedido(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    nombres = dict.fromkeys(it["nombre_normalizado"] for it in items if it.get("sku"))
+    if not nombres:
+        return NORMALIZACION
+    return {**NORMALIZACION, "diccionario_sinonimos": {n: SINONIMOS[n] for n in nombres if n in SINONIMOS}}
+
+def completar_interpretacion(modelo: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Expande la salida compacta del modelo (prompts.RESPONSE_SCHEMA) al contrato completo de
+    interpretacion_IA. Los campos que calcula el backend quedan en null/False y los completa
+    postproceso_modelo; normalizacion es estática.
+    """
+    det = modelo.get("detalles") or {}
+    cliente = det.get("cliente") or {}
+    direccion = det.get("direccion_entrega") or {}
+    ventana = det.get("ventana_entrega") or {}
+    restr = det.get("restricciones") or {}
+    items = [
+        {
+            "sku": None,
+            "nombre_detectado": it.get("nombre_detectado"),
+            "nombre_normalizado": it.get("nombre_normalizado") or it.get("nombre_detectado"),
+            "cantidad": it.get("cantidad"),
+            "unidad": it.get("unidad") or "unidad",
+            "peso_kg": None,
+            "volumen_m3": None,
+            "nivel_confianza": it.get("nivel_confianza"),
+        }
+        for it in (det.get("items") or []) if isinstance(it, dict)
+    ]
     return {
-        "pedido_id": generar_pedido_id(),
-        "solicitud_cliente": "Recibir e interpretar el pedido",
-        "entrada_original": {
-            "canal": canal,
-            "timestamp_iso": now.isoformat(),
-            "texto_libre": texto_libre
+        "accion": "extraccion_pedido",
+        "detalles": {
+            "cliente": {
+                "nombre": cliente.get("nombre"), "telefono": cliente.get("telefono"), "email": cliente.get("email")
+            },
+            "direccion_entrega": {
+                "texto": direccion.get("texto"), "ciudad": direccion.get("ciudad"), "barrio": direccion.get("barrio"),
+                "observaciones_entrega": direccion.get("observaciones_entrega"), "lat": None, "lng": None,
+                "precision_coordenadas": None,
+                "nivel_confianza": direccion.get("nivel_confianza")
+            },
+            "ventana_entrega": {
+                "inicio_iso": None, "fin_iso": None,
+                "expresion_detectada": ventana.get("expresion_detectada"),
+                "nivel_confianza": ventana.get("nivel_confianza")
+            },
+            "items": items,
+            "restricciones": {
+                "manejo_fragil": False, "temperatura_controlada": False,
+                "acceso_restringido": False, "notas": list(restr.get("notas") or [])
+            }
         },
-        "interpretacion_IA": interpretacion,
-        "paso_siguiente_sugerido": {
-            "accion": "planificacion_entrega",
-            "inputs_requeridos": [
-                "Geocodificar direccion_entrega",
-                "Mapear items a SKU y validar stock",
-                "Asignar ventana exacta según capacidad de ruta"
-            ]
+        "normalizacion": NORMALIZACION,
+        "validaciones": {
+            "campos_obligatorios": {
+                "direccion_entrega": False, "ventana_entrega": False, "items": False
+            },
+            "advertencias": [],
+            "ambiguedades": list(modelo.get("ambiguedades") or [])
+        }
+    }
+
+def interpretacion_fallback(texto: str) -> dict:
+    """Interpretación local (sin modelo): items desde el catálogo y heurísticas simples."""
+    interpretacion = {
+        "accion": "extraccion_pedido",
+        "detalles": {
+            "cliente": {"nombre": None, "telefono": None, "email": None},
+            "direccion_entrega": {
+                "texto": None, "ciudad": None, "barrio": None,
+                "observaciones_entrega": None, "lat": None, "lng": None, "precision_coordenadas": None,
+                "nivel_confianza": 0.5
+            },
+            "ventana_entrega": {
+                "inicio_iso": None, "fin_iso": None,
+                "expresion_detectada": None, "nivel_confianza": 0.5
+            },
+            "items": [],
+            "restricciones": {
+                "manejo_fragil": False, "temperatura_controlada": False,
+                "acceso_restringido": False, "notas": []
+            }
         },
-        "nivel_confianza": nivel_confianza,
-        "metadatos": {
-            "version_agente": "interprete-1.0.0",
-            "uuid_operacion": generar_uuid_operacion()
+        "normalizacion": NORMALIZACION,
+        "validaciones": {
+            "campos_obligatorios": {
+                "direccion_entrega": False, "ventana_entrega": False, "items": False
+            },
+            "advertencias": [],
+            "ambiguedades": []
         }
     }
+
+    # Items desde el catálogo (una pasada sobre el texto) y fragilidad
+    interpretacion["detalles"]["items"] = CATALOGO.extraer_items(texto)
+    low = texto.lower()
+    if "frágil" in low or "fragil" in low:
+        interpretacion["detalles"]["restricciones"]["manejo_fragil"] = True
+        interpretacion["detalles"]["restricciones"]["notas"].append("Empacar frágil")
+
+    return interpretacion
+
+def armar_respuesta_final(
+    texto_libre: str,
+    canal: str,
+    interpretacion: Dict[str, Any],
+    nivel_confianza: float = 0.92,
+    ruta: Optional[str] = None,
+    puntaje_local: Optional[float] = None,
+) -> RespuestaPedido:
+    # Solo lo propio del pedido; solicitud_cliente y paso_siguiente_sugerido son constantes del registro
+    return RespuestaPedido(
+        pedido_id=generar_pedido_id(),
+        entrada_original=EntradaOriginal(canal, now_iso(), texto_libre),
+        interpretacion_IA=interpretacion,
+        nivel_confianza=nivel_confianza,
+        metadatos=Metadatos(generar_uuid_operacion(), ruta, puntaje_local),
+    )
@@ -1,17 +1,34 @@
 # ---------- app/main.py (bloque listo para pegar) ----------
 import os
 import json
+import time
+import asyncio
 from datetime import datetime
-from fastapi import FastAPI, Body, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Body, Header, HTTPException, Request
 from pydantic import BaseModel, Field
-from typing import Literal, Optional
+from typing import Literal, Optional, List
 from dotenv import load_dotenv
 from pathlib import Path
 from fastapi.staticfiles import StaticFiles
-from traceloop.sdk import Traceloop
-from traceloop.sdk.decorators import task
-from .logic import postproceso_modelo, armar_respuesta_final
-from .prompts import SYSTEM_INSTRUCTIONS
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from .logic import postproceso_modelo, armar_respuesta_final, interpretacion_fallback, completar_interpretacion
+from .respuesta import RespuestaPedido, RespuestaJSON, serializar
+from .prompts import SYSTEM_INSTRUCTIONS, INSTRUCCIONES_SISTEMA, RESPONSE_SCHEMA
+from .cache import crear_cache, clave_cache
+from .registro_pedidos import RegistroPedidos
+from .idempotencia import Idempotencia, ConflictoIdempotencia, clave_idempotencia
+from .compartido import DIRECTORIO_COMPARTIDO, nombre_proceso
+from .cliente_modelo import ClienteModelo, Circuito, LimitadorTokens, ModeloNoDisponible, COBERTURAS
+from .json_incremental import ParserJSONIncremental, JSONIncrementalError
+from .ruteo import (
+    puntaje_confianza, EstadisticasRuteo,
+    RUTA_LOCAL, RUTA_LOCAL_CONFIABLE, RUTA_MODELO, RUTA_FALLBACK,
+)
+from .metricas import (
+    etapa, activar_tracing, tarea_traceloop, exponer_metricas, lineas_contador,
+    ERRORES_MODELO, FALLBACKS, JSON_FALLIDOS,
+)
 
 
 load_dotenv()
@@ -22,28 +39,149 @@ VERTEX_REGION = os.getenv("VERTEX_REGION", "us-central1")
 PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT")
 DEBUG_MODE = os.getenv("DEBUG_MODE", "false").lower() == "true"
 MODEL_NAME = os.getenv("MODEL_NAME", "gemini-2.0-flash")
+PROMPT_COMPACTO = os.getenv("PROMPT_COMPACTO", "true").lower() == "true"  # system_instruction + response_schema
+MODEL_MAX_CONCURRENCY = int(os.getenv("MODEL_MAX_CONCURRENCY", "200"))  # llamadas a Gemini en vuelo por proceso
+MODEL_TIMEOUT_S = float(os.getenv("MODEL_TIMEOUT_S", "20"))            # timeout por llamada al modelo
+DISCONNECT_POLL_S = float(os.getenv("DISCONNECT_POLL_S", "0.25"))      # cada cuánto revisamos si el cliente se fue
+LOTE_MAX_ITEMS = int(os.getenv("LOTE_MAX_ITEMS", "500"))              # peticiones máximas por lote
+LOTE_PARALELISMO = int(os.getenv("LOTE_PARALELISMO", "16"))            # ítems de un lote procesados a la vez
+ROUTER_HABILITADO = os.getenv("ROUTER_HABILITADO", "true").lower() == "true"  # local-first antes del modelo
+ROUTER_UMBRAL = float(os.getenv("ROUTER_UMBRAL", "0.9"))               # puntaje local mínimo para no llamar al modelo
+COSTO_LLAMADA_MODELO_USD = float(os.getenv("COSTO_LLAMADA_MODELO_USD", "0"))  # para estimar el ahorro
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memoria")                   # memoria | sqlite | ninguno
+CACHE_MAX_ENTRADAS = int(os.getenv("CACHE_MAX_ENTRADAS", "1000"))
+CACHE_TTL_S = float(os.getenv("CACHE_TTL_S", "3600"))
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "/tmp/interpretaciones_cache.sqlite3")
+REGISTRO_PEDIDOS_DIR = os.getenv("REGISTRO_PEDIDOS_DIR", "")            # vacío = sin registro; un volumen montado
+REGISTRO_SEGMENTO_MB = int(os.getenv("REGISTRO_SEGMENTO_MB", "64"))      # tamaño al que rota cada segmento
+REGISTRO_MAX_SEGMENTOS = int(os.getenv("REGISTRO_MAX_SEGMENTOS", "16"))  # retención por escritor; 0 = sin límite
+IDEMPOTENCIA_TTL_S = float(os.getenv("IDEMPOTENCIA_TTL_S", "86400"))     # vigencia con header Idempotency-Key
+IDEMPOTENCIA_VENTANA_S = float(os.getenv("IDEMPOTENCIA_VENTANA_S", "0"))  # dedupe por canal+texto (opt-in); 0 = solo con header
+IDEMPOTENCIA_MAX_ENTRADAS = int(os.getenv("IDEMPOTENCIA_MAX_ENTRADAS", "10000"))
+IDEMPOTENCIA_BACKEND = os.getenv("IDEMPOTENCIA_BACKEND", "memoria")      # memoria | sqlite (compartido entre workers)
+IDEMPOTENCIA_SQLITE_PATH = os.getenv("IDEMPOTENCIA_SQLITE_PATH", "/tmp/idempotencia.sqlite3")
+MODELO_CIRCUITO_FALLOS = int(os.getenv("MODELO_CIRCUITO_FALLOS", "5"))          # fallos seguidos que abren el circuito
+MODELO_CIRCUITO_ENFRIAMIENTO_S = float(os.getenv("MODELO_CIRCUITO_ENFRIAMIENTO_S", "30"))  # abierto antes de probar de nuevo
+MODELO_CUOTA_RPM = float(os.getenv("MODELO_CUOTA_RPM", "0"))                  # llamadas por minuto al modelo; 0 = sin límite
+MODELO_CUOTA_RAFAGA = float(os.getenv("MODELO_CUOTA_RAFAGA", "10"))           # llamadas seguidas permitidas sobre la tasa
+MODELO_CUOTA_ESPERA_S = float(os.getenv("MODELO_CUOTA_ESPERA_S", "0.5"))      # espera máxima por cupo antes del fallback
+MODELO_COBERTURA = os.getenv("MODELO_COBERTURA", "false").lower() == "true"   # segunda llamada si la primera pasa del p95
+MODELO_COBERTURA_PERCENTIL = float(os.getenv("MODELO_COBERTURA_PERCENTIL", "95"))
+MODELO_SIMULADO = os.getenv("MODELO_SIMULADO", "false").lower() == "true"     # Gemini local (app/gemini_simulado.py)
+SIMULADO_LATENCIA_MS = float(os.getenv("SIMULADO_LATENCIA_MS", "800"))
+SIMULADO_TASA_ERROR = float(os.getenv("SIMULADO_TASA_ERROR", "0"))
+SIMULADO_TASA_CUOTA = float(os.getenv("SIMULADO_TASA_CUOTA", "0"))            # fracción de llamadas que responden 429
+SIMULADO_DISTRIBUCION = os.getenv("SIMULADO_DISTRIBUCION", "lognormal")       # lognormal | exponencial | fija
+SIMULADO_JITTER = float(os.getenv("SIMULADO_JITTER", "0.3"))                  # sigma de la log-normal
+SIMULADO_TASA_LENTA = float(os.getenv("SIMULADO_TASA_LENTA", "0"))            # fracción de llamadas en la cola lenta
+SIMULADO_FACTOR_LENTO = float(os.getenv("SIMULADO_FACTOR_LENTO", "10"))       # cuánto más tardan esas llamadas
 
-# App FastAPI
-app = FastAPI(title="POC Interprete Panadería", version="1.0.0")
+# ---------- Arranque perezoso (Traceloop + Vertex en segundo plano) ----------
+# Importar vertexai/traceloop e inicializar el cliente toma segundos; se hace en un hilo
+# lanzado desde el lifespan para que uvicorn atienda de inmediato las peticiones locales y
+# los estáticos. Mientras el modelo calienta, GEMINI es None y las peticiones usan el fallback.
+GEMINI = None
+ESTADO_MODELO = {"estado": "iniciando" if USE_VERTEX else "deshabilitado", "error": None, "inicializado_en_s": None}
+TRACING_ACTIVO = False
+_T_ARRANQUE = time.perf_counter()
 
-Traceloop.init(
-    disable_batch=True,
-    api_key=os.getenv("TRACELOOP_API_KEY"),
-)
+def _init_traceloop() -> None:
+    global TRACING_ACTIVO
+    if not (os.getenv("TRACELOOP_API_KEY") or os.getenv("TRACELOOP_BASE_URL")):
+        return
+    try:
+        from traceloop.sdk import Traceloop
+        from opentelemetry import trace
+        Traceloop.init(
+            disable_batch=True,
+            api_key=os.getenv("TRACELOOP_API_KEY"),
+        )
+        # Con tracing activo, cada etapa medida abre un span hijo de interpretar_pedido_span
+        activar_tracing(trace.get_tracer("interprete-panaderia"))
+        TRACING_ACTIVO = True
+    except Exception as e:
+        print("Traceloop no disponible, se sigue sin tracing. Error:", e)
 
-# Vertex init (opcional según USE_VERTEX)
-GEMINI = None
-if USE_VERTEX:
+def _init_vertex() -> None:
+    global GEMINI, USE_VERTEX
     try:
         from vertexai import init as vertex_init
         from vertexai.generative_models import GenerativeModel
         vertex_init(project=PROJECT_ID, location=VERTEX_REGION)
         # Puedes usar "gemini-1.5-flash" en desarrollo si prefieres menor latencia/costo
-        GEMINI = GenerativeModel(MODEL_NAME)
+        # Con el prompt compacto las instrucciones viajan como system_instruction, no en cada contenido
+        GEMINI = GenerativeModel(MODEL_NAME, system_instruction=INSTRUCCIONES_SISTEMA) if PROMPT_COMPACTO else GenerativeModel(MODEL_NAME)
+        ESTADO_MODELO["estado"] = "listo"
     except Exception as e:
         print("Vertex no disponible, se usará fallback local. Error:", e)
         GEMINI = None
         USE_VERTEX = False
+        ESTADO_MODELO.update(estado="error", error=str(e))
+    ESTADO_MODELO["inicializado_en_s"] = round(time.perf_counter() - _T_ARRANQUE, 3)
+
+def _init_simulado() -> None:
+    # Sin red ni credenciales: mismo contrato que GenerativeModel, latencia y errores configurables
+    global GEMINI
+    from .gemini_simulado import GeminiSimulado
+    GEMINI = GeminiSimulado(
+        latencia_ms=SIMULADO_LATENCIA_MS, tasa_error=SIMULADO_TASA_ERROR, tasa_cuota=SIMULADO_TASA_CUOTA,
+        distribucion=SIMULADO_DISTRIBUCION, jitter=SIMULADO_JITTER,
+        tasa_lenta=SIMULADO_TASA_LENTA, factor_lento=SIMULADO_FACTOR_LENTO,
+    )
+    ESTADO_MODELO.update(estado="listo", inicializado_en_s=round(time.perf_counter() - _T_ARRANQUE, 3))
+
+def _calentar() -> None:
+    # Traceloop primero: instrumenta vertexai al importarlo
+    _init_traceloop()
+    if USE_VERTEX:
+        _init_simulado() if MODELO_SIMULADO else _init_vertex()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    calentamiento = asyncio.get_running_loop().run_in_executor(None, _calentar)
+    yield
+    if not calentamiento.done():
+        calentamiento.cancel()
+    if REGISTRO is not None:
+        REGISTRO.cerrar()
+
+# App FastAPI
+app = FastAPI(title="POC Interprete Panadería", version="1.0.0", lifespan=lifespan)
+
+# Caché de interpretaciones del modelo (None si CACHE_BACKEND=ninguno)
+CACHE = crear_cache(CACHE_BACKEND, CACHE_MAX_ENTRADAS, CACHE_TTL_S, CACHE_SQLITE_PATH)
+# Contadores del ruteo local-first
+RUTEO = EstadisticasRuteo()
+# Respuestas ya emitidas y ejecuciones en vuelo, para deduplicar reintentos
+IDEMPOTENCIA = Idempotencia(
+    IDEMPOTENCIA_MAX_ENTRADAS, IDEMPOTENCIA_TTL_S, IDEMPOTENCIA_VENTANA_S,
+    ruta_sqlite=IDEMPOTENCIA_SQLITE_PATH if IDEMPOTENCIA_BACKEND.lower() == "sqlite" else None,
+    plazo_en_vuelo_s=MODEL_TIMEOUT_S + 10,
+)
+# Circuito, cuota y cobertura de las llamadas al modelo
+# Con varios workers el token bucket vive en el directorio compartido: la cuota es del proyecto, no del proceso
+CLIENTE_MODELO = ClienteModelo(
+    Circuito(MODELO_CIRCUITO_FALLOS, MODELO_CIRCUITO_ENFRIAMIENTO_S),
+    LimitadorTokens(
+        MODELO_CUOTA_RPM / 60.0, MODELO_CUOTA_RAFAGA,
+        ruta=os.path.join(DIRECTORIO_COMPARTIDO, "limitador-modelo.bin") if DIRECTORIO_COMPARTIDO else None,
+    ) if MODELO_CUOTA_RPM > 0 else None,
+    espera_cuota_s=MODELO_CUOTA_ESPERA_S,
+    cobertura=MODELO_COBERTURA,
+    percentil_cobertura=MODELO_COBERTURA_PERCENTIL,
+)
+# Log durable de respuestas emitidas (None si REGISTRO_PEDIDOS_DIR está vacío)
+# Con varios workers cada proceso escribe su propia subcarpeta y lee las de los demás
+REGISTRO = (
+    RegistroPedidos(
+        REGISTRO_PEDIDOS_DIR, REGISTRO_SEGMENTO_MB * 1024 * 1024,
+        escritor=nombre_proceso() if DIRECTORIO_COMPARTIDO else None,
+        max_segmentos=REGISTRO_MAX_SEGMENTOS,
+    )
+    if REGISTRO_PEDIDOS_DIR else None
+)
+if REGISTRO_PEDIDOS_DIR.startswith("/tmp"):
+    print(f"[WARN] REGISTRO_PEDIDOS_DIR={REGISTRO_PEDIDOS_DIR}: en Cloud Run /tmp es memoria y se pierde con la instancia")
 
 # --------- Modelo de request (agrego usar_modelo opcional por solicitud) ----------
 class Peticion(BaseModel):
@@ -51,10 +189,212 @@ class Peticion(BaseModel):
     canal: Literal["formulario_web","whatsapp","email","telefono","otro"] = "formulario_web"
     usar_modelo: Optional[bool] = None  # Si lo envías, sobrescribe USE_VERTEX por request
 
-# ------------------------ ENDPOINT PRINCIPAL ------------------------
-@app.post("/interpretar", name="interpretar_pedido")
-@task(name="interpretar_pedido_span")
-def interpretar(peticion: Peticion = Body(...)):
+# ---------- Llamado asíncrono a Gemini (no bloquea workers del threadpool) ----------
+# Se crea perezosamente para quedar ligado al event loop que atiende las peticiones
+_SEMAFORO_MODELO: Optional[asyncio.Semaphore] = None
+
+def _semaforo_modelo() -> asyncio.Semaphore:
+    global _SEMAFORO_MODELO
+    if _SEMAFORO_MODELO is None:
+        _SEMAFORO_MODELO = asyncio.Semaphore(MODEL_MAX_CONCURRENCY)
+    return _SEMAFORO_MODELO
+
+GENERATION_CONFIG = {
+    "temperature": 0.2,
+    "max_output_tokens": 1024,
+    "response_mime_type": "application/json",
+}
+if PROMPT_COMPACTO:
+    # El esquema fija la forma de la salida: solo lo que el modelo extrae; el resto lo completa el backend
+    GENERATION_CONFIG["response_schema"] = RESPONSE_SCHEMA
+
+# Versión del prompt para la llave de la caché: cambia si cambian instrucciones o esquema
+PROMPT_ACTIVO = (
+    INSTRUCCIONES_SISTEMA + json.dumps(RESPONSE_SCHEMA, sort_keys=True) if PROMPT_COMPACTO else SYSTEM_INSTRUCTIONS
+)
+
+def _contenidos_modelo(texto: str) -> list:
+    # Lista de strings, sin Part/Content
+    if PROMPT_COMPACTO:
+        return [f"Texto del cliente:\n\n{texto}"]
+    return [
+        SYSTEM_INSTRUCTIONS,
+        f"Texto del cliente:\n\n{texto}\n\nDevuelve SOLO el JSON del campo interpretacion_IA."
+    ]
+
+def _desde_modelo(datos) -> Optional[dict]:
+    """Lleva la salida del modelo al contrato completo de interpretacion_IA."""
+    if not isinstance(datos, dict):
+        return None
+    return completar_interpretacion(datos) if PROMPT_COMPACTO else datos
+
+def _texto_respuesta(resp) -> Optional[str]:
+    try:
+        raw = resp.text
+    except Exception:
+        raw = None
+    # Fallback por si .text viniera vacío
+    if not raw:
+        try:
+            raw = resp.candidates[0].content.parts[0].text
+        except Exception:
+            raw = None
+    return raw
+
+def _debug_raw(raw: Optional[str]) -> None:
+    # DEBUG: imprime el JSON crudo del modelo antes del postproceso
+    if DEBUG_MODE:
+        print("\n========== DEBUG: RESPUESTA CRUDA DEL MODELO ==========")
+        print(raw if raw is not None else "<VACÍO>")
+        print("=======================================================\n")
+
+async def llamar_modelo(texto: str) -> Optional[dict]:
+    """
+    Pide a Gemini la interpretación del texto. Respeta el límite de concurrencia
+    (MODEL_MAX_CONCURRENCY), el timeout por llamada (MODEL_TIMEOUT_S), el circuito y la cuota.
+    Retorna el dict de interpretacion_IA o None si el modelo falla o no responde a tiempo.
+    """
+    if GEMINI is None:
+        return None
+    try:
+        async with CLIENTE_MODELO.sesion(), _semaforo_modelo():
+            with etapa("modelo"):
+                t0 = time.perf_counter()
+                resp = await asyncio.wait_for(
+                    CLIENTE_MODELO.llamar(
+                        lambda: GEMINI.generate_content_async(_contenidos_modelo(texto), generation_config=GENERATION_CONFIG)
+                    ),
+                    timeout=MODEL_TIMEOUT_S,
+                )
+                RUTEO.registrar_llamada_modelo(time.perf_counter() - t0)
+        raw = _texto_respuesta(resp)
+        _debug_raw(raw)
+        if not raw:
+            ERRORES_MODELO.incrementar("respuesta_vacia")
+            return None
+    except ModeloNoDisponible as e:
+        # Circuito abierto o sin cupo: fallback inmediato, sin pagar el timeout
+        ERRORES_MODELO.incrementar(e.motivo)
+        return None
+    except asyncio.TimeoutError:
+        ERRORES_MODELO.incrementar("timeout")
+        print(f"Timeout Vertex ({MODEL_TIMEOUT_S}s), se usará fallback local.")
+        return None
+    except Exception as e:
+        ERRORES_MODELO.incrementar("excepcion")
+        print("Error Vertex:", e)
+        return None
+
+    with etapa("json_parse"):
+        try:
+            return _desde_modelo(json.loads(raw))
+        except ValueError as e:
+            JSON_FALLIDOS.incrementar()
+            print("JSON inválido del modelo:", e)
+            return None
+
+def _evento_parcial(ruta: tuple, valor) -> dict:
+    evento = {"campo": ruta[1], "valor": valor}
+    if len(ruta) > 2:
+        evento["indice"] = ruta[2]
+    return evento
+
+async def llamar_modelo_stream(texto: str, parciales: asyncio.Queue) -> Optional[dict]:
+    """
+    Igual que llamar_modelo pero con generación en streaming: el JSON se valida a medida que
+    llegan los trozos y cada bloque de interpretacion_IA que se completa (cliente, dirección,
+    ventana, cada item, restricciones) se publica en `parciales`. Si el texto deja de ser JSON
+    válido se corta el stream de inmediato y se retorna None (fallback local).
+    """
+    if GEMINI is None:
+        return None
+    parser = ParserJSONIncremental()
+    stream = None
+    try:
+        async with CLIENTE_MODELO.sesion(), _semaforo_modelo():
+            with etapa("modelo"):
+                t0 = time.perf_counter()
+                async with asyncio.timeout(MODEL_TIMEOUT_S):
+                    stream = await GEMINI.generate_content_async(
+                        _contenidos_modelo(texto), generation_config=GENERATION_CONFIG, stream=True
+                    )
+                    async for trozo in stream:
+                        raw = _texto_respuesta(trozo)
+                        if raw:
+                            for ruta, valor in parser.alimentar(raw):
+                                parciales.put_nowait(_evento_parcial(ruta, valor))
+                RUTEO.registrar_llamada_modelo(time.perf_counter() - t0)
+        return _desde_modelo(parser.resultado())
+    except ModeloNoDisponible as e:
+        ERRORES_MODELO.incrementar(e.motivo)
+    except JSONIncrementalError as e:
+        JSON_FALLIDOS.incrementar()
+        print("JSON inválido del modelo (stream):", e)
+    except TimeoutError:
+        ERRORES_MODELO.incrementar("timeout")
+        print(f"Timeout Vertex ({MODEL_TIMEOUT_S}s), se usará fallback local.")
+    except Exception as e:
+        ERRORES_MODELO.incrementar("excepcion")
+        print("Error Vertex:", e)
+    finally:
+        if stream is not None and hasattr(stream, "aclose"):
+            await stream.aclose()
+    return None
+
+async def _cancelar_si_desconecta(coro, request: Optional[Request]):
+    """
+    Ejecuta `coro` y lo cancela si el cliente HTTP cierra la conexión antes de que termine,
+    así no seguimos pagando una llamada al modelo que nadie va a leer.
+    """
+    tarea = asyncio.ensure_future(coro)
+    if request is None:
+        return await tarea
+    try:
+        while True:
+            hechas, _ = await asyncio.wait({tarea}, timeout=DISCONNECT_POLL_S)
+            if hechas:
+                return tarea.result()
+            if await request.is_disconnected():
+                tarea.cancel()
+                raise HTTPException(status_code=499, detail="Cliente desconectado.")
+    finally:
+        if not tarea.done():
+            tarea.cancel()
+
+async def interpretar_con_modelo(
+    texto: str,
+    request: Optional[Request] = None,
+    parciales: Optional[asyncio.Queue] = None,
+) -> Optional[dict]:
+    """
+    Consulta la caché y, si no hay entrada, llama al modelo y guarda su respuesta.
+    Con `parciales`, la llamada es en streaming y publica los bloques a medida que se completan.
+    """
+    clave = clave_cache(texto, MODEL_NAME, PROMPT_ACTIVO) if CACHE is not None else None
+    if clave is not None:
+        with etapa("cache"):
+            interpretacion = CACHE.obtener(clave)
+        if interpretacion is not None:
+            return interpretacion
+
+    llamada = llamar_modelo(texto) if parciales is None else llamar_modelo_stream(texto, parciales)
+    interpretacion = await _cancelar_si_desconecta(llamada, request)
+    if interpretacion and clave is not None:
+        CACHE.guardar(clave, interpretacion)
+    return interpretacion
+
+# ------------------------ PIPELINE DE UNA PETICIÓN ------------------------
+def _interpretacion_local(texto: str) -> dict:
+    with etapa("fallback_local"):
+        interpretacion = interpretacion_fallback(texto)
+    with etapa("postproceso"):
+        return postproceso_modelo(interpretacion, texto)
+
+async def procesar_peticion(
+    peticion: Peticion,
+    request: Optional[Request] = None,
+    parciales: Optional[asyncio.Queue] = None,
+) -> RespuestaPedido:
     texto = (peticion.texto_libre or "").strip()
     if not texto:
         raise HTTPException(status_code=400, detail="texto_libre vacío.")
@@ -63,108 +403,268 @@ def interpretar(peticion: Peticion = Body(...)):
     usar_modelo = peticion.usar_modelo if peticion.usar_modelo is not None else USE_VERTEX
 
     interpretacion = None
+    local = None
+    puntaje_local = None
+    ruta = RUTA_LOCAL
 
-    # ---------- Llamado a Gemini (fix: lista de strings, sin Part/Content) ----------
     if usar_modelo and GEMINI is not None:
+        # ---------- Ruteo local-first: si las heurísticas bastan, no llamamos al modelo ----------
+        # Solo cuando la petición no eligió: usar_modelo=true explícito siempre va al modelo
+        if ROUTER_HABILITADO and peticion.usar_modelo is None:
+            local = _interpretacion_local(texto)
+            puntaje_local = puntaje_confianza(local)
+            if puntaje_local >= ROUTER_UMBRAL:
+                interpretacion = local
+                ruta = RUTA_LOCAL_CONFIABLE
+
+        # ---------- Llamado a Gemini (caché + async, con límite de concurrencia y timeout) ----------
+        if interpretacion is None:
+            modelo = await interpretar_con_modelo(texto, request, parciales)
+            if modelo:
+                # ---------- Postproceso local (tiempos, dirección, validaciones, etc.) ----------
+                with etapa("postproceso"):
+                    interpretacion = postproceso_modelo(modelo, texto)
+                ruta = RUTA_MODELO
+            else:
+                ruta = RUTA_FALLBACK
+                FALLBACKS.incrementar()
+
+    # ---------- Fallback local si no hubo modelo o falló ----------
+    if interpretacion is None:
+        if local is None:
+            local = _interpretacion_local(texto)
+        interpretacion = local
+        if puntaje_local is None:
+            puntaje_local = puntaje_confianza(interpretacion)
+    RUTEO.registrar(ruta)
+
+    # ---------- Ensamble final (contrato JSON de salida) ----------
+    with etapa("armar_respuesta"):
+        respuesta = armar_respuesta_final(
+            texto_libre=texto,
+            canal=peticion.canal,
+            interpretacion=interpretacion,
+            nivel_confianza=0.92,
+            ruta=ruta,
+            puntaje_local=puntaje_local,
+        )
+    # ---------- Registro durable (lo escribe un hilo aparte, no bloquea la respuesta) ----------
+    if REGISTRO is not None:
+        REGISTRO.registrar(respuesta)
+    return respuesta
+
+# ------------------------ ENDPOINT PRINCIPAL ------------------------
+@app.post("/interpretar", name="interpretar_pedido", response_class=RespuestaJSON)
+@tarea_traceloop("interpretar_pedido_span")
+async def interpretar(
+    request: Request,
+    peticion: Peticion = Body(...),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """
+    Los reintentos con el mismo Idempotency-Key (o el mismo canal + texto dentro de
+    IDEMPOTENCIA_VENTANA_S, si se habilita) reciben la misma respuesta y pedido_id sin volver a
+    procesar; la misma Idempotency-Key con otro cuerpo es 422.
+    La respuesta se serializa directo (RespuestaJSON), sin jsonable_encoder.
+    """
+    if not idempotency_key and IDEMPOTENCIA_VENTANA_S <= 0:
+        return RespuestaJSON(await procesar_peticion(peticion, request))
+    clave, explicita, huella = clave_idempotencia(
+        peticion.canal, (peticion.texto_libre or "").strip(), peticion.usar_modelo, idempotency_key
+    )
+    try:
+        respuesta, repetida = await IDEMPOTENCIA.ejecutar(
+            clave, explicita, lambda: procesar_peticion(peticion, request), huella
+        )
+    except ConflictoIdempotencia as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return RespuestaJSON(respuesta, headers={"Idempotent-Replayed": "true"} if repetida else None)
+
+# ------------------------ ENDPOINT CON STREAMING (SSE) ------------------------
+def _sse(evento: str, datos) -> str:
+    return f"event: {evento}\ndata: {serializar(datos).decode('utf-8')}\n\n"
+
+@app.post("/interpretar/stream", name="interpretar_pedido_stream")
+@tarea_traceloop("interpretar_pedido_stream_span")
+async def interpretar_stream(peticion: Peticion = Body(...)):
+    """
+    Server-sent events: `parcial` por cada bloque de la interpretación del modelo apenas se
+    completa (cliente, direccion_entrega, ventana_entrega, items[i], restricciones) y `final`
+    con la respuesta completa, igual a la de /interpretar. Si la ruta es local solo llega `final`.
+    """
+    if not (peticion.texto_libre or "").strip():
+        raise HTTPException(status_code=400, detail="texto_libre vacío.")
+
+    parciales: asyncio.Queue = asyncio.Queue()
+    tarea = asyncio.ensure_future(procesar_peticion(peticion, parciales=parciales))
+
+    async def eventos():
         try:
-            resp = GEMINI.generate_content(
-                [
-                    SYSTEM_INSTRUCTIONS,
-                    f"Texto del cliente:\n\n{texto}\n\nDevuelve SOLO el JSON del campo interpretacion_IA."
-                ],
-                generation_config={
-                    "temperature": 0.2,
-                    "max_output_tokens": 1024,
-                    "response_mime_type": "application/json",
-                },
-            )
-            raw = resp.text
-
-            # Fallback por si .text viniera vacío
-            if not raw:
+            while True:
+                siguiente = asyncio.ensure_future(parciales.get())
+                hechas, _ = await asyncio.wait({siguiente, tarea}, return_when=asyncio.FIRST_COMPLETED)
+                if siguiente in hechas:
+                    yield _sse("parcial", siguiente.result())
+                    continue
+                siguiente.cancel()
+                while not parciales.empty():
+                    yield _sse("parcial", parciales.get_nowait())
                 try:
-                    raw = resp.candidates[0].content.parts[0].text
-                except Exception:
-                    raw = None
+                    yield _sse("final", tarea.result())
+                except HTTPException as e:
+                    yield _sse("error", {"status": e.status_code, "detalle": e.detail})
+                except Exception as e:
+                    yield _sse("error", {"status": 500, "detalle": str(e)})
+                return
+        finally:
+            # Cliente desconectado: no seguimos pagando el stream del modelo
+            if not tarea.done():
+                tarea.cancel()
 
-            # DEBUG: imprime el JSON crudo del modelo antes del postproceso
-            if DEBUG_MODE:
-                print("\n========== DEBUG: RESPUESTA CRUDA DEL MODELO ==========")
-                print(raw if raw is not None else "<VACÍO>")
-                print("=======================================================\n")
-
-            if raw:
-                interpretacion = json.loads(raw)
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
+# ------------------------ ENDPOINT POR LOTES ------------------------
+async def _procesar_item_lote(indice: int, peticion: Peticion, semaforo: asyncio.Semaphore) -> dict:
+    """Procesa un ítem del lote; los errores se reportan en el resultado sin abortar el lote."""
+    async with semaforo:
+        try:
+            return {"indice": indice, "ok": True, "respuesta": await procesar_peticion(peticion)}
+        except HTTPException as e:
+            return {"indice": indice, "ok": False, "error": {"status": e.status_code, "detalle": e.detail}}
         except Exception as e:
-            print("Error Vertex:", e)
+            return {"indice": indice, "ok": False, "error": {"status": 500, "detalle": str(e)}}
 
-    # ---------- Fallback local si no hubo modelo o falló ----------
-    if not interpretacion:
-        interpretacion = {
-            "accion": "extraccion_pedido",
-            "detalles": {
-                "cliente": {"nombre": None, "telefono": None, "email": None},
-                "direccion_entrega": {
-                    "texto": None, "ciudad": None, "barrio": None,
-                    "observaciones_entrega": None, "lat": None, "lng": None, "nivel_confianza": 0.5
-                },
-                "ventana_entrega": {
-                    "inicio_iso": None, "fin_iso": None,
-                    "expresion_detectada": None, "nivel_confianza": 0.5
-                },
-                "items": [],
-                "restricciones": {
-                    "manejo_fragil": False, "temperatura_controlada": False,
-                    "acceso_restringido": False, "notas": []
-                }
-            },
-            "normalizacion": {
-                "diccionario_sinonimos": {
-                    "buñuelos": ["bunuelos", "buñuelo"],
-                    "arepas de maíz": ["arepas", "arepa de maiz"]
-                },
-                "reglas_tiempo": "Expresiones relativas convertidas a rango de fecha y hora en zona America/Bogota (UTC-5).",
-                "politica_unidades": "Si no se especifica, unidad = 'unidad'."
-            },
-            "validaciones": {
-                "campos_obligatorios": {
-                    "direccion_entrega": False, "ventana_entrega": False, "items": False
-                },
-                "advertencias": [],
-                "ambiguedades": []
-            }
-        }
-
-        # Heurística simple para items y fragilidad
-        import re
-        for cant, nombre in re.findall(r"(\d+)\s+([a-záéíóúñ\s]+?)(?:,|\.|\by\b|$)", texto.lower()):
-            nombre = nombre.strip()
-            if any(x in nombre for x in ["buñuelo","bunuelos","buñuelos"]):
-                interpretacion["detalles"]["items"].append({
-                    "sku": None, "nombre_detectado": "buñuelos", "nombre_normalizado": "Buñuelos",
-                    "cantidad": int(cant), "unidad": "unidad", "peso_kg": None, "volumen_m3": None, "nivel_confianza": 0.9
-                })
-            if any(x in nombre for x in ["arepa","arepas","arepa de maiz","arepas de maiz","arepas de maíz"]):
-                interpretacion["detalles"]["items"].append({
-                    "sku": None, "nombre_detectado": "arepas de maíz", "nombre_normalizado": "Arepas de maíz",
-                    "cantidad": int(cant), "unidad": "unidad", "peso_kg": None, "volumen_m3": None, "nivel_confianza": 0.9
-                })
-        if "frágil" in texto.lower() or "fragil" in texto.lower():
-            interpretacion["detalles"]["restricciones"]["manejo_fragil"] = True
-            interpretacion["detalles"]["restricciones"]["notas"].append("Empacar frágil")
-
-    # ---------- Postproceso local (tiempos, dirección, validaciones, etc.) ----------
-    interpretacion = postproceso_modelo(interpretacion, texto)
+@app.post("/interpretar/lote", name="interpretar_lote", response_class=RespuestaJSON)
+@tarea_traceloop("interpretar_lote_span")
+async def interpretar_lote(
+    request: Request,
+    peticiones: List[Peticion] = Body(...),
+    formato: Literal["json", "ndjson"] = "json",
+):
+    """
+    Interpreta varias peticiones en paralelo (máx. LOTE_PARALELISMO a la vez).
+    formato=json   -> un solo JSON con los resultados en el orden de entrada.
+    formato=ndjson -> una línea JSON por ítem, emitida apenas termina (orden de llegada).
+    """
+    if not peticiones:
+        raise HTTPException(status_code=400, detail="El lote está vacío.")
+    if len(peticiones) > LOTE_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"El lote supera el máximo de {LOTE_MAX_ITEMS} peticiones.")
 
-    # ---------- Ensamble final (contrato JSON de salida) ----------
-    respuesta = armar_respuesta_final(
-        texto_libre=texto,
-        canal=peticion.canal,
-        interpretacion=interpretacion,
-        nivel_confianza=0.92
+    semaforo = asyncio.Semaphore(LOTE_PARALELISMO)
+    tareas = [asyncio.ensure_future(_procesar_item_lote(i, p, semaforo)) for i, p in enumerate(peticiones)]
+
+    if formato == "ndjson":
+        async def emitir():
+            try:
+                for siguiente in asyncio.as_completed(tareas):
+                    resultado = await siguiente
+                    yield serializar(resultado) + b"\n"
+            finally:
+                # Si el cliente se desconecta a mitad del stream, no seguimos gastando en el resto
+                for t in tareas:
+                    if not t.done():
+                        t.cancel()
+        return StreamingResponse(emitir(), media_type="application/x-ndjson")
+
+    async def reunir():
+        return await asyncio.gather(*tareas)
+
+    try:
+        # Igual que en ndjson: si el cliente se va antes de la respuesta, cancelamos lo pendiente
+        resultados = await _cancelar_si_desconecta(reunir(), request)
+    finally:
+        for t in tareas:
+            if not t.done():
+                t.cancel()
+    return RespuestaJSON({
+        "total": len(resultados),
+        "exitosos": sum(1 for r in resultados if r["ok"]),
+        "fallidos": sum(1 for r in resultados if not r["ok"]),
+        "resultados": resultados,
+    })
+
+# ------------------------ SALUD / READINESS ------------------------
+@app.get("/salud/vivo", name="salud_vivo")
+def salud_vivo():
+    return {"vivo": True, "proceso": nombre_proceso()}
+
+@app.get("/salud/listo", name="salud_listo")
+def salud_listo(requiere_modelo: bool = False):
+    """
+    Readiness: el servicio atiende desde el arranque (ruta local). Con requiere_modelo=true
+    responde 503 hasta que el cliente de Vertex esté listo, útil como startup probe.
+    """
+    modelo_listo = GEMINI is not None
+    cuerpo = {
+        "listo": modelo_listo or not requiere_modelo,
+        "modelo": {
+            "nombre": MODEL_NAME, "disponible": modelo_listo, **ESTADO_MODELO,
+            "circuito": CLIENTE_MODELO.circuito.estado,
+        },
+        "tracing": TRACING_ACTIVO,
+    }
+    if requiere_modelo and not modelo_listo:
+        raise HTTPException(status_code=503, detail=cuerpo)
+    return cuerpo
+
+@app.get("/metrics", name="metricas", response_class=PlainTextResponse)
+def metricas():
+    extra = lineas_contador(
+        "interprete_interpretaciones_total", "Peticiones interpretadas por ruta.", RUTEO.por_ruta, "ruta"
     )
-    return respuesta
+    if CACHE is not None:
+        est = CACHE.estadisticas()
+        extra += lineas_contador("interprete_cache_total", "Consultas a la caché del modelo por resultado.",
+                                 {"hit": est["hits"], "miss": est["misses"]}, "resultado")
+    est = IDEMPOTENCIA.estadisticas()
+    extra += lineas_contador("interprete_idempotencia_total", "Peticiones /interpretar por resultado de deduplicación.",
+                             {k: est[k] for k in ("ejecutadas", "repetidas", "coalescidas", "conflictos")}, "resultado")
+    extra += COBERTURAS.exponer()
+    extra += [
+        "# HELP interprete_modelo_circuito_abierto 1 si el circuito del modelo de este proceso no está cerrado.",
+        "# TYPE interprete_modelo_circuito_abierto gauge",
+        f"interprete_modelo_circuito_abierto {int(CLIENTE_MODELO.circuito.estado != 'cerrado')}",
+    ]
+    return PlainTextResponse(exponer_metricas(extra), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/ruteo/estadisticas", name="estadisticas_ruteo")
+def estadisticas_ruteo():
+    return RUTEO.resumen(COSTO_LLAMADA_MODELO_USD)
+
+@app.get("/cache/estadisticas", name="estadisticas_cache")
+def estadisticas_cache():
+    if CACHE is None:
+        return {"backend": None}
+    return CACHE.estadisticas()
+
+@app.get("/modelo/estadisticas", name="estadisticas_modelo")
+def estadisticas_modelo():
+    return CLIENTE_MODELO.estadisticas()
+
+@app.get("/idempotencia/estadisticas", name="estadisticas_idempotencia")
+def estadisticas_idempotencia():
+    return IDEMPOTENCIA.estadisticas()
+
+# ------------------------ CONSULTA DE PEDIDOS REGISTRADOS ------------------------
+@app.get("/pedidos/estadisticas", name="estadisticas_registro")
+def estadisticas_registro():
+    if REGISTRO is None:
+        return {"habilitado": False}
+    return {"habilitado": True, **REGISTRO.estadisticas()}
+
+@app.get("/pedidos/{pedido_id}", name="obtener_pedido", response_class=RespuestaJSON)
+def obtener_pedido(pedido_id: str):
+    if REGISTRO is None:
+        raise HTTPException(status_code=404, detail="Registro de pedidos deshabilitado.")
+    respuesta = REGISTRO.leer(pedido_id)
+    if respuesta is None:
+        raise HTTPException(status_code=404, detail=f"Pedido {pedido_id} no encontrado.")
+    return RespuestaJSON(respuesta)
 # ---------- fin del bloque ----------
 BASE_DIR = Path(__file__).resolve().parents[1]   # carpeta raíz del proyecto
 WEB_DIR = BASE_DIR / "web"                       # <raíz>/web/index.html
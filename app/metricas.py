@@ -0,0 +1,199 @@
+import time
+import bisect
+import functools
+from typing import Dict, Tuple, List, Optional
+
+from .compartido import ALMACEN
+
+# ---------- Métricas (formato de exposición de Prometheus) ----------
+# Histogramas y contadores con ranuras preasignadas en el almacén del proceso (app/compartido.py):
+# observar una latencia es un bisect y tres sumas sobre ranuras que ya existen, sin crear objetos por
+# petición. Con varios workers la exposición suma los valores de todos los procesos.
+
+_SEP = "\x1f"            # separa nombre, etiqueta y campo en las claves del almacén
+_SEP_ETIQUETAS = "\x1e"  # separa los valores de varias etiquetas de un contador
+
+BUCKETS_LATENCIA_S = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+
+
+def _etiquetas(nombres: Tuple[str, ...], valores: Tuple[str, ...], extra: str = "") -> str:
+    partes = [f'{n}="{v}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+class Histograma:
+    def __init__(self, nombre: str, ayuda: str, etiqueta: str, buckets: Tuple[float, ...] = BUCKETS_LATENCIA_S):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiqueta = etiqueta
+        self.buckets = buckets
+        # valor de etiqueta -> (ranuras por bucket (+Inf al final), ranura de la suma, ranura del total)
+        self._series: Dict[str, tuple] = {}
+
+    def _serie(self, valor: str) -> tuple:
+        serie = self._series.get(valor)
+        if serie is None:
+            base = self.nombre + _SEP + valor + _SEP
+            serie = self._series[valor] = (
+                [ALMACEN.ranura(f"{base}b{i}") for i in range(len(self.buckets) + 1)],
+                ALMACEN.ranura(base + "sum"),
+                ALMACEN.ranura(base + "count"),
+            )
+        return serie
+
+    def observar(self, valor_etiqueta: str, segundos: float) -> None:
+        buckets, suma, total = self._serie(valor_etiqueta)
+        ALMACEN.observar(buckets[bisect.bisect_left(self.buckets, segundos)], suma, total, segundos)
+
+    def series(self) -> Dict[str, list]:
+        """Valor de etiqueta -> [conteos por bucket, suma, total], sumando todos los procesos."""
+        n = len(self.buckets) + 1
+        series: Dict[str, list] = {}
+        for clave, v in ALMACEN.valores(self.nombre + _SEP).items():
+            _, valor, campo = clave.split(_SEP)
+            serie = series.setdefault(valor, [[0] * n, 0, 0])
+            if campo == "sum":
+                serie[1] = v
+            elif campo == "count":
+                serie[2] = v
+            else:
+                serie[0][int(campo[1:])] = v
+        return series
+
+    def exponer(self) -> List[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        nombres = (self.etiqueta,)
+        for valor, (conteos, suma, total) in sorted(self.series().items()):
+            acumulado = 0
+            for limite, c in zip(self.buckets + (float("inf"),), conteos):
+                acumulado += c
+                le = 'le="+Inf"' if limite == float("inf") else f'le="{limite!r}"'
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(nombres, (valor,), le)} {acumulado}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(nombres, (valor,))} {suma!r}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(nombres, (valor,))} {total}")
+        return lineas
+
+
+class Contador:
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self._ranuras: Dict[Tuple[str, ...], int] = {}
+
+    def incrementar(self, *valores_etiquetas: str, cantidad: float = 1) -> None:
+        ranura = self._ranuras.get(valores_etiquetas)
+        if ranura is None:
+            ranura = self._ranuras[valores_etiquetas] = ALMACEN.ranura(
+                self.nombre + _SEP + _SEP_ETIQUETAS.join(valores_etiquetas)
+            )
+        ALMACEN.sumar(ranura, cantidad)
+
+    def valores(self) -> Dict[Tuple[str, ...], float]:
+        """Valores por combinación de etiquetas, sumando todos los procesos."""
+        prefijo = self.nombre + _SEP
+        return {
+            (tuple(clave[len(prefijo):].split(_SEP_ETIQUETAS)) if self.etiquetas else ()): v
+            for clave, v in ALMACEN.valores(prefijo).items()
+        }
+
+    def valor(self, *valores_etiquetas: str) -> float:
+        return self.valores().get(valores_etiquetas, 0)
+
+    def exponer(self) -> List[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} counter"]
+        valores = self.valores()
+        if not valores and not self.etiquetas:
+            lineas.append(f"{self.nombre} 0")
+        for etiquetas, v in sorted(valores.items()):
+            lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, etiquetas)} {v}")
+        return lineas
+
+
+# Métricas del servicio
+LATENCIA_ETAPA = Histograma(
+    "interprete_etapa_duracion_segundos",
+    "Duración de cada etapa del pipeline de interpretación.",
+    etiqueta="etapa",
+)
+ERRORES_MODELO = Contador("interprete_modelo_errores_total", "Llamadas al modelo fallidas por tipo.", ("tipo",))
+FALLBACKS = Contador("interprete_fallbacks_total", "Peticiones que intentaron el modelo y usaron el fallback local.")
+JSON_FALLIDOS = Contador("interprete_json_parse_errores_total", "Respuestas del modelo que no eran JSON válido.")
+
+METRICAS = [LATENCIA_ETAPA, ERRORES_MODELO, FALLBACKS, JSON_FALLIDOS]
+
+
+# ---------- Medición de etapas (+ span hijo si el tracing está activo) ----------
+_TRACER = None
+
+
+def activar_tracing(tracer) -> None:
+    """Con un tracer de OpenTelemetry, cada etapa medida abre además un span hijo."""
+    global _TRACER
+    _TRACER = tracer
+
+
+def tarea_traceloop(nombre: str):
+    """
+    Equivalente perezoso de traceloop.sdk.decorators.task para endpoints async: no importa
+    traceloop al definir la ruta; aplica el decorador real la primera vez que se llama con
+    el tracing ya activo (Traceloop se inicializa en segundo plano durante el arranque).
+    """
+    def decorar(fn):
+        envuelta = None
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            nonlocal envuelta
+            if _TRACER is None:
+                return await fn(*args, **kwargs)
+            if envuelta is None:
+                from traceloop.sdk.decorators import task
+                envuelta = task(name=nombre)(fn)
+            return await envuelta(*args, **kwargs)
+        return wrapper
+    return decorar
+
+
+class etapa:
+    """
+    Context manager liviano: `with etapa("postproceso"): ...` registra la duración en
+    LATENCIA_ETAPA y, si hay tracer, la envuelve en un span con el nombre de la etapa.
+    """
+    __slots__ = ("nombre", "_t0", "_span_cm")
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self._span_cm = None
+
+    def __enter__(self):
+        if _TRACER is not None:
+            self._span_cm = _TRACER.start_as_current_span(self.nombre)
+            self._span_cm.__enter__()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        LATENCIA_ETAPA.observar(self.nombre, time.perf_counter() - self._t0)
+        if self._span_cm is not None:
+            self._span_cm.__exit__(tipo, valor, tb)
+        return False
+
+
+def lineas_contador(nombre: str, ayuda: str, valores: Dict[str, float], etiqueta: Optional[str] = None) -> List[str]:
+    """Expone como contador valores que otro componente ya acumula (caché, ruteo)."""
+    lineas = [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} counter"]
+    for clave, v in valores.items():
+        lineas.append(f'{nombre}{{{etiqueta}="{clave}"}} {v}' if etiqueta else f"{nombre} {v}")
+    return lineas
+
+
+def exponer_metricas(extra: Optional[List[str]] = None) -> str:
+    lineas: List[str] = []
+    for m in METRICAS:
+        lineas.extend(m.exponer())
+    if extra:
+        lineas.extend(extra)
+    return "\n".join(lineas) + "\n"
@@ -25,6 +25,7 @@ Debes devolver el objeto embebido **interpretacion_IA** (sin llaves superiores d
       "observaciones_entrega": string|null,
       "lat": null,
       "lng": null,
+      "precision_coordenadas": null,
       "nivel_confianza": number (0..1)
     },
     "ventana_entrega": {
@@ -71,3 +72,36 @@ Debes devolver el objeto embebido **interpretacion_IA** (sin llaves superiores d
   }
 }
 """
+
+# ---------- Prompt compacto (PROMPT_COMPACTO=true) ----------
+# Va como system_instruction del modelo (no se reenvía como contenido en cada petición) y la forma
+# de la salida la fija RESPONSE_SCHEMA, que solo pide lo que el modelo tiene que extraer del texto.
+# Lo que el backend calcula o sobrescribe (sku, lat/lng, ISO de la ventana, restricciones booleanas,
+# niveles de confianza, normalizacion, validaciones) lo agrega completar_interpretacion en logic.py.
+INSTRUCCIONES_SISTEMA = """
+Eres un intérprete de pedidos de una panadería. Extrae del texto libre del cliente los campos del
+esquema, en español y tal como aparecen en el texto. No inventes datos: usa null o lista vacía.
+En ambiguedades anota lo que no se pueda interpretar con certeza.
+""".strip()
+
+_TEXTO = {"type": "STRING", "nullable": True}
+
+def _objeto(**propiedades) -> dict:
+    return {"type": "OBJECT", "properties": propiedades}
+
+RESPONSE_SCHEMA = _objeto(
+    detalles=_objeto(
+        cliente=_objeto(nombre=_TEXTO, telefono=_TEXTO, email=_TEXTO),
+        direccion_entrega=_objeto(texto=_TEXTO, ciudad=_TEXTO, barrio=_TEXTO, observaciones_entrega=_TEXTO),
+        ventana_entrega=_objeto(expresion_detectada=_TEXTO),
+        items={
+            "type": "ARRAY",
+            "items": dict(
+                _objeto(nombre_detectado={"type": "STRING"}, cantidad={"type": "NUMBER"}, unidad=_TEXTO),
+                required=["nombre_detectado", "cantidad"],
+            ),
+        },
+        restricciones=_objeto(notas={"type": "ARRAY", "items": {"type": "STRING"}}),
+    ),
+    ambiguedades={"type": "ARRAY", "items": {"type": "STRING"}},
+)
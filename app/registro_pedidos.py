@@ -0,0 +1,391 @@
+import os
+import re
+import json
+import mmap
+import time
+import queue
+import struct
+import logging
+import threading
+from typing import Optional, Dict, Any, Tuple, List, Union
+
+from .respuesta import RespuestaPedido, serializar
+
+# ---------- Registro durable de pedidos ----------
+# Log append-only en segmentos JSONL (pedidos-000001.jsonl, ...). Las peticiones solo encolan
+# la respuesta; un hilo escritor la serializa, escribe por lotes y hace un fsync por lote, así
+# el request nunca espera al disco. Un índice en memoria pedido_id -> (segmento, offset, largo)
+# da lecturas O(1) con mmap. Al rotar un segmento se guarda su índice en un .idx binario para
+# que el arranque no tenga que releer los segmentos ya cerrados.
+# Retención: con `max_segmentos` se conservan solo los últimos segmentos de cada escritor; los más
+# viejos se borran al rotar (y sus entradas salen del índice), así disco e índice quedan acotados.
+# Cada arranque o worker reciclado escribe en una subcarpeta nueva (w<pid>): las de procesos que ya
+# no existen se adoptan y entran en la misma cuenta, así el límite vale también entre reinicios.
+# Con varios workers cada proceso escribe en su propia subcarpeta (`escritor`) y, si un pedido no
+# está en su índice, indexa incrementalmente lo nuevo de las subcarpetas de los demás.
+
+_RE_SEGMENTO = re.compile(r"^pedidos-(\d{6})\.jsonl$")
+_RE_ESCRITOR = re.compile(r"^w(\d+)$")   # subcarpeta de un worker: compartido.nombre_proceso()
+# Registro del .idx: pedido_id (hasta 32 bytes, relleno con \0), offset (u64), largo (u32)
+_REGISTRO_IDX = struct.Struct("<32sQI")
+
+# (ruta del segmento, offset, largo)
+Ubicacion = Tuple[str, int, int]
+
+logger = logging.getLogger(__name__)
+
+
+def _proceso_vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # existe, pero es de otro usuario
+        pass
+    return True
+
+
+def _mtime(ruta: str) -> float:
+    try:
+        return os.path.getmtime(ruta)
+    except OSError:
+        return 0.0
+
+
+class RegistroPedidos:
+    def __init__(
+        self,
+        directorio: str,
+        max_bytes_segmento: int = 64 * 1024 * 1024,
+        max_lote: int = 256,
+        espera_lote_s: float = 0.01,
+        escritor: Optional[str] = None,
+        max_segmentos: int = 0,   # 0 = sin límite
+        reintentos: int = 3,      # por lote fallido, con espera creciente; luego se descarta
+    ):
+        self.raiz = directorio
+        self.escritor = escritor
+        self.directorio = os.path.join(directorio, escritor) if escritor else directorio
+        self.max_bytes_segmento = max_bytes_segmento
+        self.max_lote = max_lote
+        self.espera_lote_s = espera_lote_s
+        self.max_segmentos = max_segmentos
+        self.reintentos = reintentos
+        os.makedirs(self.directorio, exist_ok=True)
+
+        self._indice: Dict[str, Ubicacion] = {}
+        self._pendientes: Dict[str, RespuestaPedido] = {}   # encolados pero aún no escritos
+        self._lock = threading.Lock()
+        self._mmaps: Dict[str, mmap.mmap] = {}
+        self._lock_mmaps = threading.Lock()   # remapear cierra el mapa anterior: nadie puede estar leyéndolo
+        self._lock_otros = threading.Lock()
+        self._leido_otros: Dict[str, int] = {}   # segmento de otro escritor -> bytes ya indexados (-1: sellado)
+        self._cola: "queue.SimpleQueue" = queue.SimpleQueue()
+        self.escritos = 0
+        self.lotes = 0
+        self.descartados = 0
+
+        self._podar()
+        segmentos = self._segmentos(self.directorio)
+        for n in segmentos[:-1]:
+            self._cargar_indice_segmento(self._ruta(n))
+        self._segmento = segmentos[-1] if segmentos else 1
+        activo = self._ruta(self._segmento)
+        if os.path.exists(activo):
+            # Una línea final sin '\n' es una escritura cortada: se descarta truncando el archivo
+            completo = self._escanear(activo, 0)
+            if completo < os.path.getsize(activo):
+                with open(activo, "r+b") as f:
+                    f.truncate(completo)
+        self._archivo = open(self._ruta(self._segmento), "ab")
+
+        self._hilo = threading.Thread(target=self._escribir_loop, name="registro-pedidos", daemon=True)
+        self._hilo.start()
+
+    # ---------- API ----------
+    def registrar(self, respuesta: RespuestaPedido) -> None:
+        """Encola la respuesta para escritura; no bloquea en disco."""
+        pedido_id = respuesta.pedido_id
+        if not pedido_id:
+            return
+        with self._lock:
+            if pedido_id in self._pendientes or pedido_id in self._indice:
+                logger.warning("pedido_id repetido en el registro de pedidos: %s (queda el más reciente)", pedido_id)
+            self._pendientes[pedido_id] = respuesta
+        self._cola.put(respuesta)
+
+    def leer(self, pedido_id: str) -> Optional[Union[RespuestaPedido, Dict[str, Any]]]:
+        with self._lock:
+            pendiente = self._pendientes.get(pedido_id)
+            ubicacion = self._indice.get(pedido_id)
+        if pendiente is not None:
+            return pendiente
+        if ubicacion is None and self.escritor:
+            ubicacion = self._buscar_en_otros(pedido_id)
+        if ubicacion is None:
+            return None
+        ruta, offset, largo = ubicacion
+        try:
+            datos = self._leer_bytes(ruta, offset, largo)
+        except FileNotFoundError:
+            # Segmento borrado por la retención (de este escritor o de otro)
+            self._olvidar(ruta)
+            return None
+        return json.loads(datos)
+
+    def cerrar(self, timeout: float = 5.0) -> None:
+        """Escribe lo pendiente, hace fsync y detiene el hilo escritor."""
+        self._cola.put(None)
+        self._hilo.join(timeout)
+        with self._lock_mmaps:
+            for mm in self._mmaps.values():
+                mm.close()
+            self._mmaps.clear()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {
+            "pedidos_indexados": len(self._indice),
+            "pendientes": len(self._pendientes),
+            "segmento_actual": self._segmento,
+            "escritos": self.escritos,
+            "lotes_fsync": self.lotes,
+            "descartados": self.descartados,
+        }
+
+    # ---------- Escritura ----------
+    def _escribir_loop(self) -> None:
+        while True:
+            primero = self._cola.get()
+            lote: List[Dict[str, Any]] = [] if primero is None else [primero]
+            detener = primero is None
+            # Junta lo que llegue en una ventana corta para amortizar el fsync
+            while not detener and len(lote) < self.max_lote:
+                try:
+                    siguiente = self._cola.get(timeout=self.espera_lote_s)
+                except queue.Empty:
+                    break
+                if siguiente is None:
+                    detener = True
+                else:
+                    lote.append(siguiente)
+            if lote:
+                self._escribir_con_reintentos(lote)
+            if detener:
+                self._archivo.close()
+                return
+
+    def _escribir_con_reintentos(self, lote: List[RespuestaPedido]) -> None:
+        """
+        Reintenta el lote fallido desde donde empezaba (lo escrito a medias se trunca). Si sigue
+        fallando se descarta: sale de `_pendientes` para no quedar en memoria para siempre.
+        """
+        for intento in range(self.reintentos + 1):
+            segmento, offset = self._segmento, self._archivo.tell() if not self._archivo.closed else None
+            try:
+                self._escribir_lote(lote)
+                return
+            except Exception as e:
+                logger.warning("Lote del registro de pedidos falló (intento %d): %s", intento + 1, e)
+                self._deshacer(segmento, offset)
+                # Lo que alcanzó a quedar en un segmento sellado ya está publicado
+                with self._lock:
+                    lote = [r for r in lote if r.pedido_id in self._pendientes]
+                if not lote:
+                    return
+                if intento < self.reintentos:
+                    time.sleep(min(0.05 * 2 ** intento, 1.0))
+        with self._lock:
+            for respuesta in lote:
+                self._pendientes.pop(respuesta.pedido_id, None)
+        self.descartados += len(lote)
+        logger.error("Registro de pedidos: se descartan %d respuestas tras %d intentos", len(lote), self.reintentos + 1)
+
+    def _deshacer(self, segmento: int, offset: Optional[int]) -> None:
+        """Trunca lo que el lote fallido dejó en el segmento activo y lo vuelve a abrir."""
+        try:
+            self._archivo.close()
+        except OSError:
+            pass
+        ruta = self._ruta(self._segmento)
+        try:
+            if offset is not None and os.path.exists(ruta):
+                os.truncate(ruta, offset if self._segmento == segmento else 0)
+            self._archivo = open(ruta, "ab")
+        except OSError as e:
+            logger.warning("Registro de pedidos: no se pudo reabrir %s: %s", ruta, e)
+
+    def _escribir_lote(self, lote: List[RespuestaPedido]) -> None:
+        nuevas: Dict[str, Ubicacion] = {}
+        offset = self._archivo.tell()
+        ruta = self._ruta(self._segmento)
+        for respuesta in lote:
+            linea = serializar(respuesta) + b"\n"
+            if offset > 0 and offset + len(linea) > self.max_bytes_segmento:
+                self._sellar(nuevas)
+                nuevas = {}
+                offset = 0
+                ruta = self._ruta(self._segmento)
+            self._archivo.write(linea)
+            nuevas[respuesta.pedido_id] = (ruta, offset, len(linea) - 1)
+            offset += len(linea)
+        self._archivo.flush()
+        os.fsync(self._archivo.fileno())
+        self.lotes += 1
+        self.escritos += len(lote)
+        self._publicar(nuevas)
+
+    def _publicar(self, nuevas: Dict[str, Ubicacion]) -> None:
+        with self._lock:
+            self._indice.update(nuevas)
+            for pedido_id in nuevas:
+                self._pendientes.pop(pedido_id, None)
+
+    def _sellar(self, nuevas: Dict[str, Ubicacion]) -> None:
+        """Cierra el segmento actual (fsync + .idx) y abre el siguiente."""
+        self._archivo.flush()
+        os.fsync(self._archivo.fileno())
+        self._archivo.close()
+        self._publicar(nuevas)
+        sellado = self._segmento
+        ruta_sellada = self._ruta(sellado)
+        with self._lock:
+            entradas = [(pid, off, largo) for pid, (ruta, off, largo) in self._indice.items() if ruta == ruta_sellada]
+        tmp = self._ruta(sellado, ".idx.tmp")
+        with open(tmp, "wb") as f:
+            for pid, off, largo in entradas:
+                f.write(_REGISTRO_IDX.pack(pid.encode("utf-8"), off, largo))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._ruta(sellado, ".idx"))
+        self._segmento += 1
+        self._archivo = open(self._ruta(self._segmento), "ab")
+        self._podar()
+
+    def _podar(self) -> None:
+        """
+        Borra los segmentos más viejos (con su .idx) si hay más de `max_segmentos`. Los de escritores
+        huérfanos cuentan como anteriores a los propios; su carpeta se borra al quedar vacía.
+        """
+        if self.max_segmentos <= 0:
+            return
+        huerfanos = [(c, n) for c in self._huerfanos() for n in self._segmentos(c)]
+        huerfanos.sort(key=lambda cn: _mtime(self._ruta(cn[1], carpeta=cn[0])))
+        propios = [(self.directorio, n) for n in self._segmentos(self.directorio)]
+        for carpeta, n in (huerfanos + propios)[:-self.max_segmentos]:
+            self._olvidar(self._ruta(n, carpeta=carpeta))
+            for ruta in (self._ruta(n, carpeta=carpeta), self._ruta(n, ".idx", carpeta)):
+                try:
+                    os.remove(ruta)
+                except FileNotFoundError:
+                    pass
+        for carpeta in {c for c, _ in huerfanos}:
+            try:
+                os.rmdir(carpeta)  # solo si quedó vacía
+            except OSError:
+                pass
+
+    def _huerfanos(self) -> List[str]:
+        """Subcarpetas w<pid> de otros escritores cuyo proceso ya terminó."""
+        if not self.escritor:
+            return []
+        carpetas = []
+        for nombre in os.listdir(self.raiz):
+            m = _RE_ESCRITOR.match(nombre)
+            if m and nombre != self.escritor and not _proceso_vivo(int(m.group(1))):
+                carpetas.append(os.path.join(self.raiz, nombre))
+        return carpetas
+
+    def _olvidar(self, ruta: str) -> None:
+        """Saca del índice las entradas de un segmento y cierra su mapa."""
+        with self._lock:
+            for pedido_id in [pid for pid, ubicacion in self._indice.items() if ubicacion[0] == ruta]:
+                del self._indice[pedido_id]
+        with self._lock_mmaps:
+            mm = self._mmaps.pop(ruta, None)
+            if mm is not None:
+                mm.close()
+
+    # ---------- Lectura ----------
+    def _leer_bytes(self, ruta: str, offset: int, largo: int) -> bytes:
+        # La copia se hace con el lock tomado: otro hilo no puede cerrar el mapa a mitad de la lectura
+        with self._lock_mmaps:
+            mm = self._mmaps.get(ruta)
+            if mm is None or offset + largo > len(mm):
+                # El segmento activo crece: se vuelve a mapear cuando la lectura pasa del tamaño conocido
+                with open(ruta, "rb") as f:
+                    nuevo = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if mm is not None:
+                    mm.close()
+                self._mmaps[ruta] = mm = nuevo
+            return mm[offset:offset + largo]
+
+    def _buscar_en_otros(self, pedido_id: str) -> Optional[Ubicacion]:
+        """Indexa lo que escribieron los demás workers desde la última búsqueda y vuelve a mirar."""
+        with self._lock_otros:
+            with self._lock:
+                ubicacion = self._indice.get(pedido_id)
+            if ubicacion is not None:
+                return ubicacion
+            for nombre in sorted(os.listdir(self.raiz)):
+                carpeta = os.path.join(self.raiz, nombre)
+                if nombre == self.escritor or not os.path.isdir(carpeta):
+                    continue
+                for n in self._segmentos(carpeta):
+                    ruta = self._ruta(n, carpeta=carpeta)
+                    leido = self._leido_otros.get(ruta, 0)
+                    if leido < 0:
+                        continue
+                    if os.path.exists(self._ruta(n, ".idx", carpeta)):
+                        self._cargar_indice_segmento(ruta)
+                        self._leido_otros[ruta] = -1
+                    else:
+                        self._leido_otros[ruta] = self._escanear(ruta, leido)
+            # Segmentos que la retención de otro escritor ya borró
+            for ruta in [r for r in self._leido_otros if not os.path.exists(r)]:
+                self._olvidar(ruta)
+                del self._leido_otros[ruta]
+            with self._lock:
+                return self._indice.get(pedido_id)
+
+    # ---------- Arranque ----------
+    def _ruta(self, segmento: int, extension: str = ".jsonl", carpeta: Optional[str] = None) -> str:
+        return os.path.join(carpeta or self.directorio, f"pedidos-{segmento:06d}{extension}")
+
+    @staticmethod
+    def _segmentos(carpeta: str) -> List[int]:
+        return sorted(int(m.group(1)) for m in map(_RE_SEGMENTO.match, os.listdir(carpeta)) if m)
+
+    def _cargar_indice_segmento(self, ruta: str) -> None:
+        """Segmento sellado: usa su .idx si existe; si no, lo escanea completo."""
+        ruta_idx = ruta[:-len(".jsonl")] + ".idx"
+        if not os.path.exists(ruta_idx):
+            self._escanear(ruta, 0)
+            return
+        with open(ruta_idx, "rb") as f:
+            nuevas = {
+                pid.rstrip(b"\0").decode("utf-8"): (ruta, off, largo)
+                for pid, off, largo in _REGISTRO_IDX.iter_unpack(f.read())
+            }
+        with self._lock:
+            self._indice.update(nuevas)
+
+    def _escanear(self, ruta: str, desde: int) -> int:
+        """Indexa las líneas completas a partir de `desde`; retorna el offset tras la última completa."""
+        nuevas: Dict[str, Ubicacion] = {}
+        offset = desde
+        with open(ruta, "rb") as f:
+            f.seek(desde)
+            for linea in f:
+                if not linea.endswith(b"\n"):
+                    break
+                contenido = linea[:-1]
+                try:
+                    pedido_id = json.loads(contenido).get("pedido_id")
+                except ValueError:
+                    pedido_id = None
+                if pedido_id:
+                    nuevas[pedido_id] = (ruta, offset, len(contenido))
+                offset += len(linea)
+        with self._lock:
+            self._indice.update(nuevas)
+        return offset
@@ -0,0 +1,102 @@
+import json
+import dataclasses
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # opcional: sin orjson se serializa con json de la stdlib
+    orjson = None
+
+# ---------- Respuesta de /interpretar ----------
+# La parte de cada pedido (ids, entrada, metadatos) vive en registros con __slots__ y la parte
+# constante (paso_siguiente_sugerido) se arma una sola vez al importar. interpretacion_IA sigue
+# siendo un dict: la produce el modelo y la completan postproceso, caché y ruteo.
+# Las respuestas se serializan directo a bytes (orjson si está instalado) sin pasar por
+# jsonable_encoder de FastAPI; el orden de los campos es el del contrato de salida.
+
+VERSION_AGENTE = "interprete-1.0.0"
+SOLICITUD_CLIENTE = "Recibir e interpretar el pedido"
+
+
+@dataclass(frozen=True, slots=True)
+class PasoSiguiente:
+    accion: str
+    inputs_requeridos: Tuple[str, ...]
+
+
+PASO_SIGUIENTE_SUGERIDO = PasoSiguiente(
+    accion="planificacion_entrega",
+    inputs_requeridos=(
+        "Geocodificar direccion_entrega",
+        "Mapear items a SKU y validar stock",
+        "Asignar ventana exacta según capacidad de ruta",
+    ),
+)
+
+
+@dataclass(slots=True)
+class EntradaOriginal:
+    canal: str
+    timestamp_iso: str
+    texto_libre: str
+
+
+@dataclass(slots=True)
+class Metadatos:
+    uuid_operacion: str
+    ruta: Optional[str] = None
+    puntaje_local: Optional[float] = None
+    version_agente: str = VERSION_AGENTE
+
+
+@dataclass(slots=True)
+class RespuestaPedido:
+    pedido_id: str
+    entrada_original: EntradaOriginal
+    interpretacion_IA: Dict[str, Any]
+    nivel_confianza: float
+    metadatos: Metadatos
+    solicitud_cliente: str = SOLICITUD_CLIENTE
+    paso_siguiente_sugerido: PasoSiguiente = PASO_SIGUIENTE_SUGERIDO
+
+
+# Orden de los campos al serializar (el de la respuesta original, no el de declaración)
+_CAMPOS = {
+    RespuestaPedido: ("pedido_id", "solicitud_cliente", "entrada_original", "interpretacion_IA",
+                      "paso_siguiente_sugerido", "nivel_confianza", "metadatos"),
+    Metadatos: ("version_agente", "uuid_operacion", "ruta", "puntaje_local"),
+}
+
+
+def _a_dict(obj) -> Dict[str, Any]:
+    """Un nivel de un registro a dict; json/orjson recorren el resto."""
+    campos = _CAMPOS.get(type(obj))
+    if campos is None:
+        if not dataclasses.is_dataclass(obj):
+            raise TypeError(f"{type(obj).__name__} no es serializable a JSON")
+        campos = _CAMPOS[type(obj)] = tuple(f.name for f in dataclasses.fields(obj))
+    return {c: getattr(obj, c) for c in campos}
+
+
+# orjson serializa dataclasses por su cuenta, pero en orden de declaración: con
+# OPT_PASSTHROUGH_DATACLASS pasan por _a_dict y conservan el orden del contrato
+_OPCIONES_ORJSON = orjson.OPT_PASSTHROUGH_DATACLASS if orjson is not None else 0
+
+
+def serializar(obj: Any) -> bytes:
+    """JSON en UTF-8 (sin escapar tildes) de dicts, listas y registros de este módulo."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_a_dict, option=_OPCIONES_ORJSON)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_a_dict).encode("utf-8")
+
+
+class RespuestaJSON(JSONResponse):
+    """
+    JSONResponse que serializa con `serializar`. Retornarla desde el endpoint evita que FastAPI
+    recorra el contenido con jsonable_encoder.
+    """
+    def render(self, content: Any) -> bytes:
+        return serializar(content)
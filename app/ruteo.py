@@ -0,0 +1,81 @@
+from typing import Dict, Any
+
+from .metricas import Contador
+
+# ---------- Ruteo local-first ----------
+# Antes de llamar al modelo se corre la interpretación local completa y se calcula un puntaje de
+# completitud con los mismos campos_obligatorios que marca postproceso_modelo. Si el puntaje
+# alcanza el umbral, la respuesta local se usa tal cual y nos ahorramos la llamada a Gemini.
+
+# Rutas posibles de una petición (quedan en metadatos.ruta de la respuesta)
+RUTA_LOCAL = "local"                      # el modelo no estaba habilitado para la petición
+RUTA_LOCAL_CONFIABLE = "local_confiable"  # el modelo estaba habilitado pero las heurísticas bastaron
+RUTA_MODELO = "modelo"                    # se usó la respuesta de Gemini (o de su caché)
+RUTA_FALLBACK = "fallback_local"          # se intentó el modelo y falló; se usó la interpretación local
+
+PESOS_PUNTAJE = {"direccion_entrega": 0.3, "ventana_entrega": 0.3, "items": 0.3, "contacto": 0.1}
+
+
+def puntaje_confianza(interpretacion: Dict[str, Any]) -> float:
+    """
+    Completitud (0..1) de una interpretación ya postprocesada. Los items solo suman en la
+    proporción que tenga SKU del catálogo; el contacto (teléfono o email) suma lo restante.
+    """
+    campos = (interpretacion.get("validaciones") or {}).get("campos_obligatorios") or {}
+    detalles = interpretacion.get("detalles") or {}
+    puntaje = 0.0
+    if campos.get("direccion_entrega"):
+        puntaje += PESOS_PUNTAJE["direccion_entrega"]
+    if campos.get("ventana_entrega"):
+        puntaje += PESOS_PUNTAJE["ventana_entrega"]
+    items = detalles.get("items") or []
+    if campos.get("items") and items:
+        con_sku = sum(1 for it in items if it.get("sku"))
+        puntaje += PESOS_PUNTAJE["items"] * con_sku / len(items)
+    cliente = detalles.get("cliente") or {}
+    if cliente.get("telefono") or cliente.get("email"):
+        puntaje += PESOS_PUNTAJE["contacto"]
+    return round(puntaje, 4)
+
+
+class EstadisticasRuteo:
+    """
+    Contadores por ruta y latencia observada del modelo para estimar el ahorro. Viven en el
+    almacén de métricas, así con varios workers el resumen cubre a todos los procesos.
+    """
+
+    def __init__(self):
+        self._rutas = Contador("interprete_interpretaciones_total", "Peticiones interpretadas por ruta.", ("ruta",))
+        self._llamadas = Contador("interprete_modelo_llamadas_total", "Llamadas completadas al modelo.")
+        self._latencia = Contador("interprete_modelo_latencia_segundos_total", "Latencia acumulada del modelo.")
+
+    def registrar(self, ruta: str) -> None:
+        self._rutas.incrementar(ruta)
+
+    def registrar_llamada_modelo(self, latencia_s: float) -> None:
+        self._llamadas.incrementar()
+        self._latencia.incrementar(cantidad=latencia_s)
+
+    @property
+    def por_ruta(self) -> Dict[str, int]:
+        por_ruta = {RUTA_LOCAL: 0, RUTA_LOCAL_CONFIABLE: 0, RUTA_MODELO: 0, RUTA_FALLBACK: 0}
+        for (ruta,), v in self._rutas.valores().items():
+            por_ruta[ruta] = v
+        return por_ruta
+
+    def resumen(self, costo_por_llamada_usd: float = 0.0) -> Dict[str, Any]:
+        por_ruta = self.por_ruta
+        llamadas = self._llamadas.valor()
+        lat_total = self._latencia.valor()
+        evitadas = por_ruta[RUTA_LOCAL_CONFIABLE]
+        candidatas = evitadas + por_ruta[RUTA_MODELO] + por_ruta[RUTA_FALLBACK]
+        lat_media = lat_total / llamadas if llamadas else None
+        return {
+            "por_ruta": por_ruta,
+            "llamadas_modelo": llamadas,
+            "llamadas_evitadas": evitadas,
+            "tasa_evitadas": round(evitadas / candidatas, 4) if candidatas else 0.0,
+            "latencia_media_modelo_ms": round(lat_media * 1000, 2) if lat_media is not None else None,
+            "latencia_ahorrada_s": round(evitadas * lat_media, 3) if lat_media is not None else None,
+            "costo_ahorrado_usd": round(evitadas * costo_por_llamada_usd, 6),
+        }
@@ -0,0 +1,68 @@
+import os
+import sys
+import glob
+import tempfile
+
+import uvicorn
+
+# ---------- Arranque multi-proceso ----------
+# `python -m app.servidor` levanta uvicorn con un worker por CPU disponible (o WEB_CONCURRENCY).
+# Con más de un worker prepara el estado compartido antes de crear los procesos: una carpeta
+# ESTADO_COMPARTIDO_DIR para métricas y contadores, y backends sqlite para la caché del modelo y
+# la idempotencia, salvo que el entorno ya los defina.
+
+# Lo que escriben los workers en ESTADO_COMPARTIDO_DIR (app/compartido.py y el limitador del modelo);
+# la carpeta puede ser un volumen montado con otras cosas: al arrancar solo se borra esto
+_ARCHIVOS_ESTADO = ("valores-*.bin", "limitador-modelo.bin")
+
+
+def cpus_disponibles() -> int:
+    """CPUs que puede usar el contenedor: afinidad del proceso y, si existe, la cuota de cgroup."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            cuota, periodo = f.read().split()
+        if cuota != "max":
+            cpus = min(cpus, max(1, int(int(cuota) // int(periodo))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+def preparar_estado_compartido() -> str:
+    """Estado limpio por arranque: las métricas empiezan en cero como en un solo proceso."""
+    directorio = os.environ.get("ESTADO_COMPARTIDO_DIR")
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+        for patron in _ARCHIVOS_ESTADO:
+            for ruta in glob.glob(os.path.join(directorio, patron)):
+                try:
+                    os.remove(ruta)
+                except FileNotFoundError:
+                    pass
+    else:
+        directorio = os.environ["ESTADO_COMPARTIDO_DIR"] = tempfile.mkdtemp(prefix="interprete-estado-")
+    os.environ.setdefault("CACHE_BACKEND", "sqlite")
+    os.environ.setdefault("IDEMPOTENCIA_BACKEND", "sqlite")
+    return directorio
+
+
+def main() -> int:
+    workers = int(os.getenv("WEB_CONCURRENCY") or cpus_disponibles())
+    if workers > 1:
+        directorio = preparar_estado_compartido()
+        print(f"[servidor] {workers} workers, estado compartido en {directorio}")
+    uvicorn.run(
+        "app.main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8080")),
+        workers=workers,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+import re
+import pytz
+from datetime import datetime, date, time, timedelta, tzinfo
+from functools import lru_cache
+from typing import Tuple, Optional, List
+
+TZ = pytz.timezone("America/Bogota")
+
+# ---------- Ventana de entrega desde expresiones de tiempo ----------
+# Sin un día (hoy, mañana, pasado mañana, día de la semana) no hay ventana, así que el día es el ancla:
+# _RE_EXPRESION lo encuentra y en la misma pasada lee lo que sigue (otro día, una hora). La regex se
+# compila una vez a partir de la tabla _REGLAS_HORA: un grupo con nombre por regla, `lastgroup` dice
+# cuál aplicó y su constructor arma la ventana. Los prefijos del día ("pasado", "el próximo", "del",
+# "entre el") se revisan con endswith justo antes del ancla. Un texto sin día se descarta con una
+# sola búsqueda, sin probar el resto de reglas.
+
+_FIN_DEFECTO = (15, 0)       # "mañana" sin hora: de 00:00 a 15:00
+_FIN_DIA = (23, 59)          # "después de las X": hasta el final del día
+_DURACION_PUNTO = 90         # "a las X": ventana de 90 min
+_FRANJAS = {"mañana": ((6, 0), (12, 0)), "tarde": ((12, 0), (18, 0)), "noche": ((18, 0), (21, 0))}
+_DIAS_SEMANA = {
+    "lunes": 0, "martes": 1, "miércoles": 2, "miercoles": 2, "jueves": 3,
+    "viernes": 4, "sábado": 5, "sabado": 5, "domingo": 6,
+}
+_DIAS = r"mañana|hoy|lunes|martes|mi[eé]rcoles|jueves|viernes|s[aá]bado|domingo"
+
+# Palabras antes del día, en el orden en que se quitan: "del próximo lunes", "entre el viernes"
+_MODIFICADORES = ("próximo ", "proximo ", "siguiente ")
+_ABREN_RANGO = ("desde ", "entre ")  # y "del": "del viernes al lunes"; "el" solo se quita
+# Terminaciones de cualquiera de ellas: sin ninguna no hay prefijos que revisar ("para mañana", "de mañana")
+_ANTES_DEL_DIA = ("ado ", "imo ", "nte ", "sde ", "tre ", "el ")
+
+
+# Una hora ("las 8:30 a.m.", "3 de la tarde") o el mediodía. Sin grupos: en una alternancia grande cada
+# grupo encarece todas las ramas, así que los valores se leen después con _RE_VALOR_HORA sobre el
+# texto corto de la regla que aplicó. Atómica (?>...): si lo que sigue a la hora no encaja, la regla
+# falla de una vez en lugar de reintentar con "9" en vez de "9:30 a.m.".
+_HORA = (
+    r"(?>(?:(?:las?|el)\s+)?(?:\d{1,2}(?:[:.]\d{2})?(?!\d)"
+    r"(?:\s*[ap]\.?\s?m\b\.?|\s+de\s+la\s+(?:mañana|tarde|noche)\b)?|medio\s?d[ií]a\b))"
+)
+_RE_VALOR_HORA = re.compile(r"(\d{1,2})(?:[:.](\d{2}))?(?!\d)(?:\s*([ap])\.?\s?m\b|\s+de\s+la\s+(mañana|tarde|noche)\b)?|medio")
+
+
+def _horas(texto: str) -> List[Tuple[int, int, Optional[str]]]:
+    """(hora, minuto, "a"|"p"|None) de cada hora del texto, en orden."""
+    horas = []
+    for hh, mm, mer, franja in _RE_VALOR_HORA.findall(texto):
+        if not hh:
+            horas.append((12, 0, "p"))  # mediodía
+        else:
+            horas.append((int(hh), int(mm or 0), mer or (franja and ("a" if franja == "mañana" else "p")) or None))
+    return horas
+
+
+def _a_24h(hora) -> Tuple[int, int]:
+    # "12am" es la medianoche y "12pm" el mediodía (convención de 12 horas); un "12" sin am/pm o
+    # "12 m." queda en el mediodía. Como fin de rango la medianoche cierra el día (ver _cruce), salvo
+    # en un rango que empieza en la mañana (ver _rango).
+    hh, mm, mer = hora
+    if mer == "p" and hh < 12:
+        hh += 12
+    elif mer == "a" and hh == 12:
+        hh = 0
+    return hh, mm
+
+
+def _cruce(ini: Tuple[int, int], fin: Tuple[int, int]):
+    """Días extra del fin: 1 si termina a la misma hora o antes ("entre 10pm y 2am", "hasta las 12am")."""
+    return ini, fin, 1 if fin <= ini else 0
+
+
+def _rango(texto: str):
+    # "entre 2 y 4 pm": la primera hora hereda el am/pm de la segunda si no lo trae, salvo que así
+    # quede después del fin ("entre 10 y 12 pm" es de 10:00 a 12:00, no de 22:00 a 12:00)
+    h1, h2 = _horas(texto)
+    if h2[0] == 12 and h2[2] == "a" and h1[0] < 12 and h1[2] != "p":
+        # "entre 10am y 12am" se escribe por el mediodía; fuera de un rango de la mañana, 12am es medianoche
+        h2 = (12, h2[1], "p")
+    fin = _a_24h(h2)
+    if h1[2] is None and h2[2] is not None and h1[0] <= h2[0]:
+        heredada = _a_24h((h1[0], h1[1], h2[2]))
+        if heredada < fin:
+            return heredada, fin, 0
+    return _cruce(_a_24h(h1), fin)
+
+
+def _punto(texto: str):
+    hh, mm = _a_24h(_horas(texto)[0])
+    minutos = hh * 60 + mm + _DURACION_PUNTO
+    return (hh, mm), ((minutos // 60) % 24, minutos % 60), minutos // 1440
+
+
+# Reglas de hora: (nombre, patrón, constructor(texto) -> ((h, m) inicio, (h, m) fin, días extra en el fin)).
+# Se prueban en orden en la misma posición, así "entre 2 y 4" gana sobre un "2" suelto.
+_REGLAS_HORA = [
+    ("entre", rf"entre\s+{_HORA}\s+y\s+{_HORA}", _rango),
+    ("desde_hasta", rf"(?:desde|de)\s+{_HORA}\s+(?:a|hasta)\s+{_HORA}", _rango),
+    ("antes", rf"(?:antes\s+del?|hasta)\s+{_HORA}", lambda t: _cruce((0, 0), _a_24h(_horas(t)[0]))),
+    ("despues", rf"(?:despu[eé]s\s+del?|a\s+partir\s+del?|desde)\s+{_HORA}", lambda t: (_a_24h(_horas(t)[0]), _FIN_DIA, 0)),
+    ("a_las", rf"(?:a\s+(?=la)|al\s+){_HORA}", _punto),
+    ("franja", r"(?:en|por|de)\s+la\s+(?:mañana|tarde|noche)\b", lambda t: (*_FRANJAS[t.rsplit(None, 1)[-1]], 0)),
+]
+_CONSTRUCTORES = {nombre: construir for nombre, _, construir in _REGLAS_HORA}
+_HORAS = "|".join(f"(?P<{nombre}>{patron})" for nombre, patron, _ in _REGLAS_HORA)
+
+# Día y lo que le sigue: un segundo día ("al miércoles", "y el viernes") y/o una regla de hora. El
+# día va sin grupo ni \b al inicio: una alternancia de literales así deja que el motor de re salte en C
+# las posiciones cuya letra no puede empezar un día (el límite de palabra se revisa en Python). El
+# grupo vacío marca dónde termina el día; sin nada después, `lastindex` es 1.
+_RE_EXPRESION = re.compile(
+    rf"(?:{_DIAS})\b()(?:[\s,]+(?:al|hasta|y)\s+(?:el\s+)?({_DIAS})\b)?(?:[\s,]+(?:{_HORAS}))?"
+)
+# Hora lejos del día ("para mañana 30 panes. ... entregar a las 3 pm"): tres búsquedas que empiezan por
+# un literal (las alternancias sin prefijo común prueban cada posición) encuentran dónde empieza la hora
+# y la regla se lee desde el conector que la precede ("a", "antes de", "a partir de"...)
+_RE_HORA = re.compile(_HORAS)
+_PISTAS = (  # (regex, si la regla empieza en la pista); la más frecuente primero
+    (re.compile(r"la(?:s?\s+\d|\s+(?:mañana|tarde|noche)\b)"), False),  # aquí empieza la hora
+    (re.compile(r"entre\s+\d"), True),
+    (re.compile(r"medio\s?d[ií]a"), False),
+)
+_CONECTORES = {"entre", "desde", "de", "del", "hasta", "a", "al", "en", "por"}
+_ANTES_DE = {"antes", "después", "despues"}
+
+
+def _dias(dia: str, ahora: datetime, pasado: bool = False, proximo: bool = False) -> int:
+    if dia == "hoy":
+        return 0
+    if dia == "mañana":
+        return 2 if pasado else 1
+    dias = (_DIAS_SEMANA[dia] - ahora.weekday()) % 7
+    return 7 if dias == 0 and proximo else dias
+
+
+# Texto de la regla ("antes de las 8 pm") -> ventana horaria o None: el texto se repite mucho y
+# determina la regla. Se vacía al llenarse.
+_VENTANAS_HORAS: dict = {}
+
+
+def _regla(m) -> Optional[tuple]:
+    """Ventana horaria de la regla que aplicó en `m`; None si no hubo o la hora no es válida."""
+    nombre = m.lastgroup
+    if nombre not in _CONSTRUCTORES:
+        return None
+    texto = m.group(nombre)
+    try:
+        return _VENTANAS_HORAS[texto]
+    except KeyError:
+        pass
+    horas = _CONSTRUCTORES[nombre](texto)
+    (h1, m1), (h2, m2), _ = horas
+    if not (h1 < 24 and h2 < 24 and m1 < 60 and m2 < 60):
+        horas = None
+    if len(_VENTANAS_HORAS) >= 4096:
+        _VENTANAS_HORAS.clear()
+    _VENTANAS_HORAS[texto] = horas
+    return horas
+
+
+def _inicio_regla(low: str, k: int) -> int:
+    """Dónde empieza la regla cuya hora empieza en `k` (en "a partir de las 3", la "a"); -1 si no hay conector."""
+    if k < 2 or low[k - 1] != " ":
+        return -1
+    i = low.rfind(" ", 0, k - 1) + 1
+    palabra = low[i:k - 1]
+    if palabra not in _CONECTORES:
+        return -1
+    if i > 1 and palabra[0] == "d" and palabra != "desde":
+        # "de"/"del" pueden cerrar "antes de", "después del", "a partir de"
+        j = low.rfind(" ", 0, i - 1) + 1
+        previa = low[j:i - 1]
+        if previa in _ANTES_DE:
+            return j
+        if previa == "partir" and low.endswith("a ", 0, j):
+            return j - 2
+    return i
+
+
+def _hora_suelta(low: str):
+    """(texto de la regla, ventana horaria) de la primera regla de hora del texto; None si no hay."""
+    pistas = []
+    for tipo, (regex, _) in enumerate(_PISTAS):
+        p = regex.search(low)
+        if p is not None:
+            pistas.append((p.start(), tipo, p.end()))
+    while pistas:
+        pistas.sort()
+        k, tipo, fin = pistas.pop(0)
+        regex, empieza_regla = _PISTAS[tipo]
+        inicio = k if empieza_regla else _inicio_regla(low, k)
+        if inicio >= 0:
+            m = _RE_HORA.match(low, inicio)
+            horas = m and _regla(m)
+            if horas:
+                return m.group(m.lastgroup), horas
+        p = regex.search(low, fin)
+        if p is not None:
+            pistas.append((p.start(), tipo, p.end()))
+    return None
+
+
+def _prefijo(low: str, k: int) -> Tuple[int, bool]:
+    """Quita "el", "del", "desde (el)" o "entre (el)" antes de `k`: (nuevo inicio, si abre un rango)."""
+    if low.endswith("el ", 0, k):
+        if k > 3 and low[k - 4] == "d":
+            j, abre_rango = k - 4, True
+        elif low.endswith(_ABREN_RANGO, 0, k - 3):
+            j, abre_rango = k - 9, True
+        else:
+            j, abre_rango = k - 3, False
+    elif low.endswith(_ABREN_RANGO, 0, k):
+        j, abre_rango = k - 6, True
+    else:
+        return k, False
+    if j and low[j - 1].isalnum():
+        return k, False  # parte de otra palabra ("modelo del", "gente el")
+    return j, abre_rango
+
+
+@lru_cache(maxsize=4096)
+def _iso(fecha: date, tz: tzinfo, d1: int, h1: int, m1: int, d2: int, h2: int, m2: int) -> Tuple[str, str]:
+    ini = datetime.combine(fecha + timedelta(days=d1), time(h1, m1), tz)
+    fin = datetime.combine(fecha + timedelta(days=d2), time(h2, m2), tz)
+    return ini.isoformat(), fin.isoformat()
+
+
+def interpretar_ventana(low: str, now: Optional[datetime] = None) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Ventana de entrega (inicio_iso, fin_iso, expresion_detectada) a partir del texto en minúsculas.
+    Sin un día (hoy, mañana, pasado mañana, día de la semana) retorna (None, None, None); si las
+    horas no dan una ventana que termine después de empezar, (None, None, expresion_detectada).
+    Con `now` el resultado es determinista.
+    """
+    buscar = _RE_EXPRESION.search
+    m = buscar(low)
+    hoy = None
+    while m is not None:
+        ini = m.start()
+        if ini and (low[ini - 1].isalnum() or low.endswith("la ", 0, ini)):
+            m = buscar(low, ini + 1)  # dentro de otra palabra, o "en la mañana" (franja, no día)
+        elif m.lastindex == 1 and m.end() - ini == 3:
+            # Solo "hoy": si hay otro día más adelante ("hoy les escribo para el domingo") gana el otro
+            hoy = m
+            m = buscar(low, ini + 3)
+        else:
+            break
+    if m is None:
+        if hoy is None:
+            return None, None, None
+        m = hoy
+        ini = m.start()
+    if now is None:
+        now = datetime.now(TZ)
+
+    # Prefijos del día, de adentro hacia afuera
+    inicio = ini
+    dia = low[ini:m.end(1)]
+    pasado = proximo = abre_rango = False
+    if low.endswith(_ANTES_DEL_DIA, 0, inicio):
+        pasado = dia == "mañana" and low.endswith("pasado ", 0, inicio)
+        if pasado:
+            inicio -= 7
+        proximo = low.endswith(_MODIFICADORES, 0, inicio)
+        if proximo:
+            inicio = low.rfind(" ", 0, inicio - 1) + 1
+        inicio, abre_rango = _prefijo(low, inicio)
+
+    if dia == "mañana":
+        d1 = 2 if pasado else 1
+    else:
+        d1 = _dias(dia, now, proximo=proximo)
+    d2 = d1
+    if abre_rango and m.group(2):
+        # "del viernes al lunes": el segundo día es el de la semana siguiente
+        d2 = _dias(m.group(2), now)
+        if d2 < d1:
+            d2 += 7
+    expresion = low[inicio:m.end()]
+    horas = _regla(m)
+    if horas is None:
+        suelta = _hora_suelta(low)
+        if suelta:
+            expresion += " " + suelta[0]
+            horas = suelta[1]
+    if horas is None:
+        # Solo "hoy" sin hora no dice nada de la ventana
+        if dia == "hoy" and d2 == 0:
+            return None, None, None
+        horas = ((0, 0), _FIN_DEFECTO, 0)
+
+    (h1, m1), (h2, m2), extra = horas
+    d2 += extra
+    if d1 == 0 and dia in _DIAS_SEMANA and (d2, h2, m2) < (0, now.hour, now.minute):
+        # "el domingo a las 9" escrito un domingo a las 11: es el de la semana siguiente
+        d1 += 7
+        d2 += 7
+    if (d2, h2, m2) <= (d1, h1, m1):
+        return None, None, expresion  # ventana invertida: la expresión queda, las horas no
+    return (*_iso(now.date(), now.tzinfo, d1, h1, m1, d2, h2, m2), expresion)
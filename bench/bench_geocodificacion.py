@@ -0,0 +1,69 @@
+"""
+Microbenchmark de la geocodificación local (app/geocodificacion.py): nomenclatura -> malla ->
+lat/lng + barrio con el índice de celdas del gazetteer.
+
+Sobre las direcciones, barrios y ciudades que extrae la heurística local del corpus sintético
+reporta cuántas se resuelven (por dirección, por barrio o nada) y los µs por llamada:
+  parsear   -> solo la nomenclatura a componentes
+  frio      -> geocodificar con la caché LRU vacía (cada dirección se calcula)
+  caliente  -> geocodificar con direcciones ya en la caché (hasta GEOCODIFICACION_CACHE)
+
+Uso (desde la raíz del proyecto):
+    python -m bench.bench_geocodificacion --n 5000 --repeticiones 5
+"""
+import sys
+import time
+import argparse
+from typing import Callable, List, Tuple
+
+from .corpus import generar_corpus
+from app.logic import extraer_campos_heuristicos
+from app.geocodificacion import GAZETTEER, geocodificar
+
+
+def medir(fn: Callable[[Tuple], object], casos: List[Tuple], repeticiones: int,
+          antes: Callable[[], None] = lambda: None) -> float:
+    """Mejor de `repeticiones` pasadas, en µs por llamada; `antes` corre fuera del tiempo medido."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        antes()
+        t0 = time.perf_counter()
+        for c in casos:
+            fn(c)
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor / len(casos) * 1e6
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Geocodificación local: cobertura y µs por llamada.")
+    ap.add_argument("--n", type=int, default=5000)
+    ap.add_argument("--repeticiones", type=int, default=5)
+    ap.add_argument("--semilla", type=int, default=42)
+    args = ap.parse_args(argv)
+
+    casos = []
+    for p in generar_corpus(args.n, args.semilla):
+        campos = extraer_campos_heuristicos(p["texto_libre"])
+        casos.append((campos["direccion"], campos["barrio"], campos["ciudad"]))
+
+    geocodificar.cache_clear()
+    resultados = [geocodificar(*c) for c in casos]
+    por_precision = {"direccion": 0, "barrio": 0, "ninguna": 0}
+    for r in resultados:
+        por_precision[r.precision if r else "ninguna"] += 1
+    print(f"gazetteer: {len(GAZETTEER.barrios)} barrios, {args.n} pedidos")
+    print("resueltos: " + "  ".join(f"{k}={v / len(casos):.1%}" for k, v in por_precision.items()))
+
+    # Sin duplicados para que el pase en frío no tenga hits dentro de una misma pasada
+    unicos = list(dict.fromkeys(casos))
+    print(f"{'medicion':<12}{'us_por_llamada':>16}")
+    print(f"{'parsear':<12}{medir(lambda c: GAZETTEER.parsear(c[0]), unicos, args.repeticiones):>16.2f}")
+    print(f"{'frio':<12}{medir(lambda c: geocodificar(*c), unicos, args.repeticiones, geocodificar.cache_clear):>16.2f}")
+    # Caliente: tantas direcciones como caben en la caché, ya cargadas
+    en_cache = unicos[:geocodificar.cache_info().maxsize]
+    print(f"{'caliente':<12}{medir(lambda c: geocodificar(*c), en_cache, args.repeticiones):>16.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Benchmark offline del pipeline de interpretación.
+
+Escenarios:
+  postproceso      -> postproceso_modelo sobre una interpretación ya hecha
+  fallback         -> heurísticas locales de interpretar (interpretacion_fallback)
+  endpoint_local   -> POST /interpretar completo con usar_modelo=false
+  endpoint_modelo  -> POST /interpretar completo con un Gemini simulado (latencia configurable)
+
+Reporta p50/p95/p99 (ms), requests/s y memoria por request (pico de tracemalloc), guarda
+el resultado como JSON y opcionalmente lo compara contra una línea base.
+
+Uso (desde la raíz del proyecto; requiere httpx, ver bench/requirements.txt):
+    python -m bench.bench_pipeline --n 2000 --guardar bench/baselines/actual.json
+    python -m bench.bench_pipeline --comparar bench/baselines/v1.0.0.json --tolerancia 0.15
+
+bench/baselines/v1.0.0.json es la línea base de interprete-1.0.0 con los parámetros por defecto
+(la máquina queda en "plataforma"). Los tiempos dependen del hardware: en otra máquina conviene
+guardar primero una base propia desde el mismo commit y comparar contra esa.
+"""
+import os
+import sys
+import json
+import time
+import copy
+import asyncio
+import argparse
+import platform
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, Any, List
+
+# Sin Vertex real: el escenario de modelo usa GeminiSimulado
+os.environ.setdefault("USE_VERTEX", "false")
+os.environ.setdefault("CACHE_BACKEND", "ninguno")
+
+from .corpus import generar_corpus
+from app.gemini_simulado import GeminiSimulado
+
+ESCENARIOS = ["postproceso", "fallback", "endpoint_local", "endpoint_modelo"]
+
+
+def percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    orden = sorted(valores)
+    k = min(len(orden) - 1, max(0, int(round(p / 100.0 * (len(orden) - 1)))))
+    return orden[k]
+
+
+def resumir(latencias_s: List[float], duracion_s: float, mem_bytes: List[int]) -> Dict[str, Any]:
+    ms = [x * 1000 for x in latencias_s]
+    return {
+        "n": len(ms),
+        "p50_ms": round(percentil(ms, 50), 4),
+        "p95_ms": round(percentil(ms, 95), 4),
+        "p99_ms": round(percentil(ms, 99), 4),
+        "media_ms": round(sum(ms) / len(ms), 4) if ms else 0.0,
+        "req_por_s": round(len(ms) / duracion_s, 2) if duracion_s > 0 else 0.0,
+        "mem_pico_por_req_kb": round(sum(mem_bytes) / len(mem_bytes) / 1024, 2) if mem_bytes else 0.0,
+    }
+
+
+# ---------- Medición de funciones síncronas ----------
+def medir_sync(fn: Callable[[int], Any], n: int, n_mem: int, fn_mem: Callable[[int], Any] = None) -> Dict[str, Any]:
+    """Mide fn(i) para i en range(n); fn_mem (por defecto fn) se usa en la pasada de memoria."""
+    fn_mem = fn_mem or fn
+    latencias = []
+    t0 = time.perf_counter()
+    for i in range(n):
+        a = time.perf_counter()
+        fn(i)
+        latencias.append(time.perf_counter() - a)
+    duracion = time.perf_counter() - t0
+
+    # Pasada aparte con tracemalloc (lo ralentiza; no contamina las latencias)
+    mem = []
+    tracemalloc.start()
+    for i in range(min(n, n_mem)):
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn_mem(i)
+        mem.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return resumir(latencias, duracion, mem)
+
+
+# ---------- Medición del endpoint vía ASGI (sin red) ----------
+async def _medir_endpoint(app, cuerpos: List[dict], concurrencia: int, n_mem: int) -> Dict[str, Any]:
+    import httpx
+
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        sem = asyncio.Semaphore(concurrencia)
+        latencias: List[float] = []
+        errores = 0
+
+        async def una(cuerpo: dict):
+            nonlocal errores
+            async with sem:
+                a = time.perf_counter()
+                r = await cliente.post("/interpretar", json=cuerpo)
+                latencias.append(time.perf_counter() - a)
+                if r.status_code != 200:
+                    errores += 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(una(c) for c in cuerpos))
+        duracion = time.perf_counter() - t0
+
+        mem = []
+        tracemalloc.start()
+        for c in cuerpos[:n_mem]:
+            base, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            await cliente.post("/interpretar", json=c)
+            mem.append(tracemalloc.get_traced_memory()[1] - base)
+        tracemalloc.stop()
+
+    res = resumir(latencias, duracion, mem)
+    res["errores"] = errores
+    res["concurrencia"] = concurrencia
+    return res
+
+
+def ejecutar(args) -> Dict[str, Any]:
+    from app import main
+    from app.logic import postproceso_modelo
+
+    corpus = generar_corpus(args.n, args.semilla)
+    textos = [p["texto_libre"] for p in corpus]
+    resultados: Dict[str, Any] = {}
+
+    if "postproceso" in args.escenarios:
+        # Interpretaciones "del modelo" precalculadas; se copian fuera de la medición
+        plantillas = [main.interpretacion_fallback(t) for t in textos]
+        copias = [copy.deepcopy(p) for p in plantillas]
+        copias_mem = [copy.deepcopy(p) for p in plantillas[:args.n_mem]]
+
+        resultados["postproceso"] = medir_sync(
+            lambda i: postproceso_modelo(copias[i], textos[i]), len(textos), len(copias_mem),
+            fn_mem=lambda i: postproceso_modelo(copias_mem[i], textos[i]),
+        )
+
+    if "fallback" in args.escenarios:
+        resultados["fallback"] = medir_sync(lambda i: main.interpretacion_fallback(textos[i]), len(textos), args.n_mem)
+
+    if "endpoint_local" in args.escenarios:
+        cuerpos = [dict(p, usar_modelo=False) for p in corpus]
+        resultados["endpoint_local"] = asyncio.run(_medir_endpoint(main.app, cuerpos, args.concurrencia_local, args.n_mem))
+
+    if "endpoint_modelo" in args.escenarios:
+        gemini_original, ruteo_original = main.GEMINI, main.ROUTER_HABILITADO
+        main.GEMINI = GeminiSimulado(latencia_ms=args.latencia_ms, jitter=args.jitter, semilla=args.semilla)
+        main.ROUTER_HABILITADO = not args.sin_ruteo
+        try:
+            cuerpos = [dict(p, usar_modelo=True) for p in corpus[:args.n_modelo]]
+            res = asyncio.run(_medir_endpoint(main.app, cuerpos, args.concurrencia_modelo, min(args.n_mem, 50)))
+            res["latencia_simulada_ms"] = args.latencia_ms
+            res["llamadas_modelo"] = main.GEMINI.llamadas
+            resultados["endpoint_modelo"] = res
+        finally:
+            main.GEMINI, main.ROUTER_HABILITADO = gemini_original, ruteo_original
+
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "parametros": {k: v for k, v in vars(args).items() if k not in ("guardar", "comparar")},
+        "resultados": resultados,
+    }
+
+
+def comparar(actual: Dict[str, Any], base: Dict[str, Any], tolerancia: float) -> List[str]:
+    """Regresiones: p95/p99 o memoria suben, o req/s baja, más allá de la tolerancia relativa."""
+    regresiones = []
+    for escenario, r in actual["resultados"].items():
+        b = base.get("resultados", {}).get(escenario)
+        if not b:
+            continue
+        for metrica in ("p95_ms", "p99_ms", "mem_pico_por_req_kb"):
+            if b.get(metrica) and r[metrica] > b[metrica] * (1 + tolerancia):
+                regresiones.append(f"{escenario}.{metrica}: {b[metrica]} -> {r[metrica]}")
+        if b.get("req_por_s") and r["req_por_s"] < b["req_por_s"] * (1 - tolerancia):
+            regresiones.append(f"{escenario}.req_por_s: {b['req_por_s']} -> {r['req_por_s']}")
+    return regresiones
+
+
+def imprimir(reporte: Dict[str, Any]) -> None:
+    cols = ["n", "p50_ms", "p95_ms", "p99_ms", "req_por_s", "mem_pico_por_req_kb"]
+    anchos = [max(12, len(c) + 2) for c in cols]
+    print(f"{'escenario':<16}" + "".join(f"{c:>{w}}" for c, w in zip(cols, anchos)))
+    for escenario, r in reporte["resultados"].items():
+        print(f"{escenario:<16}" + "".join(f"{r[c]:>{w}}" for c, w in zip(cols, anchos)))
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark offline del pipeline de interpretación.")
+    ap.add_argument("--n", type=int, default=2000, help="tamaño del corpus sintético")
+    ap.add_argument("--semilla", type=int, default=42)
+    ap.add_argument("--escenarios", nargs="+", choices=ESCENARIOS, default=ESCENARIOS)
+    ap.add_argument("--n-mem", type=int, default=200, help="requests medidas con tracemalloc")
+    ap.add_argument("--concurrencia-local", type=int, default=1)
+    ap.add_argument("--n-modelo", type=int, default=500, help="requests del escenario endpoint_modelo")
+    ap.add_argument("--concurrencia-modelo", type=int, default=100)
+    ap.add_argument("--latencia-ms", type=float, default=800.0, help="latencia simulada de Gemini")
+    ap.add_argument("--sin-ruteo", action="store_true", help="endpoint_modelo: siempre llamar al modelo (sin local-first)")
+    ap.add_argument("--jitter", type=float, default=0.3, help="sigma log-normal de la latencia simulada")
+    ap.add_argument("--guardar", help="ruta del JSON de resultados (p. ej. bench/baselines/v1.json)")
+    ap.add_argument("--comparar", help="JSON de línea base contra el cual detectar regresiones")
+    ap.add_argument("--tolerancia", type=float, default=0.15)
+    args = ap.parse_args(argv)
+
+    reporte = ejecutar(args)
+    imprimir(reporte)
+
+    if args.guardar:
+        os.makedirs(os.path.dirname(os.path.abspath(args.guardar)), exist_ok=True)
+        with open(args.guardar, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados guardados en {args.guardar}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        regresiones = comparar(reporte, base, args.tolerancia)
+        if regresiones:
+            print("\nREGRESIONES (tolerancia {:.0%}):".format(args.tolerancia))
+            for r in regresiones:
+                print("  -", r)
+            return 1
+        print("\nSin regresiones respecto a", args.comparar)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Prueba offline del cliente resiliente del modelo (app/cliente_modelo.py) con GeminiSimulado.
+
+Escenarios:
+  caida     -> el modelo cuelga más que el timeout: tiempo total de N peticiones con y sin circuito
+  cola      -> latencia con cola pesada (jitter log-normal alto): p50/p95/p99 con y sin cobertura
+  cuota     -> ráfaga de peticiones contra un token bucket: llamadas/s efectivas y rechazos;
+               con 429 inyectados muestra cómo baja la tasa adaptativa
+
+Uso (desde la raíz del proyecto):
+    python -m bench.bench_resiliencia --escenarios caida cola cuota
+"""
+import sys
+import time
+import asyncio
+import argparse
+from typing import Dict, Any, List
+
+from .bench_pipeline import percentil
+from app.gemini_simulado import GeminiSimulado
+from app.cliente_modelo import ClienteModelo, Circuito, LimitadorTokens, ModeloNoDisponible
+
+ESCENARIOS = ["caida", "cola", "cuota"]
+_CONTENIDOS = ["Texto del cliente:\n\nQuiero 2 pan tajado para mañana en la tarde, calle 10 # 5-20"]
+
+
+async def _una(cliente: ClienteModelo, gemini: GeminiSimulado, timeout_s: float) -> str:
+    """Misma secuencia que app.main.llamar_modelo; retorna el resultado de la petición."""
+    try:
+        async with cliente.sesion():
+            await asyncio.wait_for(cliente.llamar(lambda: gemini.generate_content_async(_CONTENIDOS)), timeout_s)
+        return "modelo"
+    except ModeloNoDisponible as e:
+        return e.motivo
+    except asyncio.TimeoutError:
+        return "timeout"
+    except Exception:
+        return "excepcion"
+
+
+def _conteo(resultados: List[str]) -> Dict[str, int]:
+    conteo: Dict[str, int] = {}
+    for r in resultados:
+        conteo[r] = conteo.get(r, 0) + 1
+    return conteo
+
+
+async def caida(args) -> List[Dict[str, Any]]:
+    filas = []
+    for nombre, umbral in (("sin_circuito", 10 ** 9), ("con_circuito", 5)):
+        gemini = GeminiSimulado(latencia_ms=args.timeout_ms * 5, jitter=0, semilla=args.semilla)
+        cliente = ClienteModelo(Circuito(umbral, enfriamiento_s=60))
+        t0 = time.perf_counter()
+        resultados = [await _una(cliente, gemini, args.timeout_ms / 1000) for _ in range(args.n_caida)]
+        filas.append({
+            "variante": nombre,
+            "total_s": round(time.perf_counter() - t0, 2),
+            "llamadas_modelo": gemini.llamadas,
+            **_conteo(resultados),
+        })
+    return filas
+
+
+async def cola(args) -> List[Dict[str, Any]]:
+    filas = []
+    for nombre, cobertura in (("sin_cobertura", False), ("con_cobertura", True)):
+        gemini = GeminiSimulado(latencia_ms=args.latencia_ms, jitter=args.jitter, semilla=args.semilla)
+        cliente = ClienteModelo(Circuito(), cobertura=cobertura)
+        sem = asyncio.Semaphore(args.concurrencia)
+        latencias: List[float] = []
+
+        async def medir():
+            async with sem:
+                a = time.perf_counter()
+                await _una(cliente, gemini, 60)
+                latencias.append((time.perf_counter() - a) * 1000)
+
+        await asyncio.gather(*(medir() for _ in range(args.n)))
+        filas.append({
+            "variante": nombre,
+            "p50_ms": round(percentil(latencias, 50), 1),
+            "p95_ms": round(percentil(latencias, 95), 1),
+            "p99_ms": round(percentil(latencias, 99), 1),
+            "llamadas_modelo": gemini.llamadas,
+            "extra_pct": round(100 * (gemini.llamadas - args.n) / args.n, 1),
+        })
+    return filas
+
+
+async def cuota(args) -> List[Dict[str, Any]]:
+    filas = []
+    for nombre, tasa_cuota in (("cuota_fija", 0.0), ("con_429", 0.3)):
+        gemini = GeminiSimulado(latencia_ms=20, jitter=0, tasa_cuota=tasa_cuota, semilla=args.semilla)
+        limitador = LimitadorTokens(args.rpm / 60.0, rafaga=5)
+        cliente = ClienteModelo(Circuito(umbral_fallos=10 ** 9), limitador, espera_cuota_s=0.5)
+        t0 = time.perf_counter()
+        resultados = []
+
+        async def llegar(i: int):
+            await asyncio.sleep(i / args.tasa_llegada)
+            resultados.append(await _una(cliente, gemini, 5))
+
+        await asyncio.gather(*(llegar(i) for i in range(args.n_cuota)))
+        duracion = time.perf_counter() - t0
+        filas.append({
+            "variante": nombre,
+            "llamadas_por_s": round(gemini.llamadas / duracion, 1),
+            "rpm_final": round(limitador.tasa_actual * 60, 1),
+            **_conteo(resultados),
+        })
+    return filas
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Circuito, cuota y cobertura del cliente del modelo, sin red.")
+    ap.add_argument("--escenarios", nargs="+", choices=ESCENARIOS, default=ESCENARIOS)
+    ap.add_argument("--n", type=int, default=400, help="peticiones del escenario cola")
+    ap.add_argument("--n-caida", type=int, default=40)
+    ap.add_argument("--n-cuota", type=int, default=200)
+    ap.add_argument("--timeout-ms", type=float, default=200)
+    ap.add_argument("--latencia-ms", type=float, default=100)
+    ap.add_argument("--jitter", type=float, default=0.8)
+    ap.add_argument("--concurrencia", type=int, default=20)
+    ap.add_argument("--rpm", type=float, default=1200, help="cuota del token bucket")
+    ap.add_argument("--tasa-llegada", type=float, default=50, help="peticiones/s en el escenario cuota")
+    ap.add_argument("--semilla", type=int, default=42)
+    args = ap.parse_args(argv)
+
+    for nombre in args.escenarios:
+        print(f"\n== {nombre} ==")
+        for fila in asyncio.run(globals()[nombre](args)):
+            print("  " + "  ".join(f"{k}={v}" for k, v in fila.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
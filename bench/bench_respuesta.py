@@ -0,0 +1,142 @@
+"""
+Microbenchmark del ensamble y la serialización de la respuesta de /interpretar: registros con
+__slots__ + paso_siguiente_sugerido precalculado + app.respuesta.serializar (orjson si está
+instalado) contra la versión anterior (dicts anidados armados en cada llamada, copia del
+diccionario de sinónimos y jsonable_encoder + JSONResponse de FastAPI), copiada abajo.
+
+Por variante reporta µs de ensamble, µs de serialización y, con tracemalloc, bloques y bytes
+asignados por petición (lo que sigue vivo al terminar de armar la respuesta) y el pico durante
+la serialización. Las interpretaciones se calculan antes con el fallback local y postproceso.
+
+Uso (desde la raíz del proyecto):
+    python -m bench.bench_respuesta --n 2000 --repeticiones 5
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+os.environ.setdefault("USE_VERTEX", "false")
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from .corpus import generar_corpus
+from app.logic import (
+    TZ, NORMALIZACION, armar_respuesta_final, interpretacion_fallback, postproceso_modelo,
+    generar_pedido_id, generar_uuid_operacion,
+)
+from app.respuesta import orjson, serializar
+
+
+# ---------- Referencia: ensamble anterior ----------
+def _normalizacion_anterior() -> Dict[str, Any]:
+    return {
+        "diccionario_sinonimos": {k: list(v) for k, v in NORMALIZACION["diccionario_sinonimos"].items()},
+        "reglas_tiempo": NORMALIZACION["reglas_tiempo"],
+        "politica_unidades": NORMALIZACION["politica_unidades"],
+    }
+
+
+def armar_anterior(texto_libre: str, canal: str, interpretacion: Dict[str, Any],
+                   metadatos_extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    interpretacion = {**interpretacion, "normalizacion": _normalizacion_anterior()}
+    now = datetime.now(TZ)
+    return {
+        "pedido_id": generar_pedido_id(),
+        "solicitud_cliente": "Recibir e interpretar el pedido",
+        "entrada_original": {"canal": canal, "timestamp_iso": now.isoformat(), "texto_libre": texto_libre},
+        "interpretacion_IA": interpretacion,
+        "paso_siguiente_sugerido": {
+            "accion": "planificacion_entrega",
+            "inputs_requeridos": [
+                "Geocodificar direccion_entrega",
+                "Mapear items a SKU y validar stock",
+                "Asignar ventana exacta según capacidad de ruta"
+            ]
+        },
+        "nivel_confianza": 0.92,
+        "metadatos": {"version_agente": "interprete-1.0.0", "uuid_operacion": generar_uuid_operacion(),
+                      **(metadatos_extra or {})},
+    }
+
+
+def serializar_anterior(respuesta: Dict[str, Any]) -> bytes:
+    # Lo que hace FastAPI con un dict retornado sin response_model
+    return JSONResponse(jsonable_encoder(respuesta)).body
+
+
+VARIANTES = {
+    "anterior": (
+        lambda p, i: armar_anterior(p["texto_libre"], p["canal"], i, {"ruta": "local", "puntaje_local": 0.9}),
+        serializar_anterior,
+    ),
+    "registros": (
+        lambda p, i: armar_respuesta_final(p["texto_libre"], p["canal"], i, ruta="local", puntaje_local=0.9),
+        serializar,
+    ),
+}
+
+
+def _mejor_us(fn: Callable[[int], Any], n: int, repeticiones: int) -> float:
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        for i in range(n):
+            fn(i)
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor / n * 1e6
+
+
+def _asignaciones(fn: Callable[[int], Any], n: int) -> Dict[str, float]:
+    """Por petición: bloques y bytes que siguen vivos tras fn(i) y pico de bytes durante la llamada."""
+    bloques = vivos = pico = 0
+    resultados = []   # se retienen para contar lo que la respuesta deja vivo
+    tracemalloc.start()
+    for i in range(n):
+        b0 = sys.getallocatedblocks()
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        resultados.append(fn(i))
+        actual, p = tracemalloc.get_traced_memory()
+        bloques += sys.getallocatedblocks() - b0
+        vivos += actual - base
+        pico += p - base
+    tracemalloc.stop()
+    return {"bloques": bloques / n, "bytes_vivos": vivos / n, "bytes_pico": pico / n}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Ensamble y serialización de la respuesta: registros vs dicts.")
+    ap.add_argument("--n", type=int, default=2000)
+    ap.add_argument("--n-mem", type=int, default=200, help="peticiones de la pasada con tracemalloc")
+    ap.add_argument("--repeticiones", type=int, default=5)
+    ap.add_argument("--semilla", type=int, default=42)
+    args = ap.parse_args(argv)
+
+    peticiones = generar_corpus(args.n, args.semilla)
+    interpretaciones = [postproceso_modelo(interpretacion_fallback(p["texto_libre"]), p["texto_libre"])
+                        for p in peticiones]
+    n_mem = min(args.n, args.n_mem)
+
+    print(f"serializador: {'orjson ' + orjson.__version__ if orjson is not None else 'json (stdlib)'}")
+    print(f"{'variante':<12}{'us_armar':>10}{'us_serializar':>15}{'us_total':>10}"
+          f"{'bloques_armar':>15}{'kb_vivos_armar':>16}{'kb_pico_serializar':>20}{'bytes_json':>12}")
+    for nombre, (armar, serializar_fn) in VARIANTES.items():
+        respuestas = [armar(p, i) for p, i in zip(peticiones, interpretaciones)]
+        us_armar = _mejor_us(lambda k: armar(peticiones[k], interpretaciones[k]), args.n, args.repeticiones)
+        us_ser = _mejor_us(lambda k: serializar_fn(respuestas[k]), args.n, args.repeticiones)
+        mem_armar = _asignaciones(lambda k: armar(peticiones[k], interpretaciones[k]), n_mem)
+        mem_ser = _asignaciones(lambda k: serializar_fn(respuestas[k]), n_mem)
+        largo = sum(len(serializar_fn(r)) for r in respuestas) / len(respuestas)
+        print(f"{nombre:<12}{us_armar:>10.2f}{us_ser:>15.2f}{us_armar + us_ser:>10.2f}"
+              f"{mem_armar['bloques']:>15.1f}{mem_armar['bytes_vivos'] / 1024:>16.2f}"
+              f"{mem_ser['bytes_pico'] / 1024:>20.2f}{largo:>12.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
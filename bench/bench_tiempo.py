@@ -0,0 +1,121 @@
+"""
+Microbenchmark del parser de ventanas de entrega: parse_exp_tiempo_relativa (app/logic.py, que
+delega en app/tiempo.py: una pasada anclada en el día + tabla de reglas de hora) contra la versión
+anterior de la función (detección de día por subcadena y tres regex en secuencia), copiada abajo
+tal cual como referencia. Ambas se llaman igual, con el texto sin pasar a minúsculas.
+
+Reporta µs por llamada sobre el corpus sintético y cuántos textos resuelve cada uno, y además los
+µs de ambos solo sobre los textos que la versión anterior ya resolvía (misma carga de trabajo: el
+parser nuevo también interpreta días de la semana, mediodía y horas lejos del día, que la anterior
+descartaba sin leer). Las repeticiones de los dos parsers se intercalan, para que una racha lenta de
+la máquina no cargue solo a uno.
+
+Uso (desde la raíz del proyecto):
+    python -m bench.bench_tiempo --n 20000 --repeticiones 5
+"""
+import re
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .corpus import generar_corpus
+from app.logic import parse_exp_tiempo_relativa
+from app.tiempo import TZ
+
+# ---------- Referencia: parser anterior (copia sin cambios) ----------
+def ventana_anterior(texto: str, now: Optional[datetime] = None) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Convierte expresiones como:
+      - "mañana antes de las 3 pm"
+      - "hoy entre 2 y 4 pm"
+      - "pasado mañana a las 10am"
+    Retorna (inicio_iso, fin_iso, expresion_detectada)
+    """
+    if now is None:
+        now = datetime.now(TZ)
+
+    low = texto.lower()
+
+    # Detecta el día base
+    if "pasado mañana" in low:
+        base = (now + timedelta(days=2)).replace(hour=0, minute=0, second=0, microsecond=0)
+    elif "mañana" in low:
+        base = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    elif "hoy" in low:
+        base = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    else:
+        base = None
+
+    # Rangos "antes de las X"
+    m_antes = re.search(r"antes de las\s+(\d{1,2})(?::(\d{2}))?\s*(am|pm)?", low)
+    if base and m_antes:
+        hh = int(m_antes.group(1))
+        mm = int(m_antes.group(2) or 0)
+        ampm = (m_antes.group(3) or "").lower()
+        if ampm == "pm" and hh < 12: hh += 12
+        fin = base.replace(hour=hh, minute=mm)
+        return base.isoformat(), fin.isoformat(), m_antes.group(0)
+
+    # Rangos "entre X y Y"
+    m_entre = re.search(r"entre\s+(\d{1,2})(?::(\d{2}))?\s*(am|pm)?\s+y\s+(\d{1,2})(?::(\d{2}))?\s*(am|pm)?", low)
+    if base and m_entre:
+        h1 = int(m_entre.group(1)); m1 = int(m_entre.group(2) or 0); ap1 = (m_entre.group(3) or "").lower()
+        h2 = int(m_entre.group(4)); m2 = int(m_entre.group(5) or 0); ap2 = (m_entre.group(6) or "").lower()
+        if ap1 == "pm" and h1 < 12: h1 += 12
+        if ap2 == "pm" and h2 < 12: h2 += 12
+        ini = base.replace(hour=h1, minute=m1)
+        fin = base.replace(hour=h2, minute=m2)
+        return ini.isoformat(), fin.isoformat(), m_entre.group(0)
+
+    # Puntos "a las X"
+    m_a = re.search(r"a las\s+(\d{1,2})(?::(\d{2}))?\s*(am|pm)?", low)
+    if base and m_a:
+        h = int(m_a.group(1)); m = int(m_a.group(2) or 0); ap = (m_a.group(3) or "").lower()
+        if ap == "pm" and h < 12: h += 12
+        ini = base.replace(hour=h, minute=m)
+        fin = ini + timedelta(minutes=90)  # ventana de 90 min por defecto si no hay rango
+        return ini.isoformat(), fin.isoformat(), m_a.group(0)
+
+    # Si solo dice "mañana" sin hora, asumimos 00:00 a 15:00 como en tu ejemplo
+    if base and "mañana" in low:
+        return base.isoformat(), base.replace(hour=15).isoformat(), "mañana"
+
+    return None, None, None
+
+
+def medir(fns: Dict[str, Callable[[str, datetime], tuple]], textos: List[str], now: datetime, repeticiones: int) -> Dict[str, float]:
+    """Mejor de `repeticiones` pasadas de cada parser, intercaladas, en µs por llamada."""
+    mejor = {nombre: float("inf") for nombre in fns}
+    for _ in range(repeticiones):
+        for nombre, fn in fns.items():
+            t0 = time.perf_counter()
+            for t in textos:
+                fn(t, now)
+            mejor[nombre] = min(mejor[nombre], time.perf_counter() - t0)
+    return {nombre: seg / len(textos) * 1e6 for nombre, seg in mejor.items()}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Parser de ventanas de entrega: tabla de reglas vs versión anterior.")
+    ap.add_argument("--n", type=int, default=20000)
+    ap.add_argument("--repeticiones", type=int, default=5)
+    ap.add_argument("--semilla", type=int, default=42)
+    args = ap.parse_args(argv)
+
+    textos = [p["texto_libre"] for p in generar_corpus(args.n, args.semilla)]
+    now = TZ.localize(datetime(2026, 1, 7, 9, 0))
+    comunes = [t for t in textos if ventana_anterior(t, now)[0] is not None]
+    fns = {"anterior": ventana_anterior, "reglas": parse_exp_tiempo_relativa}
+    us = medir(fns, textos, now, args.repeticiones)
+    us_comunes = medir(fns, comunes, now, args.repeticiones)
+    print(f"{'parser':<12}{'us_por_llamada':>16}{'con_ventana':>14}{'us_textos_comunes':>20}")
+    for nombre, fn in fns.items():
+        resueltos = sum(1 for t in textos if fn(t, now)[0] is not None)
+        print(f"{nombre:<12}{us[nombre]:>16.2f}{resueltos / len(textos):>14.1%}{us_comunes[nombre]:>20.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+Tokens y latencia por llamada al modelo: prompt completo (PROMPT_COMPACTO=false) contra prompt
+compacto (system_instruction + response_schema).
+
+Por cada modo reporta tokens de entrada (total y solo la parte que cambia por petición), tokens de
+salida y la latencia de POST /interpretar con un Gemini simulado cuyo tiempo crece con los tokens
+de salida (--ms-por-token). Cada modo corre en su propio proceso porque el prompt se fija al importar
+app.main.
+
+Los tokens se estiman offline (palabras y signos); con --vertex se cuentan con count_tokens del
+modelo real (requiere credenciales).
+
+Uso (desde la raíz del proyecto):
+    python -m bench.bench_tokens --n 300
+    python -m bench.bench_tokens --n 300 --vertex
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+from typing import Dict, Any, List
+
+from .corpus import generar_corpus
+from app.gemini_simulado import GeminiSimulado, estimar_tokens
+from .bench_pipeline import percentil
+
+MODOS = {"completo": "false", "compacto": "true"}
+
+
+def _contador_tokens(usar_vertex: bool):
+    if not usar_vertex:
+        return lambda partes: sum(estimar_tokens(p) for p in partes)
+    from vertexai import init as vertex_init
+    from vertexai.generative_models import GenerativeModel
+    from app import main
+    vertex_init(project=main.PROJECT_ID, location=main.VERTEX_REGION)
+    modelo = GenerativeModel(main.MODEL_NAME)
+    return lambda partes: modelo.count_tokens(list(partes)).total_tokens
+
+
+def medir_modo(args) -> Dict[str, Any]:
+    """Corre dentro del subproceso: PROMPT_COMPACTO ya viene fijado en el entorno."""
+    import httpx
+    from app import main
+
+    contar = _contador_tokens(args.vertex)
+    corpus = generar_corpus(args.n, args.semilla)
+    textos = [p["texto_libre"] for p in corpus]
+
+    # Prefijo fijo por petición: instrucciones (+ esquema en el modo compacto)
+    if main.PROMPT_COMPACTO:
+        prefijo = contar([main.INSTRUCCIONES_SISTEMA, json.dumps(main.RESPONSE_SCHEMA, ensure_ascii=False)])
+    else:
+        prefijo = contar([main.SYSTEM_INSTRUCTIONS])
+
+    simulado = GeminiSimulado(latencia_ms=args.latencia_ms, jitter=args.jitter, semilla=args.semilla,
+                              ms_por_token_salida=args.ms_por_token)
+    entrada: List[int] = []
+    salida: List[int] = []
+    for t in textos:
+        contenidos = main._contenidos_modelo(t)
+        variable = [c for c in contenidos if c != main.SYSTEM_INSTRUCTIONS]
+        entrada.append(contar(variable))
+        salida.append(contar([simulado._responder(contenidos, main.GENERATION_CONFIG).text]))
+
+    main.GEMINI = simulado
+    main.ROUTER_HABILITADO = False
+    main.CACHE = None
+
+    async def carrera() -> List[float]:
+        semaforo = asyncio.Semaphore(args.concurrencia)
+        transporte = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=60) as cliente:
+            async def una(cuerpo) -> float:
+                async with semaforo:
+                    t0 = time.perf_counter()
+                    r = await cliente.post("/interpretar", json=cuerpo)
+                    r.raise_for_status()
+                    return time.perf_counter() - t0
+            return await asyncio.gather(*[una(dict(p, usar_modelo=True)) for p in corpus])
+
+    latencias_ms = [x * 1000 for x in asyncio.run(carrera())]
+    n = len(textos)
+    return {
+        "tokens_entrada_media": round(prefijo + sum(entrada) / n, 1),
+        "tokens_prefijo_fijo": prefijo,
+        "tokens_entrada_variable_media": round(sum(entrada) / n, 1),
+        "tokens_salida_media": round(sum(salida) / n, 1),
+        "p50_ms": round(percentil(latencias_ms, 50), 1),
+        "p95_ms": round(percentil(latencias_ms, 95), 1),
+        "contador": "vertex" if args.vertex else "estimado",
+    }
+
+
+def imprimir(resultados: Dict[str, Dict[str, Any]]) -> None:
+    cols = ["tokens_entrada_media", "tokens_prefijo_fijo", "tokens_salida_media", "p50_ms", "p95_ms"]
+    anchos = [len(c) + 2 for c in cols]
+    print(f"{'modo':<10}" + "".join(f"{c:>{w}}" for c, w in zip(cols, anchos)))
+    for modo, r in resultados.items():
+        print(f"{modo:<10}" + "".join(f"{r[c]:>{w}}" for c, w in zip(cols, anchos)))
+    if set(MODOS) <= set(resultados):
+        a, b = resultados["completo"], resultados["compacto"]
+        print()
+        for c in cols:
+            if a[c]:
+                print(f"{c}: {a[c]} -> {b[c]} ({(b[c] - a[c]) / a[c]:+.1%})")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Tokens y latencia: prompt completo vs compacto.")
+    ap.add_argument("--n", type=int, default=300)
+    ap.add_argument("--semilla", type=int, default=42)
+    ap.add_argument("--concurrencia", type=int, default=50)
+    ap.add_argument("--latencia-ms", type=float, default=300.0, help="latencia base simulada por llamada")
+    ap.add_argument("--ms-por-token", type=float, default=4.0, help="costo simulado por token de salida")
+    ap.add_argument("--jitter", type=float, default=0.2)
+    ap.add_argument("--vertex", action="store_true", help="contar tokens con count_tokens de Vertex")
+    ap.add_argument("--modo", choices=list(MODOS), help=argparse.SUPPRESS)  # uso interno (subproceso)
+    args = ap.parse_args(argv)
+
+    if args.modo:
+        print(json.dumps(medir_modo(args)))
+        return 0
+
+    resultados: Dict[str, Dict[str, Any]] = {}
+    for modo, valor in MODOS.items():
+        entorno = dict(os.environ, PROMPT_COMPACTO=valor, USE_VERTEX="false",
+                       CACHE_BACKEND="ninguno", REGISTRO_PEDIDOS_DIR="")
+        proc = subprocess.run(
+            [sys.executable, "-m", "bench.bench_tokens", "--modo", modo, *(argv if argv is not None else sys.argv[1:])],
+            env=entorno, capture_output=True, text=True, check=True,
+        )
+        resultados[modo] = json.loads(proc.stdout.strip().splitlines()[-1])
+    imprimir(resultados)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Prueba de carga del modo multi-proceso (python -m app.servidor) sobre la ruta local.
+
+Para cada cantidad de workers levanta el servidor real, lo calienta y lo carga en lazo cerrado
+durante --duracion segundos desde varios procesos cliente (cada uno con --concurrencia peticiones
+en vuelo). Reporta req/s, p50/p95 y la eficiencia de escalado: req/s(w) / (w * req/s(1)).
+
+Los clientes corren en la misma máquina y también consumen CPU: para medir escalado con más de
+unos pocos workers conviene reservar núcleos para los clientes (--clientes) o correrlos aparte.
+
+Uso (desde la raíz del proyecto; requiere httpx, ver bench/requirements.txt):
+    python -m bench.bench_workers --workers 1 2 4 --duracion 10
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from typing import Dict, Any, List
+
+from .corpus import generar_corpus
+from .bench_pipeline import percentil
+from app.servidor import cpus_disponibles
+
+
+def esperar_listo(url: str, timeout_s: float = 60, ruta: str = "/salud/vivo") -> None:
+    import httpx
+    limite = time.monotonic() + timeout_s
+    while time.monotonic() < limite:
+        try:
+            if httpx.get(url + ruta, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"El servidor no respondió en {timeout_s}s")
+
+
+def _cliente(url: str, cuerpos: List[dict], concurrencia: int, inicio: float, fin: float, salida) -> None:
+    """Proceso cliente: lazo cerrado hasta `fin`; solo cuenta las respuestas desde `inicio`."""
+    import httpx
+
+    async def correr() -> List[float]:
+        latencias: List[float] = []
+        limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+        async with httpx.AsyncClient(base_url=url, limits=limites, timeout=30) as cliente:
+            async def trabajador(k: int) -> None:
+                i = k
+                while time.time() < fin:
+                    t0 = time.perf_counter()
+                    r = await cliente.post("/interpretar", json=cuerpos[i % len(cuerpos)])
+                    if r.status_code == 200 and time.time() >= inicio:
+                        latencias.append(time.perf_counter() - t0)
+                    i += concurrencia
+            await asyncio.gather(*[trabajador(k) for k in range(concurrencia)])
+        return latencias
+
+    salida.put(asyncio.run(correr()))
+
+
+def medir(workers: int, args, cuerpos: List[dict]) -> Dict[str, Any]:
+    puerto = args.puerto
+    url = f"http://127.0.0.1:{puerto}"
+    with tempfile.TemporaryDirectory(prefix="bench-workers-") as tmp:
+        entorno = dict(
+            os.environ,
+            WEB_CONCURRENCY=str(workers),
+            PORT=str(puerto),
+            HOST="127.0.0.1",
+            USE_VERTEX="false",
+            ESTADO_COMPARTIDO_DIR=os.path.join(tmp, "estado"),
+            REGISTRO_PEDIDOS_DIR=os.path.join(tmp, "pedidos"),
+            CACHE_SQLITE_PATH=os.path.join(tmp, "cache.sqlite3"),
+            IDEMPOTENCIA_SQLITE_PATH=os.path.join(tmp, "idempotencia.sqlite3"),
+            IDEMPOTENCIA_VENTANA_S="0",  # el corpus repite textos: sin dedupe cada petición se procesa
+        )
+        servidor = subprocess.Popen(
+            [sys.executable, "-m", "app.servidor"], env=entorno,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            esperar_listo(url)
+            ctx = multiprocessing.get_context("spawn")
+            salida = ctx.Queue()
+            inicio = time.time() + args.calentamiento + 1.0
+            fin = inicio + args.duracion
+            clientes = [
+                ctx.Process(target=_cliente, args=(url, cuerpos[c::args.clientes], args.concurrencia, inicio, fin, salida))
+                for c in range(args.clientes)
+            ]
+            for p in clientes:
+                p.start()
+            latencias: List[float] = []
+            for _ in clientes:
+                latencias.extend(salida.get())
+            for p in clientes:
+                p.join()
+        finally:
+            servidor.terminate()
+            servidor.wait(timeout=30)
+    ms = [x * 1000 for x in latencias]
+    return {
+        "workers": workers,
+        "n": len(ms),
+        "req_por_s": round(len(ms) / args.duracion, 1),
+        "p50_ms": round(percentil(ms, 50), 2),
+        "p95_ms": round(percentil(ms, 95), 2),
+    }
+
+
+def main(argv=None) -> int:
+    cpus = cpus_disponibles()
+    ap = argparse.ArgumentParser(description="Escalado de throughput con varios workers (ruta local).")
+    ap.add_argument("--workers", type=int, nargs="+", default=sorted({1, max(1, cpus // 2), cpus}))
+    ap.add_argument("--duracion", type=float, default=10.0, help="segundos medidos por configuración")
+    ap.add_argument("--calentamiento", type=float, default=2.0)
+    ap.add_argument("--clientes", type=int, default=max(1, cpus // 2), help="procesos cliente")
+    ap.add_argument("--concurrencia", type=int, default=32, help="peticiones en vuelo por cliente")
+    ap.add_argument("--n", type=int, default=2000, help="tamaño del corpus")
+    ap.add_argument("--semilla", type=int, default=42)
+    ap.add_argument("--puerto", type=int, default=8765)
+    args = ap.parse_args(argv)
+
+    cuerpos = [dict(p, usar_modelo=False) for p in generar_corpus(args.n, args.semilla)]
+    print(f"CPUs disponibles: {cpus}; clientes: {args.clientes} x {args.concurrencia} en vuelo")
+    print(f"{'workers':>8}{'req_por_s':>12}{'p50_ms':>10}{'p95_ms':>10}{'eficiencia':>12}")
+    base = None
+    for w in args.workers:
+        r = medir(w, args, cuerpos)
+        if base is None:
+            base = r["req_por_s"] / w
+        eficiencia = r["req_por_s"] / (w * base) if base else 0.0
+        print(f"{w:>8}{r['req_por_s']:>12}{r['p50_ms']:>10}{r['p95_ms']:>10}{eficiencia:>12.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Corpus sintético de pedidos de panadería en español para benchmarks.
+
+Genera textos variados (direcciones, barrios, expresiones de tiempo, items, contacto,
+restricciones) a partir de plantillas con el estilo de ejemplo-input.txt.
+
+Uso:
+    python -m bench.corpus --n 1000 --salida corpus.jsonl   # JSONL de Peticion
+"""
+import re
+import json
+import random
+import argparse
+from typing import List, Dict
+
+CANALES = ["formulario_web", "whatsapp", "email", "telefono", "otro"]
+
+VIAS = ["Calle", "Cra", "Carrera", "Av", "Avenida", "Transv", "Diagonal", "Cll", "Cr"]
+BARRIOS = [
+    "Chapinero", "Cedritos", "Usaquén", "Suba", "Kennedy", "Fontibón", "Teusaquillo",
+    "Galerías", "La Soledad", "Modelia", "El Chicó", "Castilla",
+]
+CIUDADES = ["Bogotá", "Bogota", "Chía", "Soacha", ""]
+DIAS = ["mañana", "hoy", "pasado mañana", "el domingo", "el sábado", ""]
+HORAS = [
+    "antes de las {h} pm", "antes de las {h}:30 a.m.", "entre {h} y {h2} pm",
+    "entre {h}:15am y {h2}am", "a las {h}am", "a las {h} pm", "a las {h}:45", "al mediodía", "",
+]
+PRODUCTOS = [
+    "buñuelos", "buñuelo", "bunuelos", "arepas de maíz", "arepas", "arepa de maiz",
+    "pandebonos", "pan de yuca", "almojábanas", "croissants", "tortas de chocolate",
+    "mantecadas", "roscones", "galletas de avena",
+]
+TAMANOS = ["", "medianos", "pequeños", "grandes"]
+UNIDADES = ["", "", "", "docenas de", "bandejas de", "kg de"]
+NOMBRES = ["Andrés Pérez", "María Gómez", "Luisa Fernanda Ruiz", "Carlos Ramírez", "Panadería Dulce Hogar"]
+RESTRICCIONES = [
+    "Por favor, empacar frágil.", "Mantener refrigerado, es para un evento.", "Entregar en recepción.",
+    "Dejar en portería con autorización del administrador.", "Entregar en la sede piso 3.",
+    "Todo empacado por separado y marcado con etiquetas.", "",
+]
+SALUDOS = ["Hola,", "Buenos días,", "Buenas tardes, ", "Qué tal,", ""]
+
+PLANTILLAS = [
+    "{saludo} para {dia} {hora} necesito {items} para la tienda en {barrio}: {direccion}. {restriccion} Tel {telefono}.",
+    "{items} {dia} {hora} {direccion} {telefono}",
+    "{saludo} necesito un pedido para el evento de {dia}.\nPor favor, {items} para entregar en la sede de la "
+    "{direccion} {hora}.\n{restriccion}\nLa factura va a nombre de {nombre}, correo {email}.\n"
+    "Contacto: {nombre}, {telefono}.\nPor favor confirmar {dia} por WhatsApp.",
+    "Pedido {dia}: {items}. Dirección {direccion}, barrio {barrio}, {ciudad}. {hora}. {restriccion} {email}",
+    "{saludo} me ayudan con {items}? Es para {dia} {hora}. Queda en {direccion} ({barrio}). Soy {nombre}, cel {telefono}",
+]
+
+
+def _direccion(rnd: random.Random) -> str:
+    return f"{rnd.choice(VIAS)} {rnd.randint(1, 170)} #{rnd.randint(1, 120)}-{rnd.randint(1, 99)}"
+
+
+def _hora(rnd: random.Random) -> str:
+    h = rnd.randint(6, 11)
+    return rnd.choice(HORAS).format(h=h, h2=h + rnd.randint(1, 3))
+
+
+def _items(rnd: random.Random) -> str:
+    n = rnd.randint(1, 5)
+    partes = []
+    for _ in range(n):
+        tam = rnd.choice(TAMANOS)
+        partes.append(" ".join(x for x in [str(rnd.randint(1, 400)), rnd.choice(UNIDADES), rnd.choice(PRODUCTOS), tam] if x))
+    if len(partes) == 1:
+        return partes[0]
+    return ", ".join(partes[:-1]) + " y " + partes[-1]
+
+
+def _telefono(rnd: random.Random) -> str:
+    num = f"3{rnd.randint(0, 299999999):09d}"
+    return rnd.choice([num, f"+57 {num}", f"{num[:3]} {num[3:6]} {num[6:]}"])
+
+
+def generar_pedido(rnd: random.Random) -> str:
+    nombre = rnd.choice(NOMBRES)
+    texto = rnd.choice(PLANTILLAS).format(
+        saludo=rnd.choice(SALUDOS),
+        dia=rnd.choice(DIAS),
+        hora=_hora(rnd),
+        items=_items(rnd),
+        barrio=rnd.choice(BARRIOS),
+        ciudad=rnd.choice(CIUDADES),
+        direccion=_direccion(rnd),
+        restriccion=rnd.choice(RESTRICCIONES),
+        telefono=_telefono(rnd),
+        nombre=nombre,
+        email=nombre.split()[0].lower() + "@correo.com",
+    )
+    return re.sub(r"[ ]{2,}", " ", texto).strip()
+
+
+def generar_corpus(n: int, semilla: int = 42) -> List[Dict[str, str]]:
+    """Lista de payloads tipo Peticion ({texto_libre, canal}); determinista para una semilla."""
+    rnd = random.Random(semilla)
+    return [{"texto_libre": generar_pedido(rnd), "canal": rnd.choice(CANALES)} for _ in range(n)]
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Genera un corpus sintético de pedidos (JSONL de Peticion).")
+    ap.add_argument("--n", type=int, default=1000)
+    ap.add_argument("--semilla", type=int, default=42)
+    ap.add_argument("--salida", default="-")
+    args = ap.parse_args()
+    lineas = (json.dumps(p, ensure_ascii=False) for p in generar_corpus(args.n, args.semilla))
+    if args.salida == "-":
+        for linea in lineas:
+            print(linea)
+    else:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.writelines(linea + "\n" for linea in lineas)
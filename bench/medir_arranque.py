@@ -0,0 +1,134 @@
+"""
+Mide el tiempo de arranque del servicio: lanza uvicorn y cronometra hasta la primera
+respuesta (GET / estático y POST /interpretar local) y, si existe, hasta que
+/salud/listo?requiere_modelo=true reporta el modelo disponible.
+
+Con --ref compara contra otra versión del código (git worktree temporal), p. ej. la
+anterior al arranque perezoso:
+    python -m bench.medir_arranque --ref HEAD~1 --repeticiones 3
+"""
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import argparse
+import tempfile
+import subprocess
+import statistics
+import urllib.request
+import urllib.error
+from typing import Dict, Any, Optional
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _status(url: str, datos: Optional[bytes] = None) -> Optional[int]:
+    return _pedir(url, datos)[0]
+
+
+def _pedir(url: str, datos: Optional[bytes] = None):
+    req = urllib.request.Request(url, data=datos, headers={"Content-Type": "application/json"} if datos else {})
+    try:
+        with urllib.request.urlopen(req, timeout=2) as r:
+            return r.status, r.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+    except Exception:
+        return None, b""
+
+
+def medir_una(directorio: str, timeout_s: float, env_extra: Dict[str, str]) -> Dict[str, Any]:
+    puerto = _puerto_libre()
+    base = f"http://127.0.0.1:{puerto}"
+    env = dict(os.environ, **env_extra)
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(puerto)],
+        cwd=directorio, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    res: Dict[str, Any] = {"estatico_s": None, "interpretar_local_s": None, "modelo_listo_s": None, "modelo_estado": None}
+    cuerpo = json.dumps({"texto_libre": "20 buñuelos mañana a las 10am", "usar_modelo": False}).encode()
+    try:
+        while time.perf_counter() - t0 < timeout_s:
+            ahora = time.perf_counter() - t0
+            if res["estatico_s"] is None and _status(base + "/") == 200:
+                res["estatico_s"] = round(ahora, 3)
+            if res["estatico_s"] is not None and res["interpretar_local_s"] is None:
+                if _status(base + "/interpretar", cuerpo) == 200:
+                    res["interpretar_local_s"] = round(time.perf_counter() - t0, 3)
+            if res["interpretar_local_s"] is not None:
+                st, raw = _pedir(base + "/salud/listo?requiere_modelo=true")
+                if st == 200:
+                    res["modelo_listo_s"] = round(time.perf_counter() - t0, 3)
+                    res["modelo_estado"] = "listo"
+                    break
+                if st == 503:
+                    estado = json.loads(raw or b"{}").get("detail", {}).get("modelo", {}).get("estado")
+                    if estado in ("error", "deshabilitado"):  # no va a estar listo; no seguimos esperando
+                        res["modelo_estado"] = estado
+                        break
+                if st in (404, 405):  # versión sin endpoint de readiness: el modelo ya cargó al importar
+                    res["modelo_listo_s"] = res["estatico_s"]
+                    res["modelo_estado"] = "sin readiness"
+                    break
+            time.sleep(0.02)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return res
+
+
+def medir(directorio: str, repeticiones: int, timeout_s: float, env_extra: Dict[str, str]) -> Dict[str, Any]:
+    corridas = [medir_una(directorio, timeout_s, env_extra) for _ in range(repeticiones)]
+    resumen = {}
+    for clave in ("estatico_s", "interpretar_local_s", "modelo_listo_s"):
+        valores = [c[clave] for c in corridas if c[clave] is not None]
+        resumen[clave] = round(statistics.median(valores), 3) if valores else None
+    resumen["modelo_estado"] = corridas[-1]["modelo_estado"]
+    return {"mediana": resumen, "corridas": corridas}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Tiempo de arranque del servicio (uvicorn).")
+    ap.add_argument("--repeticiones", type=int, default=3)
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--ref", help="ref de git contra la cual comparar (se mide en un worktree temporal)")
+    ap.add_argument("--use-vertex", default="true", help="valor de USE_VERTEX para ambas mediciones")
+    args = ap.parse_args(argv)
+
+    env_extra = {"USE_VERTEX": args.use_vertex}
+    reporte = {"actual": medir(RAIZ, args.repeticiones, args.timeout, env_extra)}
+
+    if args.ref:
+        tmp = tempfile.mkdtemp(prefix="arranque-")
+        destino = os.path.join(tmp, "arbol")
+        subprocess.run(["git", "worktree", "add", "--detach", destino, args.ref], cwd=RAIZ, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            reporte[args.ref] = medir(destino, args.repeticiones, args.timeout, env_extra)
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", destino], cwd=RAIZ,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"{'version':<12}{'estatico_s':>14}{'interpretar_local_s':>22}{'modelo_listo_s':>17}{'modelo_estado':>16}")
+    for version, r in reporte.items():
+        m = r["mediana"]
+        print(f"{version:<12}{str(m['estatico_s']):>14}{str(m['interpretar_local_s']):>22}"
+              f"{str(m['modelo_listo_s']):>17}{str(m['modelo_estado']):>16}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,411 @@
+"""
+Replay y prueba de carga de POST /interpretar con tráfico grabado, para encontrar el punto de
+saturación de la configuración de workers / concurrencia del modelo.
+
+Entradas (--archivos, JSONL; sin archivos usa el corpus sintético de bench/corpus.py):
+  - payloads de Peticion: {"texto_libre", "canal", "usar_modelo"?, "timestamp_iso"?}
+    (por ejemplo la salida de `python -m bench.corpus --salida corpus.jsonl`)
+  - líneas del registro de pedidos (REGISTRO_PEDIDOS_DIR/**/*.jsonl): se toma entrada_original,
+    con su timestamp_iso como instante de llegada
+Las líneas que no son JSON o no traen texto_libre se descartan (se informa cuántas).
+
+Llegadas (--modo), una etapa por valor del barrido:
+  abierto  -> Poisson a cada tasa de --tasas (req/s), sin esperar respuestas
+  cerrado  -> cada valor de --concurrencias es la cantidad de peticiones en vuelo; cada una sale
+              cuando termina la anterior
+  registro -> los instantes grabados divididos por cada factor de --aceleraciones
+En lazo abierto la latencia se mide desde el instante programado, no desde el envío: si el
+cliente o el servidor se atrasan, la espera cuenta (sin "coordinated omission").
+
+Servidor: con --url se carga uno ya levantado. Si no, cada etapa levanta `python -m app.servidor`
+desde cero (circuito, cuota y caché no se arrastran entre etapas) con --workers y el Gemini
+simulado (MODELO_SIMULADO=true) con la latencia de --latencia-ms / --distribucion / --jitter /
+--tasa-lenta y los errores de --tasa-error / --tasa-cuota. MODEL_MAX_CONCURRENCY,
+MODEL_TIMEOUT_S, ROUTER_* y demás variables del entorno pasan tal cual al servidor.
+
+Por etapa reporta req/s ofrecidas y logradas (respuestas 200 completadas dentro de la ventana
+medida, después de --calentamiento), p50/p95/p99/máx, tasa de errores (HTTP y de red), la
+proporción de cada ruta de metadatos.ruta (local, local_confiable, modelo, fallback_local) y un
+histograma de latencias con los buckets de /metrics. Una etapa está saturada si lo logrado queda
+por debajo de --umbral de lo ofrecido (en lazo cerrado: si no sube al menos 5% respecto a la
+etapa anterior), si el p95 pasa de --slo-ms o si los errores pasan de --max-errores; el barrido
+se detiene en la primera etapa saturada.
+
+El cliente corre en un solo proceso y en la misma máquina: con pocos núcleos compite por CPU
+con los workers, así que conviene correrlo aparte (--url) para medir configuraciones grandes.
+
+Uso (desde la raíz del proyecto; requiere httpx, ver bench/requirements.txt):
+    python -m bench.replay --modo abierto --tasas 10 20 40 80 --workers 2 --latencia-ms 800
+    python -m bench.replay --modo cerrado --concurrencias 1 8 64 256 --usar-modelo false
+    python -m bench.replay --archivos $REGISTRO_PEDIDOS_DIR/*/*.jsonl --modo registro --aceleraciones 10 60
+"""
+import os
+import sys
+import json
+import time
+import bisect
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .corpus import generar_corpus
+from .bench_pipeline import percentil
+from .bench_workers import esperar_listo
+from app.metricas import BUCKETS_LATENCIA_S
+from app.ruteo import RUTA_FALLBACK
+from app.gemini_simulado import DISTRIBUCIONES
+
+CAMPOS_PETICION = ("texto_libre", "canal", "usar_modelo")
+LIMITES_MS = tuple(b * 1000 for b in BUCKETS_LATENCIA_S)
+
+# (inicio, fin, ruta o tipo de error, ok); inicio y fin en segundos desde el comienzo de la etapa
+Registro = Tuple[float, float, str, bool]
+
+
+# ---------- Lectura del tráfico grabado ----------
+def _instante(valor: Optional[str]) -> Optional[float]:
+    if not valor:
+        return None
+    try:
+        return datetime.fromisoformat(valor).timestamp()
+    except ValueError:
+        return None
+
+
+def cargar_peticiones(rutas: List[str]) -> Tuple[List[Dict[str, Any]], List[Optional[float]], int]:
+    """Cuerpos de Peticion, su instante grabado (o None) y cuántas líneas se descartaron."""
+    cuerpos: List[Dict[str, Any]] = []
+    instantes: List[Optional[float]] = []
+    descartadas = 0
+    for ruta in rutas:
+        with open(ruta, encoding="utf-8") as f:
+            for linea in f:
+                if not linea.strip():
+                    continue
+                try:
+                    obj = json.loads(linea)
+                except ValueError:
+                    descartadas += 1
+                    continue
+                if not isinstance(obj, dict):
+                    descartadas += 1
+                    continue
+                # Línea del registro de pedidos: la petición es la entrada original
+                if isinstance(obj.get("entrada_original"), dict):
+                    obj = obj["entrada_original"]
+                if not isinstance(obj.get("texto_libre"), str):
+                    descartadas += 1
+                    continue
+                cuerpos.append({k: obj[k] for k in CAMPOS_PETICION if obj.get(k) is not None})
+                instantes.append(_instante(obj.get("timestamp_iso")))
+    return cuerpos, instantes, descartadas
+
+
+def llegadas_poisson(tasa: float, duracion_s: float, rnd: random.Random) -> List[float]:
+    llegadas: List[float] = []
+    t = rnd.expovariate(tasa)
+    while t < duracion_s:
+        llegadas.append(t)
+        t += rnd.expovariate(tasa)
+    return llegadas
+
+
+def llegadas_grabadas(instantes: List[float], aceleracion: float, duracion_s: Optional[float]) -> List[float]:
+    t0 = instantes[0]
+    llegadas = [(t - t0) / aceleracion for t in instantes]
+    return [t for t in llegadas if t < duracion_s] if duracion_s else llegadas
+
+
+# ---------- Cliente ----------
+async def _enviar(cliente, cuerpo: Dict[str, Any], inicio: float, t0: float, registros: List[Registro]) -> None:
+    import httpx
+    try:
+        r = await cliente.post("/interpretar", json=cuerpo)
+        fin = time.perf_counter() - t0
+        if r.status_code == 200:
+            registros.append((inicio, fin, r.json()["metadatos"].get("ruta") or "?", True))
+        else:
+            registros.append((inicio, fin, f"http_{r.status_code}", False))
+    except httpx.HTTPError as e:
+        registros.append((inicio, time.perf_counter() - t0, type(e).__name__, False))
+
+
+async def _lazo_abierto(cliente, cuerpos: List[Dict[str, Any]], llegadas: List[float]) -> List[Registro]:
+    registros: List[Registro] = []
+    tareas = []
+    t0 = time.perf_counter()
+    for i, t in enumerate(llegadas):
+        espera = t - (time.perf_counter() - t0)
+        if espera > 0:
+            await asyncio.sleep(espera)
+        tareas.append(asyncio.create_task(_enviar(cliente, cuerpos[i % len(cuerpos)], t, t0, registros)))
+    await asyncio.gather(*tareas)
+    return registros
+
+
+async def _lazo_cerrado(cliente, cuerpos: List[Dict[str, Any]], concurrencia: int, duracion_s: float) -> List[Registro]:
+    registros: List[Registro] = []
+    t0 = time.perf_counter()
+
+    async def trabajador(k: int) -> None:
+        i = k
+        while (inicio := time.perf_counter() - t0) < duracion_s:
+            await _enviar(cliente, cuerpos[i % len(cuerpos)], inicio, t0, registros)
+            i += concurrencia
+
+    await asyncio.gather(*[trabajador(k) for k in range(concurrencia)])
+    return registros
+
+
+async def _cargar(url: str, args, cuerpos: List[Dict[str, Any]], llegadas: Optional[List[float]],
+                  concurrencia: int) -> List[Registro]:
+    import httpx
+    conexiones = concurrencia if llegadas is None else args.max_conexiones
+    limites = httpx.Limits(max_connections=conexiones, max_keepalive_connections=conexiones)
+    # Sin timeout de pool: en lazo abierto la espera por conexión ya cuenta en la latencia
+    timeout = httpx.Timeout(args.timeout, pool=None)
+    async with httpx.AsyncClient(base_url=url, limits=limites, timeout=timeout) as cliente:
+        # Calentamiento fuera de la medición: conexiones abiertas y cada worker con tráfico
+        previos: List[Registro] = []
+        await asyncio.gather(*[_enviar(cliente, cuerpos[i % len(cuerpos)], 0.0, 0.0, previos)
+                               for i in range(min(conexiones, 4 * args.workers))])
+        if llegadas is None:
+            return await _lazo_cerrado(cliente, cuerpos, concurrencia, args.duracion)
+        return await _lazo_abierto(cliente, cuerpos, llegadas)
+
+
+# ---------- Servidor local con el Gemini simulado ----------
+@contextmanager
+def servidor(args) -> Iterator[str]:
+    if args.url:
+        yield args.url.rstrip("/")
+        return
+    url = f"http://127.0.0.1:{args.puerto}"
+    with tempfile.TemporaryDirectory(prefix="bench-replay-") as tmp:
+        entorno = dict(
+            os.environ,
+            WEB_CONCURRENCY=str(args.workers),
+            PORT=str(args.puerto),
+            HOST="127.0.0.1",
+            USE_VERTEX="true",
+            MODELO_SIMULADO="true",
+            SIMULADO_LATENCIA_MS=str(args.latencia_ms),
+            SIMULADO_DISTRIBUCION=args.distribucion,
+            SIMULADO_JITTER=str(args.jitter),
+            SIMULADO_TASA_LENTA=str(args.tasa_lenta),
+            SIMULADO_FACTOR_LENTO=str(args.factor_lento),
+            SIMULADO_TASA_ERROR=str(args.tasa_error),
+            SIMULADO_TASA_CUOTA=str(args.tasa_cuota),
+            ESTADO_COMPARTIDO_DIR=os.path.join(tmp, "estado"),
+            REGISTRO_PEDIDOS_DIR=os.path.join(tmp, "pedidos"),
+            CACHE_SQLITE_PATH=os.path.join(tmp, "cache.sqlite3"),
+            IDEMPOTENCIA_SQLITE_PATH=os.path.join(tmp, "idempotencia.sqlite3"),
+            IDEMPOTENCIA_VENTANA_S="0",  # el tráfico grabado repite textos: cada petición se procesa
+        )
+        if not args.cache:
+            entorno["CACHE_BACKEND"] = "ninguno"  # los textos repetidos no deben esconder la latencia del modelo
+        proceso = subprocess.Popen(
+            [sys.executable, "-m", "app.servidor"], env=entorno,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            esperar_listo(url, ruta="/salud/listo?requiere_modelo=true")
+            yield url
+        finally:
+            proceso.terminate()
+            proceso.wait(timeout=30)
+
+
+# ---------- Resumen por etapa ----------
+def histograma(latencias_ms: List[float]) -> List[int]:
+    conteos = [0] * (len(LIMITES_MS) + 1)
+    for ms in latencias_ms:
+        conteos[bisect.bisect_left(LIMITES_MS, ms)] += 1
+    return conteos
+
+
+def resumir(registros: List[Registro], desde: float, hasta: float, abierto: bool) -> Dict[str, Any]:
+    """
+    Latencias y rutas de las peticiones iniciadas desde `desde`; req/s de las completadas en
+    [desde, hasta]. En lazo abierto lo ofrecido son las llegadas programadas en esa misma ventana
+    (no la tasa nominal: el ruido de Poisson no cuenta como saturación).
+    """
+    ventana = hasta - desde
+    ofrecido = None
+    if abierto and ventana > 0:
+        ofrecido = sum(1 for inicio, _, _, _ in registros if desde <= inicio < hasta) / ventana
+    medidos = [r for r in registros if r[0] >= desde]
+    ok = [r for r in medidos if r[3]]
+    ms = [(fin - inicio) * 1000 for inicio, fin, _, _ in medidos]
+    completadas = sum(1 for _, fin, _, bien in registros if bien and desde <= fin <= hasta)
+    errores: Dict[str, int] = {}
+    rutas: Dict[str, int] = {}
+    for _, _, etiqueta, bien in medidos:
+        destino = rutas if bien else errores
+        destino[etiqueta] = destino.get(etiqueta, 0) + 1
+    n = len(medidos)
+    return {
+        "n": n,
+        "ofrecido_rps": round(ofrecido, 2) if ofrecido is not None else None,
+        "logrado_rps": round(completadas / ventana, 2) if ventana > 0 else 0.0,
+        "p50_ms": round(percentil(ms, 50), 2),
+        "p95_ms": round(percentil(ms, 95), 2),
+        "p99_ms": round(percentil(ms, 99), 2),
+        "max_ms": round(max(ms), 2) if ms else 0.0,
+        "tasa_errores": round((n - len(ok)) / n, 4) if n else 0.0,
+        "errores": errores,
+        "tasa_fallback": round(rutas.get(RUTA_FALLBACK, 0) / len(ok), 4) if ok else 0.0,
+        "rutas": {k: round(v / len(ok), 4) for k, v in sorted(rutas.items())},
+        "histograma_ms": histograma(ms),
+    }
+
+
+def saturada(r: Dict[str, Any], anterior: Optional[Dict[str, Any]], args) -> Optional[str]:
+    """Motivo por el que la etapa está saturada, o None."""
+    if r["tasa_errores"] > args.max_errores:
+        return f"errores {r['tasa_errores']:.1%} > {args.max_errores:.1%}"
+    if args.slo_ms and r["p95_ms"] > args.slo_ms:
+        return f"p95 {r['p95_ms']:.0f} ms > {args.slo_ms:.0f} ms"
+    if r["ofrecido_rps"] is not None:
+        if r["logrado_rps"] < args.umbral * r["ofrecido_rps"]:
+            return f"logrado {r['logrado_rps']} < {args.umbral:.0%} de {r['ofrecido_rps']} req/s"
+    elif anterior is not None and r["logrado_rps"] < 1.05 * anterior["logrado_rps"]:
+        return f"req/s sin mejora ({anterior['logrado_rps']} -> {r['logrado_rps']})"
+    return None
+
+
+def imprimir_histograma(etapa: str, conteos: List[int], ancho: int = 40) -> None:
+    usados = [i for i, c in enumerate(conteos) if c]
+    if not usados:
+        return
+    mayor = max(conteos)
+    print(f"\nlatencias {etapa}")
+    for i in range(usados[0], usados[-1] + 1):
+        limite = f"<= {LIMITES_MS[i]:g} ms" if i < len(LIMITES_MS) else f"> {LIMITES_MS[-1]:g} ms"
+        print(f"  {limite:>12} {conteos[i]:>7} {'#' * round(ancho * conteos[i] / mayor)}")
+
+
+# ---------- Etapas ----------
+def correr_etapa(args, cuerpos: List[Dict[str, Any]], instantes: List[float], valor: float,
+                 rnd: random.Random) -> Dict[str, Any]:
+    concurrencia = 0
+    llegadas: Optional[List[float]] = None
+    if args.modo == "abierto":
+        llegadas = llegadas_poisson(valor, args.duracion, rnd)
+        fin_llegadas = args.duracion
+    elif args.modo == "registro":
+        llegadas = llegadas_grabadas(instantes, valor, args.duracion if args.duracion_dada else None)
+        fin_llegadas = llegadas[-1] if llegadas else 0.0
+    else:
+        concurrencia = int(valor)
+        fin_llegadas = args.duracion
+    with servidor(args) as url:
+        registros = asyncio.run(_cargar(url, args, cuerpos, llegadas, concurrencia))
+    desde = args.calentamiento if fin_llegadas > 2 * args.calentamiento else 0.0
+    return {"valor": valor, **resumir(registros, desde, fin_llegadas, llegadas is not None)}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Replay de tráfico grabado contra /interpretar y punto de saturación.")
+    ap.add_argument("--archivos", nargs="*", default=[], help="JSONL de Peticion o del registro de pedidos")
+    ap.add_argument("--modo", choices=["abierto", "cerrado", "registro"], default="abierto")
+    ap.add_argument("--tasas", type=float, nargs="+", default=[10, 20, 40, 80, 160, 320], help="req/s (abierto)")
+    ap.add_argument("--concurrencias", type=int, nargs="+", default=[1, 4, 16, 64, 256], help="en vuelo (cerrado)")
+    ap.add_argument("--aceleraciones", type=float, nargs="+", default=[1.0], help="factor sobre los instantes grabados (registro)")
+    ap.add_argument("--duracion", type=float, default=None, help="segundos por etapa (10; en registro, toda la traza)")
+    ap.add_argument("--calentamiento", type=float, default=2.0, help="segundos iniciales fuera de la medición")
+    ap.add_argument("--usar-modelo", choices=["true", "false"], default=None, help="sobrescribe usar_modelo de cada petición")
+    ap.add_argument("--url", default=None, help="servidor ya levantado; si no, se levanta uno por etapa")
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--puerto", type=int, default=8766)
+    ap.add_argument("--cache", action="store_true", help="deja la caché del modelo del servidor activa")
+    ap.add_argument("--latencia-ms", type=float, default=800.0, help="latencia del Gemini simulado")
+    ap.add_argument("--distribucion", choices=DISTRIBUCIONES, default="lognormal")
+    ap.add_argument("--jitter", type=float, default=0.3, help="sigma de la log-normal")
+    ap.add_argument("--tasa-lenta", type=float, default=0.0, help="fracción de llamadas en la cola lenta")
+    ap.add_argument("--factor-lento", type=float, default=10.0)
+    ap.add_argument("--tasa-error", type=float, default=0.0)
+    ap.add_argument("--tasa-cuota", type=float, default=0.0)
+    ap.add_argument("--timeout", type=float, default=60.0, help="timeout del cliente por petición (s)")
+    ap.add_argument("--max-conexiones", type=int, default=1000, help="conexiones del cliente en lazo abierto")
+    ap.add_argument("--umbral", type=float, default=0.9, help="fracción mínima de lo ofrecido que debe lograrse")
+    ap.add_argument("--slo-ms", type=float, default=0.0, help="p95 máximo; 0 = sin SLO")
+    ap.add_argument("--max-errores", type=float, default=0.01)
+    ap.add_argument("--n", type=int, default=2000, help="tamaño del corpus sintético si no hay archivos")
+    ap.add_argument("--semilla", type=int, default=42)
+    ap.add_argument("--guardar", default=None, help="ruta JSON con el resultado de cada etapa")
+    args = ap.parse_args(argv)
+    args.duracion_dada = args.duracion is not None
+    if args.duracion is None:
+        args.duracion = 10.0
+
+    if args.archivos:
+        cuerpos, instantes, descartadas = cargar_peticiones(args.archivos)
+        print(f"{len(cuerpos)} peticiones de {len(args.archivos)} archivo(s); {descartadas} líneas descartadas")
+    else:
+        cuerpos, instantes = generar_corpus(args.n, args.semilla), [None] * args.n
+        print(f"{len(cuerpos)} peticiones del corpus sintético")
+    if not cuerpos:
+        print("No hay peticiones para enviar")
+        return 1
+    if args.usar_modelo is not None:
+        cuerpos = [dict(c, usar_modelo=args.usar_modelo == "true") for c in cuerpos]
+    if args.modo == "registro":
+        if any(t is None for t in instantes):
+            print("El modo registro necesita timestamp_iso en todas las peticiones")
+            return 1
+        orden = sorted(range(len(cuerpos)), key=instantes.__getitem__)
+        cuerpos, instantes = [cuerpos[i] for i in orden], [instantes[i] for i in orden]
+    valores = {"abierto": args.tasas, "cerrado": args.concurrencias, "registro": args.aceleraciones}[args.modo]
+    nombre = {"abierto": "tasa", "cerrado": "en_vuelo", "registro": "aceleracion"}[args.modo]
+
+    destino = args.url or (f"app.servidor con {args.workers} worker(s), Gemini simulado "
+                           f"{args.distribucion} {args.latencia_ms:g} ms")
+    print(f"modo {args.modo} contra {destino}")
+    print(f"{nombre:>12}{'ofrecido':>10}{'logrado':>10}{'p50_ms':>10}{'p95_ms':>10}{'p99_ms':>10}"
+          f"{'errores':>9}{'fallback':>10}  rutas")
+    rnd = random.Random(args.semilla)
+    etapas: List[Dict[str, Any]] = []
+    anterior = None
+    motivo = None
+    for valor in valores:
+        r = correr_etapa(args, cuerpos, instantes, valor, rnd)
+        motivo = saturada(r, anterior, args)
+        r["saturada"] = motivo
+        etapas.append(r)
+        ofrecido = f"{r['ofrecido_rps']:.1f}" if r["ofrecido_rps"] is not None else "-"
+        rutas = " ".join(f"{k}={v:.0%}" for k, v in r["rutas"].items())
+        print(f"{valor:>12g}{ofrecido:>10}{r['logrado_rps']:>10.1f}{r['p50_ms']:>10.0f}{r['p95_ms']:>10.0f}"
+              f"{r['p99_ms']:>10.0f}{r['tasa_errores']:>9.1%}{r['tasa_fallback']:>10.1%}  {rutas}")
+        if motivo:
+            break
+        anterior = r
+
+    for r in etapas:
+        imprimir_histograma(f"{nombre}={r['valor']:g}", r["histograma_ms"])
+        if r["errores"]:
+            print("  errores: " + " ".join(f"{k}={v}" for k, v in sorted(r["errores"].items())))
+    print()
+    if motivo:
+        ultima = f"{nombre}={etapas[-2]['valor']:g}" if len(etapas) > 1 else "ninguna etapa"
+        print(f"saturación en {nombre}={etapas[-1]['valor']:g} ({motivo}); última etapa sana: {ultima}")
+    else:
+        print(f"sin saturación hasta {nombre}={valores[-1]:g}")
+
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as f:
+            json.dump({"modo": args.modo, "workers": args.workers, "url": args.url,
+                       "latencia_ms": args.latencia_ms, "distribucion": args.distribucion,
+                       "limites_histograma_ms": list(LIMITES_MS), "etapas": etapas},
+                      f, ensure_ascii=False, indent=2)
+        print(f"Guardado en {args.guardar}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
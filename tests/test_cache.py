@@ -0,0 +1,105 @@
+from datetime import datetime
+
+import pytest
+
+import app.tiempo as tiempo
+from app.cache import CacheMemoria, CacheSQLite, clave_cache
+from app.logic import interpretacion_fallback, postproceso_modelo
+
+
+class Reloj:
+    def __init__(self, t: float = 1000.0):
+        self.t = t
+
+    def __call__(self) -> float:
+        return self.t
+
+
+@pytest.fixture(params=["memoria", "sqlite"])
+def crear(request, tmp_path):
+    def crear(max_entradas=10, ttl_s=60):
+        reloj = Reloj()
+        if request.param == "memoria":
+            return CacheMemoria(max_entradas, ttl_s, reloj=reloj), reloj
+        return CacheSQLite(str(tmp_path / "cache.sqlite3"), max_entradas, ttl_s, reloj=reloj), reloj
+    return crear
+
+
+def _valor(n: int) -> dict:
+    return {"n": n, "detalles": {}}
+
+
+def test_hit_y_miss(crear):
+    cache, _ = crear()
+    hits, misses = cache.hits, cache.misses
+    assert cache.obtener("a") is None
+    cache.guardar("a", _valor(1))
+    assert cache.obtener("a") == _valor(1)
+    assert (cache.hits - hits, cache.misses - misses) == (1, 1)
+
+
+def test_cada_lectura_es_una_copia(crear):
+    cache, _ = crear()
+    cache.guardar("a", _valor(1))
+    cache.obtener("a")["n"] = 99
+    assert cache.obtener("a")["n"] == 1
+
+
+def test_entrada_vencida_es_miss_y_se_borra(crear):
+    cache, reloj = crear(ttl_s=60)
+    cache.guardar("a", _valor(1))
+    reloj.t += 60
+    assert cache.obtener("a") == _valor(1)
+    reloj.t += 0.001
+    assert cache.obtener("a") is None
+    assert cache.estadisticas()["entradas"] == 0
+
+
+def test_expulsa_la_menos_usada(crear):
+    cache, reloj = crear(max_entradas=2)
+    cache.guardar("a", _valor(1))
+    reloj.t += 1
+    cache.guardar("b", _valor(2))
+    reloj.t += 1
+    assert cache.obtener("a") is not None   # "a" pasa a ser la más reciente
+    reloj.t += 1
+    cache.guardar("c", _valor(3))
+    assert cache.obtener("b") is None
+    assert cache.obtener("a") == _valor(1)
+    assert cache.obtener("c") == _valor(3)
+    assert cache.estadisticas()["entradas"] == 2
+
+
+def test_clave_ignora_espacios_y_forma_unicode():
+    assert clave_cache("  pan   de\tbono ", "m", "p") == clave_cache("pan de bono", "m", "p")
+    assert clave_cache("café", "m", "p") == clave_cache("café", "m", "p")
+    assert clave_cache("pan", "m", "p") != clave_cache("pan", "m", "otro prompt")
+    assert clave_cache("pan", "m", "p") != clave_cache("pan", "otro modelo", "p")
+
+
+def _fijar_ahora(monkeypatch, ahora: datetime) -> None:
+    class Fijo(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return ahora
+    monkeypatch.setattr(tiempo, "datetime", Fijo)
+
+
+def test_ventana_se_recalcula_con_la_fecha_de_cada_peticion(crear, monkeypatch):
+    cache, _ = crear()
+    texto = "2 panes para mañana entre 2 y 4 pm"
+
+    _fijar_ahora(monkeypatch, tiempo.TZ.localize(datetime(2026, 1, 7, 9, 0)))
+    interpretacion = postproceso_modelo(interpretacion_fallback(texto), texto)
+    ventana = interpretacion["detalles"]["ventana_entrega"]
+    assert ventana["inicio_iso"] == "2026-01-08T14:00:00-05:00"
+    cache.guardar("k", interpretacion)
+    assert ventana["inicio_iso"] == "2026-01-08T14:00:00-05:00"  # guardar no toca el original
+
+    guardada = cache.obtener("k")["detalles"]["ventana_entrega"]
+    assert (guardada["inicio_iso"], guardada["fin_iso"]) == (None, None)
+
+    _fijar_ahora(monkeypatch, tiempo.TZ.localize(datetime(2026, 2, 1, 9, 0)))
+    hit = postproceso_modelo(cache.obtener("k"), texto)
+    ventana = hit["detalles"]["ventana_entrega"]
+    assert (ventana["inicio_iso"], ventana["fin_iso"]) == ("2026-02-02T14:00:00-05:00", "2026-02-02T16:00:00-05:00")
@@ -0,0 +1,37 @@
+from app.catalogo import CATALOGO
+from app.logic import interpretacion_fallback, postproceso_modelo
+
+
+def test_buscar_sinonimo_exacto_y_nombre_completo():
+    assert CATALOGO.buscar("Pandebonos")["nombre"] == "pandebonos"
+    assert CATALOGO.buscar("pan de bono")["nombre"] == "pandebonos"
+    assert CATALOGO.buscar("almojabana")["nombre"] == "almojábanas"
+    assert CATALOGO.buscar("docena de pandebonos")["nombre"] == "pandebonos"
+    assert CATALOGO.buscar("2 croissants")["nombre"] == "croissants"
+
+
+def test_buscar_no_asigna_sku_por_mencion_parcial():
+    for nombre in ("galletas de queso", "arepa rellena de queso", "café con leche", "pan de la casa", "torta", ""):
+        assert CATALOGO.buscar(nombre) is None, nombre
+
+
+def test_item_sin_coincidencia_queda_sin_sku_y_con_advertencia():
+    texto = "quiero 3 galletas de queso"
+    interpretacion = interpretacion_fallback(texto)
+    interpretacion["detalles"]["items"] = [{"nombre_detectado": "galletas de queso", "cantidad": 3}]
+    item = postproceso_modelo(interpretacion, texto)["detalles"]["items"][0]
+    assert item["sku"] is None
+    assert item["nombre_normalizado"] == "Galletas de queso"
+    assert any("SKU" in a for a in interpretacion["validaciones"]["advertencias"])
+
+
+def test_normalizacion_solo_con_los_sinonimos_del_pedido():
+    texto = "quiero 6 pandebonos y 2 croissants"
+    interpretacion = postproceso_modelo(interpretacion_fallback(texto), texto)
+    sinonimos = interpretacion["normalizacion"]["diccionario_sinonimos"]
+    assert list(sinonimos) == ["pandebonos", "croissants"]
+    assert "pan de bono" in sinonimos["pandebonos"]
+
+    texto = "hola, ¿tienen domicilio?"
+    interpretacion = postproceso_modelo(interpretacion_fallback(texto), texto)
+    assert interpretacion["normalizacion"]["diccionario_sinonimos"] == {}
@@ -0,0 +1,217 @@
+import asyncio
+import subprocess
+import sys
+import time
+
+import pytest
+
+from app.cliente_modelo import (
+    ABIERTO, CERRADO, SEMIABIERTO, COBERTURAS, Circuito, ClienteModelo, LimitadorTokens, ModeloNoDisponible,
+)
+
+
+class Reloj:
+    def __init__(self, t: float = 1000.0):
+        self.t = t
+
+    def __call__(self) -> float:
+        return self.t
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+def test_circuito_abre_deja_una_prueba_y_cierra():
+    reloj = Reloj()
+    circuito = Circuito(umbral_fallos=3, enfriamiento_s=30, reloj=reloj)
+    for _ in range(2):
+        assert circuito.admitir()
+        circuito.fallo()
+    assert circuito.estado == CERRADO
+    circuito.fallo()
+    assert circuito.estado == ABIERTO and circuito.aperturas == 1
+    assert not circuito.admitir()
+
+    reloj.t += 29.9
+    assert not circuito.admitir()
+    reloj.t += 0.1
+    assert circuito.admitir()             # la llamada de prueba
+    assert circuito.estado == SEMIABIERTO
+    assert not circuito.admitir()         # solo una a la vez
+    circuito.exito()
+    assert circuito.estado == CERRADO and circuito.fallos_seguidos == 0
+    assert circuito.admitir()
+
+
+def test_circuito_prueba_fallida_vuelve_a_abrir_y_cancelada_libera():
+    reloj = Reloj()
+    circuito = Circuito(umbral_fallos=1, enfriamiento_s=10, reloj=reloj)
+    circuito.fallo()
+    reloj.t += 10
+    assert circuito.admitir()
+    circuito.fallo()
+    assert circuito.estado == ABIERTO and circuito.aperturas == 2
+    assert not circuito.admitir()          # enfriamiento desde el último fallo
+    reloj.t += 10
+    assert circuito.admitir()
+    circuito.liberar()                     # cancelada sin resultado
+    assert circuito.estado == SEMIABIERTO
+    assert circuito.admitir()
+
+
+def test_limitador_rellena_tokens_con_el_tiempo():
+    reloj = Reloj()
+    limitador = LimitadorTokens(2.0, rafaga=2, reloj=reloj)
+
+    async def escenario():
+        tomados = [await limitador.intentar() for _ in range(3)]
+        reloj.t += 0.25
+        a_medias = await limitador.intentar()
+        reloj.t += 0.25
+        despues = await limitador.intentar()
+        reloj.t += 100
+        rafaga = [await limitador.intentar() for _ in range(3)]
+        return tomados, a_medias, despues, rafaga
+
+    tomados, a_medias, despues, rafaga = asyncio.run(escenario())
+    assert tomados[:2] == [0.0, 0.0]
+    assert tomados[2] == pytest.approx(0.5)    # 1 token a 2/s
+    assert a_medias == pytest.approx(0.25)
+    assert despues == 0.0
+    assert rafaga[:2] == [0.0, 0.0] and rafaga[2] > 0   # la ráfaga no acumula más de `rafaga`
+
+
+def test_429_baja_la_tasa_a_la_mitad_y_los_exitos_la_recuperan():
+    reloj = Reloj()
+    limitador = LimitadorTokens(10.0, rafaga=100, reloj=reloj, tasa_min_fraccion=0.1)
+    cliente = ClienteModelo(Circuito(umbral_fallos=100, reloj=reloj), limitador)
+
+    async def llamar(error=None):
+        async with cliente.sesion():
+            if error is not None:
+                raise error
+
+    async def escenario():
+        for _ in range(5):
+            with pytest.raises(ResourceExhausted):
+                await llamar(ResourceExhausted("429 Quota exceeded"))
+        minima = limitador.tasa_actual
+        await llamar()
+        return minima, limitador.tasa_actual
+
+    minima, tras_exito = asyncio.run(escenario())
+    assert minima == pytest.approx(1.0)         # 10 -> 5 -> 2.5 -> 1.25 -> 1 (piso)
+    assert tras_exito == pytest.approx(1.5)     # +5% de la tasa base por éxito
+    assert cliente.circuito.fallos_seguidos == 0
+
+
+def test_sin_cupo_no_se_llama_al_modelo():
+    reloj = Reloj()
+    limitador = LimitadorTokens(1.0, rafaga=1, reloj=reloj)
+    cliente = ClienteModelo(Circuito(reloj=reloj), limitador, espera_cuota_s=0.1)
+
+    async def escenario():
+        async with cliente.sesion():
+            pass
+        with pytest.raises(ModeloNoDisponible) as e:
+            async with cliente.sesion():
+                pass
+        return e.value.motivo
+
+    assert asyncio.run(escenario()) == "limite_cuota"
+    assert cliente.circuito.estado == CERRADO
+
+
+def _cliente_con_cobertura(retraso_s: float) -> ClienteModelo:
+    cliente = ClienteModelo(Circuito(), cobertura=True, min_muestras_cobertura=20, retraso_min_cobertura_s=0.0)
+    for _ in range(20):
+        cliente._registrar_latencia(retraso_s)
+    return cliente
+
+
+def _llamadas(duraciones):
+    """Llamada falsa: la i-ésima tarda duraciones[i]; registra inicio, fin y cancelación."""
+    registro = []
+
+    async def llamada():
+        i = len(registro)
+        evento = {"inicio": time.monotonic(), "cancelada": False}
+        registro.append(evento)
+        try:
+            await asyncio.sleep(duraciones[i])
+        except asyncio.CancelledError:
+            evento["cancelada"] = True
+            raise
+        return i
+
+    return llamada, registro
+
+
+def test_cobertura_se_lanza_tras_el_retraso_y_cancela_la_lenta():
+    cliente = _cliente_con_cobertura(0.05)
+    llamada, registro = _llamadas([1.0, 0.01])
+    ganadas = COBERTURAS.valores().get(("ganadas",), 0)
+
+    async def escenario():
+        t0 = time.monotonic()
+        resultado = await cliente.llamar(llamada)
+        await asyncio.sleep(0)  # deja que la cancelación llegue a la tarea perdedora
+        return resultado, time.monotonic() - t0
+
+    resultado, total = asyncio.run(escenario())
+    assert resultado == 1                                        # ganó la cobertura
+    assert registro[1]["inicio"] - registro[0]["inicio"] >= 0.045
+    assert registro[0]["cancelada"]
+    assert total < 0.5
+    assert COBERTURAS.valores()[("ganadas",)] == ganadas + 1
+
+
+def test_sin_cobertura_si_la_primera_responde_antes_del_retraso():
+    cliente = _cliente_con_cobertura(0.2)
+    llamada, registro = _llamadas([0.01, 0.01])
+    assert asyncio.run(cliente.llamar(llamada)) == 0
+    assert len(registro) == 1
+
+
+def test_cobertura_necesita_muestras_suficientes():
+    cliente = ClienteModelo(Circuito(), cobertura=True, min_muestras_cobertura=20)
+    assert cliente.retraso_cobertura() is None
+    llamada, registro = _llamadas([0.05])
+    assert asyncio.run(cliente.llamar(llamada)) == 0
+    assert len(registro) == 1
+
+
+def test_limitador_compartido_no_bloquea_el_loop_mientras_otro_worker_tiene_el_archivo(tmp_path):
+    ruta = str(tmp_path / "limitador.bin")
+    limitador = LimitadorTokens(10, 5, ruta=ruta)
+    # Otro proceso toma el lock del archivo durante 0.3 s
+    otro = subprocess.Popen(
+        [sys.executable, "-c",
+         "import fcntl, os, sys, time; fd = os.open(sys.argv[1], os.O_RDWR); fcntl.lockf(fd, fcntl.LOCK_EX);"
+         " print('listo', flush=True); time.sleep(0.3)", ruta],
+        stdout=subprocess.PIPE, text=True,
+    )
+    assert otro.stdout.readline().strip() == "listo"
+
+    async def escenario():
+        latidos = 0
+
+        async def latir():
+            nonlocal latidos
+            while True:
+                latidos += 1
+                await asyncio.sleep(0.01)
+
+        latido = asyncio.ensure_future(latir())
+        t0 = time.monotonic()
+        falta = await limitador.intentar()
+        espera = time.monotonic() - t0
+        latido.cancel()
+        return falta, espera, latidos
+
+    falta, espera, latidos = asyncio.run(escenario())
+    otro.wait()
+    assert falta == 0.0
+    assert espera >= 0.2          # esperó al otro worker...
+    assert latidos >= 10          # ...sin frenar el resto del loop
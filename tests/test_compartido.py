@@ -0,0 +1,25 @@
+import threading
+
+from app.compartido import AlmacenCompartido
+
+
+def test_observar_mientras_crece_el_archivo(tmp_path):
+    almacen = AlmacenCompartido(str(tmp_path))
+    bucket, suma, total = (almacen.ranura(c) for c in ("h_bucket", "h_suma", "h_total"))
+    errores = []
+
+    def observar():
+        try:
+            for _ in range(20000):
+                almacen.observar(bucket, suma, total, 0.5)
+        except Exception as e:
+            errores.append(e)
+
+    hilo = threading.Thread(target=observar)
+    hilo.start()
+    for i in range(5000):  # claves nuevas obligan a crecer (cerrar y volver a mapear) el archivo
+        almacen.ranura(f"clave_con_nombre_largo_{i:05d}")
+    hilo.join()
+    assert errores == []
+    valores = almacen.valores("h_")
+    assert valores == {"h_bucket": 20000, "h_suma": 10000, "h_total": 20000}
@@ -0,0 +1,73 @@
+from app.geocodificacion import GAZETTEER, Gazetteer, patron_con_tildes
+from app.logic import extraer_campos_heuristicos, interpretacion_fallback, postproceso_modelo
+
+
+def test_fechas_y_palabras_comunes_no_son_barrios():
+    for texto in (
+        "entregar el 20 de julio en la Calle 80",
+        "2 camisetas tipo polo para el chico",
+        "la panadería de la colina, Castilla la Nueva",
+        "a nombre de Andrés Restrepo, pedido del 12 de octubre",
+    ):
+        assert extraer_campos_heuristicos(texto)["barrio"] is None, texto
+
+
+def test_nombres_ambiguos_valen_despues_de_barrio():
+    assert extraer_campos_heuristicos("entregar en el barrio 20 de julio")["barrio"] == "Veinte de Julio"
+    assert extraer_campos_heuristicos("queda en barrio Restrepo")["barrio"] == "Restrepo"
+    assert extraer_campos_heuristicos("es en Chapinero Alto")["barrio"] == "Chapinero Alto"
+    assert GAZETTEER.barrio("Barrio Castilla").nombre == "Castilla"
+
+
+def test_precision_de_las_coordenadas():
+    por_barrio = postproceso_modelo(interpretacion_fallback("pan para el barrio Cedritos"), "pan para el barrio Cedritos")
+    direccion = por_barrio["detalles"]["direccion_entrega"]
+    assert direccion["lat"] and direccion["precision_coordenadas"] == "barrio"
+    assert any("centro del barrio" in a for a in por_barrio["validaciones"]["advertencias"])
+
+    texto = "pan para la Calle 93 # 12-45"
+    exacta = postproceso_modelo(interpretacion_fallback(texto), texto)
+    assert exacta["detalles"]["direccion_entrega"]["precision_coordenadas"] == "direccion"
+    assert not any("centro del barrio" in a for a in exacta["validaciones"]["advertencias"])
+
+
+def test_verbos_y_frases_comunes_no_son_barrios():
+    for texto in (
+        "20 panes, que el domiciliario suba al piso 3",
+        "pedido para doña Rosa, la soledad de la tarde",
+        "el retiro del pedido es en la tienda",
+        "galletas para Macarena, receta castellana",
+        "pan para Kennedy Rodríguez en la Calle 80",
+    ):
+        campos = extraer_campos_heuristicos(texto)
+        assert campos["barrio"] is None, texto
+    texto = "20 panes, que el domiciliario suba al piso 3"
+    interpretacion = postproceso_modelo(interpretacion_fallback(texto), texto)
+    assert interpretacion["detalles"]["direccion_entrega"]["lat"] is None
+
+
+def test_barrio_explicito_con_nombre_comun():
+    assert extraer_campos_heuristicos("entregar en el barrio Suba, que suba al piso 3")["barrio"] == "Suba"
+    assert extraer_campos_heuristicos("barrio La Soledad")["barrio"] == "La Soledad"
+    assert extraer_campos_heuristicos("es en Suba Centro")["barrio"] == "Suba"
+
+
+def test_barrio_con_nombre_de_ciudad_requiere_barrio():
+    datos = {
+        "ciudad": "Bogotá", "otras_ciudades": ["Madrid"],
+        "anclas": [{"calle": 0, "carrera": 0, "lat": 4.6, "lng": -74.1},
+                   {"calle": 100, "carrera": 0, "lat": 4.7, "lng": -74.1},
+                   {"calle": 0, "carrera": 100, "lat": 4.6, "lng": -74.2}],
+        "barrios": [{"nombre": "Madrid", "calles": [0, 10], "carreras": [0, 10]},
+                    {"nombre": "Niza", "calles": [10, 20], "carreras": [0, 10]}],
+    }
+    g = Gazetteer(datos)
+    assert g.patron_barrios(ambiguos=False) == patron_con_tildes("niza")
+    assert g.barrio("barrio Madrid").nombre == "Madrid"
+
+
+def test_parsear_con_texto_que_cambia_de_largo_al_pasar_a_minusculas():
+    partes = GAZETTEER.parsear("Pedido de İsmael: Calle 93 # 12-45 apto 301, gracias")
+    assert partes.texto == "calle 93 # 12-45 apto 301"
+    assert (partes.calle, partes.carrera) == (93.0, 12.45)
+    assert GAZETTEER.parsear("Pedido: Calle 93 # 12-45").texto == "Calle 93 # 12-45"
@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+
+from app.idempotencia import ConflictoIdempotencia, Idempotencia, clave_idempotencia
+
+
+def _ejecutar(idem, canal, texto, clave_cliente, respuesta):
+    clave, explicita, huella = clave_idempotencia(canal, texto, None, clave_cliente)
+
+    async def calcular():
+        return respuesta
+
+    return asyncio.run(idem.ejecutar(clave, explicita, calcular, huella))
+
+
+@pytest.mark.parametrize("ruta", [None, "sqlite"])
+def test_misma_llave_con_otro_cuerpo_es_conflicto(tmp_path, ruta):
+    idem = Idempotencia(ruta_sqlite=str(tmp_path / "idem.sqlite3") if ruta else None)
+    conflictos = idem.estadisticas()["conflictos"]  # el contador es del proceso
+    assert _ejecutar(idem, "whatsapp", "2 panes", "k1", {"pedido_id": "ORD-1"}) == ({"pedido_id": "ORD-1"}, False)
+    assert _ejecutar(idem, "whatsapp", "2 panes", "k1", {"pedido_id": "ORD-2"}) == ({"pedido_id": "ORD-1"}, True)
+    with pytest.raises(ConflictoIdempotencia):
+        _ejecutar(idem, "whatsapp", "3 panes", "k1", {"pedido_id": "ORD-3"})
+    assert idem.estadisticas()["conflictos"] == conflictos + 1
+
+
+def test_dedupe_por_contenido_es_opt_in():
+    # Sin ventana (por defecto) el mismo texto sin header no se guarda: no se repite
+    idem = Idempotencia()
+    assert _ejecutar(idem, "whatsapp", "2 panes", None, {"pedido_id": "ORD-1"})[1] is False
+    assert _ejecutar(idem, "whatsapp", "2 panes", None, {"pedido_id": "ORD-2"}) == ({"pedido_id": "ORD-2"}, False)
+    assert idem.estadisticas()["entradas"] == 0
+
+    idem = Idempotencia(ventana_s=120)
+    _ejecutar(idem, "whatsapp", "2 panes", None, {"pedido_id": "ORD-1"})
+    assert _ejecutar(idem, "whatsapp", "2  panes ", None, {"pedido_id": "ORD-2"}) == ({"pedido_id": "ORD-1"}, True)
+
+
+@pytest.mark.parametrize("ruta", [None, "sqlite"])
+def test_sin_ventana_no_guarda_ni_deja_reservas(tmp_path, ruta):
+    idem = Idempotencia(ruta_sqlite=str(tmp_path / "idem.sqlite3") if ruta else None, plazo_en_vuelo_s=60)
+    _ejecutar(idem, "whatsapp", "2 panes", None, {"pedido_id": "ORD-1"})
+    assert idem.estadisticas()["entradas"] == 0
+    if ruta:  # ni respuesta vencida ni reserva viva en el almacén compartido
+        assert idem._respuestas._conn.execute("SELECT COUNT(*) FROM idempotencia").fetchone()[0] == 0
+
+
+@pytest.mark.parametrize("ruta", [None, "sqlite"])
+def test_llamadas_concurrentes_calculan_una_vez(tmp_path, ruta):
+    idem = Idempotencia(ruta_sqlite=str(tmp_path / "idem.sqlite3") if ruta else None)
+    llamadas = []
+
+    async def calcular():
+        llamadas.append(1)
+        await asyncio.sleep(0.05)
+        return {"pedido_id": "ORD-1"}
+
+    async def escenario():
+        return await asyncio.gather(*(idem.ejecutar("k", True, calcular, "h") for _ in range(20)))
+
+    resultados = asyncio.run(escenario())
+    assert len(llamadas) == 1
+    assert all(r == {"pedido_id": "ORD-1"} for r, _ in resultados)
+    assert sorted(repetida for _, repetida in resultados) == [False] + [True] * 19
+
+
+@pytest.mark.parametrize("falla", ["excepcion", "cancelacion"])
+def test_quien_espera_reintenta_si_la_ejecucion_en_vuelo_falla(falla):
+    idem = Idempotencia()
+    llamadas = []
+
+    async def calcular():
+        llamadas.append(1)
+        if len(llamadas) == 1:
+            await asyncio.sleep(0.05)
+            if falla == "excepcion":
+                raise RuntimeError("modelo caído")
+            await asyncio.sleep(10)  # la cancelan antes
+        return {"pedido_id": f"ORD-{len(llamadas)}"}
+
+    async def escenario():
+        primera = asyncio.create_task(idem.ejecutar("k", True, calcular))
+        await asyncio.sleep(0.01)
+        segunda = asyncio.create_task(idem.ejecutar("k", True, calcular))
+        await asyncio.sleep(0.01)
+        if falla == "cancelacion":
+            await asyncio.sleep(0.06)
+            primera.cancel()
+        resultados = await asyncio.gather(primera, segunda, return_exceptions=True)
+        return resultados, idem.estadisticas()["en_vuelo"]
+
+    (primera, segunda), en_vuelo = asyncio.run(escenario())
+    assert isinstance(primera, RuntimeError if falla == "excepcion" else asyncio.CancelledError)
+    assert segunda == ({"pedido_id": "ORD-2"}, False)
+    assert len(llamadas) == 2 and en_vuelo == 0
+
+
+def test_reserva_vencida_de_otro_worker_se_retoma(tmp_path):
+    ruta = str(tmp_path / "idem.sqlite3")
+    caido = Idempotencia(ruta_sqlite=ruta, plazo_en_vuelo_s=0.2)
+    vivo = Idempotencia(ruta_sqlite=ruta, plazo_en_vuelo_s=0.2, espera_s=0.02)
+    assert caido._respuestas.reservar("k", caido.plazo_en_vuelo_s)  # y el worker muere sin terminar
+
+    async def calcular():
+        return {"pedido_id": "ORD-1"}
+
+    async def escenario():
+        t0 = asyncio.get_running_loop().time()
+        resultado = await vivo.ejecutar("k", True, calcular)
+        return resultado, asyncio.get_running_loop().time() - t0
+
+    resultado, espera = asyncio.run(escenario())
+    assert resultado == ({"pedido_id": "ORD-1"}, False)
+    assert espera >= 0.15                     # esperó el plazo de la reserva ajena
+    assert caido._respuestas.obtener("k")[0] == {"pedido_id": "ORD-1"}
+
+
+def test_worker_que_espera_recibe_la_respuesta_del_otro(tmp_path):
+    ruta = str(tmp_path / "idem.sqlite3")
+    otro = Idempotencia(ruta_sqlite=ruta)
+    este = Idempotencia(ruta_sqlite=ruta, espera_s=0.01)
+    assert otro._respuestas.reservar("k", 60)
+
+    async def calcular():
+        raise AssertionError("no debía calcular: la reserva del otro worker sigue vigente")
+
+    async def escenario():
+        tarea = asyncio.create_task(este.ejecutar("k", True, calcular))
+        await asyncio.sleep(0.05)
+        otro._respuestas.guardar("k", {"pedido_id": "ORD-1"}, 60)
+        return await tarea
+
+    assert asyncio.run(escenario()) == ({"pedido_id": "ORD-1"}, True)
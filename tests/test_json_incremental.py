@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+from app.json_incremental import JSONIncrementalError, ParserJSONIncremental
+
+DOC = json.dumps({
+    "tipo_pedido": "domicilio",
+    "detalles": {
+        "cliente": {"nombre": 'Ana "la del 5} piso" Díaz', "telefono": "3001234567", "email": None},
+        "items": [
+            {"producto": "pan \\ de [bono]", "cantidad": 2, "unidad": "unidad"},
+            {"producto": "café ☕ 🍞", "cantidad": 1.5, "unidad": "kg", "tags": [[1, 2], [], [[3]]]},
+        ],
+        "ventana_entrega": {"inicio_iso": None, "fin_iso": None, "expresion_detectada": "mañana, {antes} de las 3"},
+        "restricciones": {"manejo_fragil": True, "notas": ["a,b", "c:d", "\t"]},
+    },
+}, ensure_ascii=True)  # lo no ASCII llega como \uXXXX, 🍞 como par sustituto
+
+
+def _alimentar(trozos):
+    parser = ParserJSONIncremental()
+    eventos = []
+    for trozo in trozos:
+        eventos.extend(parser.alimentar(trozo))
+    return parser, eventos
+
+
+def _esperado():
+    detalles = json.loads(DOC)["detalles"]
+    return [
+        (("detalles", "cliente"), detalles["cliente"]),
+        (("detalles", "items", 0), detalles["items"][0]),
+        (("detalles", "items", 1), detalles["items"][1]),
+        (("detalles", "ventana_entrega"), detalles["ventana_entrega"]),
+        (("detalles", "restricciones"), detalles["restricciones"]),
+    ]
+
+
+def test_documento_entero():
+    parser, eventos = _alimentar([DOC])
+    assert eventos == _esperado()
+    assert parser.completo
+    assert parser.resultado() == json.loads(DOC)
+
+
+def test_corte_en_cada_posicion():
+    esperado, documento = _esperado(), json.loads(DOC)
+    for i in range(len(DOC) + 1):
+        parser, eventos = _alimentar([DOC[:i], DOC[i:]])
+        assert eventos == esperado, i
+        assert parser.resultado() == documento, i
+
+
+def test_caracter_por_caracter():
+    parser, eventos = _alimentar(list(DOC))
+    assert eventos == _esperado()
+    assert parser.resultado() == json.loads(DOC)
+
+
+def test_escapes_unicode_partidos_entre_trozos():
+    doc = '{"detalles": {"cliente": {"nombre": "Jos\\u00e9 \\ud83c\\udf5e \\"x\\" \\\\"}}}'
+    inicio = doc.index("\\u00e9")
+    for i in range(inicio, len(doc)):
+        for j in range(i, len(doc) + 1):
+            _, eventos = _alimentar([doc[:i], doc[i:j], doc[j:]])
+            assert eventos == [(("detalles", "cliente"), {"nombre": 'José 🍞 "x" \\'})], (i, j)
+
+
+def test_texto_sin_escapar_partido_entre_trozos():
+    doc = json.dumps({"detalles": {"cliente": {"nombre": "José 🍞"}}}, ensure_ascii=False)
+    for i in range(len(doc) + 1):
+        parser, _ = _alimentar([doc[:i], doc[i:]])
+        assert parser.resultado() == json.loads(doc)
+
+
+def test_arreglos_anidados():
+    doc = '{"detalles": {"items": [[1, [2, {"a": [3]}]], {"b": []}, [], {}]}}'
+    for i in range(len(doc) + 1):
+        _, eventos = _alimentar([doc[:i], doc[i:]])
+        assert eventos == [
+            (("detalles", "items", 0), [1, [2, {"a": [3]}]]),
+            (("detalles", "items", 1), {"b": []}),
+            (("detalles", "items", 2), []),
+            (("detalles", "items", 3), {}),
+        ], i
+
+
+def test_truncado_falla_al_pedir_el_resultado():
+    for i in range(len(DOC)):
+        parser, _ = _alimentar([DOC[:i]])
+        assert not parser.completo
+        with pytest.raises(JSONIncrementalError):
+            parser.resultado()
+
+
+@pytest.mark.parametrize("doc", [
+    '[1, 2]',
+    '{"a": 1]',
+    '{"a": [1}',
+    '{a: 1}',
+    '{"a": 1} {"b": 2}',
+    '{"a": 1}}',
+    '{"a" = 1}',
+])
+def test_json_invalido_falla_sin_esperar_el_final(doc):
+    for i in range(1, len(doc) + 1):
+        with pytest.raises(JSONIncrementalError):
+            _alimentar([doc[:i], doc[i:], " " * 10])
@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import app.main as main
+
+
+class RequestFalso:
+    """Solo lo que usa _cancelar_si_desconecta: el cliente se va tras `consultas` sondeos."""
+
+    def __init__(self, consultas: int):
+        self.consultas = consultas
+
+    async def is_disconnected(self) -> bool:
+        self.consultas -= 1
+        return self.consultas < 0
+
+
+@pytest.fixture
+def lote(monkeypatch):
+    estado = {"empezadas": 0, "canceladas": 0}
+
+    async def procesar_peticion(peticion, request=None, parciales=None):
+        estado["empezadas"] += 1
+        try:
+            await asyncio.sleep(float(peticion.texto_libre))
+        except asyncio.CancelledError:
+            estado["canceladas"] += 1
+            raise
+        return {"texto": peticion.texto_libre}
+
+    monkeypatch.setattr(main, "procesar_peticion", procesar_peticion)
+    monkeypatch.setattr(main, "DISCONNECT_POLL_S", 0.01)
+    monkeypatch.setattr(main, "LOTE_PARALELISMO", 2)
+
+    def lote(duraciones, request):
+        peticiones = [main.Peticion(texto_libre=str(d)) for d in duraciones]
+
+        async def escenario():
+            try:
+                return await main.interpretar_lote(request, peticiones)
+            finally:
+                await asyncio.sleep(0.01)  # deja correr las cancelaciones
+        return asyncio.run(escenario())
+
+    lote.estado = estado
+    return lote
+
+
+def test_lote_json_responde_en_orden(lote):
+    respuesta = json.loads(lote([0.03, 0.0, 0.01], RequestFalso(consultas=100)).body)
+    assert (respuesta["total"], respuesta["exitosos"]) == (3, 3)
+    assert [r["respuesta"]["texto"] for r in respuesta["resultados"]] == ["0.03", "0.0", "0.01"]
+    assert lote.estado["canceladas"] == 0
+
+
+def test_lote_json_cancela_lo_pendiente_si_el_cliente_se_va(lote):
+    with pytest.raises(HTTPException) as e:
+        lote([10] * 6, RequestFalso(consultas=2))
+    assert e.value.status_code == 499
+    # Con paralelismo 2 solo empezaron dos; esas se cancelan y el resto nunca arranca
+    assert lote.estado == {"empezadas": 2, "canceladas": 2}
@@ -0,0 +1,94 @@
+import os
+import time
+
+from app.registro_pedidos import RegistroPedidos
+from app.respuesta import EntradaOriginal, Metadatos, RespuestaPedido
+
+
+def _respuesta(pedido_id: str) -> RespuestaPedido:
+    return RespuestaPedido(
+        pedido_id, EntradaOriginal("otro", "2026-01-07T09:00:00-05:00", "pan " * 50), {}, 0.5, Metadatos("op"),
+    )
+
+
+def _esperar_escritos(registro: RegistroPedidos, n: int) -> None:
+    limite = time.monotonic() + 5
+    while registro.escritos < n and time.monotonic() < limite:
+        time.sleep(0.005)
+
+
+def test_retencion_borra_segmentos_viejos_y_sus_entradas(tmp_path):
+    registro = RegistroPedidos(str(tmp_path), max_bytes_segmento=1000, espera_lote_s=0.001, max_segmentos=2)
+    for i in range(40):
+        registro.registrar(_respuesta(f"ORD-{i:04d}"))
+        _esperar_escritos(registro, i + 1)
+    registro.cerrar()
+    segmentos = sorted(n for n in os.listdir(tmp_path) if n.endswith(".jsonl"))
+    assert len(segmentos) == 2
+    assert registro.leer("ORD-0000") is None
+    assert registro.leer("ORD-0039")["pedido_id"] == "ORD-0039"
+    assert registro.estadisticas()["pedidos_indexados"] < 40
+
+    # Al arrancar de nuevo solo se indexa lo retenido
+    reabierto = RegistroPedidos(str(tmp_path), max_bytes_segmento=1000, max_segmentos=2)
+    assert reabierto.leer("ORD-0039")["pedido_id"] == "ORD-0039"
+    assert reabierto.leer("ORD-0000") is None
+    reabierto.cerrar()
+
+
+def test_lote_fallido_se_reintenta_sin_dejar_lineas_a_medias(tmp_path):
+    registro = RegistroPedidos(str(tmp_path), espera_lote_s=0.001)
+    original = registro._escribir_lote
+    fallos = [1]
+
+    def escribir_lote(lote):
+        if fallos[0]:
+            fallos[0] -= 1
+            registro._archivo.write(b'{"pedido_id": "ORD-cortado"')  # escritura cortada
+            raise OSError("disco lleno")
+        original(lote)
+
+    registro._escribir_lote = escribir_lote
+    registro.registrar(_respuesta("ORD-0001"))
+    _esperar_escritos(registro, 1)
+    registro.cerrar()
+    with open(tmp_path / "pedidos-000001.jsonl", "rb") as f:
+        lineas = f.read().splitlines()
+    assert len(lineas) == 1 and b'"ORD-0001"' in lineas[0]
+    assert registro.leer("ORD-0001")["pedido_id"] == "ORD-0001"
+
+
+def test_lote_que_sigue_fallando_se_descarta(tmp_path):
+    registro = RegistroPedidos(str(tmp_path), espera_lote_s=0.001, reintentos=1)
+
+    def escribir_lote(lote):
+        raise OSError("disco lleno")
+
+    registro._escribir_lote = escribir_lote
+    registro.registrar(_respuesta("ORD-0001"))
+    registro.cerrar()
+    assert registro.estadisticas()["descartados"] == 1
+    assert registro.estadisticas()["pendientes"] == 0
+    assert registro.leer("ORD-0001") is None
+
+
+def test_retencion_adopta_carpetas_de_procesos_terminados(tmp_path):
+    huerfana = tmp_path / "w999999999"  # ningún proceso vivo tiene este pid
+    huerfana.mkdir()
+    for n in range(1, 4):
+        (huerfana / f"pedidos-{n:06d}.jsonl").write_bytes(b'{"pedido_id": "ORD-VIEJO"}\n')
+    viva = tmp_path / f"w{os.getppid()}"  # carpeta de un proceso que sigue vivo: no se toca
+    viva.mkdir()
+    (viva / "pedidos-000001.jsonl").write_bytes(b'{"pedido_id": "ORD-VIVO"}\n')
+
+    escritor = f"w{os.getpid()}"
+    registro = RegistroPedidos(str(tmp_path), max_bytes_segmento=1000, espera_lote_s=0.001,
+                               escritor=escritor, max_segmentos=2)
+    assert len(os.listdir(huerfana)) == 2
+    for i in range(20):
+        registro.registrar(_respuesta(f"ORD-{i:04d}"))
+        _esperar_escritos(registro, i + 1)
+    registro.cerrar()
+    assert not huerfana.exists()
+    assert len([n for n in os.listdir(tmp_path / escritor) if n.endswith(".jsonl")]) == 2
+    assert os.listdir(viva) == ["pedidos-000001.jsonl"]
@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+import app.main as main
+from app.logic import interpretacion_fallback, postproceso_modelo
+from app.ruteo import (
+    RUTA_FALLBACK, RUTA_LOCAL, RUTA_LOCAL_CONFIABLE, RUTA_MODELO, EstadisticasRuteo, puntaje_confianza,
+)
+
+COMPLETO = ("Hola, quiero 2 panes de bono para mañana entre 2 y 4 pm en la Calle 45 #12-30, "
+            "Chapinero, Bogotá. Mi cel 3001234567")
+SIN_VENTANA = "Quiero 2 panes de bono en la Calle 45 #12-30, Chapinero, Bogotá. Mi cel 3001234567"
+
+
+def _interpretacion(direccion=True, ventana=True, skus=(), contacto=None):
+    return {
+        "validaciones": {"campos_obligatorios": {
+            "direccion_entrega": direccion, "ventana_entrega": ventana, "items": bool(skus),
+        }},
+        "detalles": {
+            "items": [{"producto": "x", "sku": sku} for sku in skus],
+            "cliente": contacto or {},
+        },
+    }
+
+
+def test_puntaje_suma_los_pesos_de_cada_campo():
+    assert puntaje_confianza({}) == 0.0
+    assert puntaje_confianza(_interpretacion(skus=("A",), contacto={"telefono": "300"})) == 1.0
+    assert puntaje_confianza(_interpretacion(skus=("A",), contacto={"email": "a@b.co"})) == 1.0
+    assert puntaje_confianza(_interpretacion(skus=("A",))) == 0.9
+    assert puntaje_confianza(_interpretacion(direccion=False, ventana=False, skus=("A",))) == 0.3
+
+
+def test_items_suman_en_proporcion_a_los_que_tienen_sku():
+    assert puntaje_confianza(_interpretacion(skus=("A", None))) == 0.75
+    assert puntaje_confianza(_interpretacion(skus=("A", None, None, None))) == 0.675
+    assert puntaje_confianza(_interpretacion(skus=(None,))) == 0.6
+
+
+def test_puntaje_de_textos_reales():
+    def local(texto):
+        return puntaje_confianza(postproceso_modelo(interpretacion_fallback(texto), texto))
+    assert local(COMPLETO) == 1.0
+    assert local(SIN_VENTANA) == 0.7
+    assert local("hola") == 0.0
+
+
+@pytest.fixture
+def ruteo(monkeypatch):
+    """procesar_peticion con un modelo falso: registra los textos que llegan a Gemini."""
+    llamadas = []
+
+    async def interpretar_con_modelo(texto, request=None, parciales=None):
+        llamadas.append(texto)
+        return interpretacion_fallback(texto) if ruteo.modelo_responde else None
+
+    monkeypatch.setattr(main, "GEMINI", object())
+    monkeypatch.setattr(main, "USE_VERTEX", True)
+    monkeypatch.setattr(main, "ROUTER_HABILITADO", True)
+    monkeypatch.setattr(main, "interpretar_con_modelo", interpretar_con_modelo)
+    monkeypatch.setattr(main, "REGISTRO", None)
+
+    def ruteo(texto, umbral=0.9, usar_modelo=None):
+        monkeypatch.setattr(main, "ROUTER_UMBRAL", umbral)
+        peticion = main.Peticion(texto_libre=texto, usar_modelo=usar_modelo)
+        return asyncio.run(main.procesar_peticion(peticion)).metadatos
+
+    ruteo.llamadas = llamadas
+    ruteo.modelo_responde = True
+    return ruteo
+
+
+def test_sobre_el_umbral_no_llama_al_modelo(ruteo):
+    metadatos = ruteo(COMPLETO, umbral=1.0)   # el umbral es inclusivo
+    assert (metadatos.ruta, metadatos.puntaje_local) == (RUTA_LOCAL_CONFIABLE, 1.0)
+    assert ruteo.llamadas == []
+
+
+def test_bajo_el_umbral_llama_al_modelo(ruteo):
+    metadatos = ruteo(SIN_VENTANA, umbral=0.9)
+    assert (metadatos.ruta, metadatos.puntaje_local) == (RUTA_MODELO, 0.7)
+    assert ruteo.llamadas == [SIN_VENTANA]
+
+    metadatos = ruteo(SIN_VENTANA, umbral=0.7)
+    assert metadatos.ruta == RUTA_LOCAL_CONFIABLE
+    assert len(ruteo.llamadas) == 1
+
+
+def test_si_el_modelo_falla_se_usa_la_interpretacion_local(ruteo):
+    ruteo.modelo_responde = False
+    metadatos = ruteo(SIN_VENTANA)
+    assert (metadatos.ruta, metadatos.puntaje_local) == (RUTA_FALLBACK, 0.7)
+
+
+def test_usar_modelo_explicito_salta_el_router(ruteo):
+    metadatos = ruteo(COMPLETO, umbral=0.0, usar_modelo=True)
+    assert (metadatos.ruta, metadatos.puntaje_local) == (RUTA_MODELO, None)
+    assert ruteo.llamadas == [COMPLETO]
+
+    metadatos = ruteo(SIN_VENTANA, umbral=1.0, usar_modelo=False)
+    assert (metadatos.ruta, metadatos.puntaje_local) == (RUTA_LOCAL, 0.7)
+    assert len(ruteo.llamadas) == 1
+
+
+def test_router_deshabilitado_siempre_llama_al_modelo(ruteo, monkeypatch):
+    monkeypatch.setattr(main, "ROUTER_HABILITADO", False)
+    assert ruteo(COMPLETO, umbral=0.0).ruta == RUTA_MODELO
+    assert ruteo.llamadas == [COMPLETO]
+
+
+def test_estadisticas_cuentan_cada_ruta(ruteo):
+    antes = EstadisticasRuteo().por_ruta
+    ruteo(COMPLETO)
+    ruteo(SIN_VENTANA)
+    ruteo(COMPLETO, usar_modelo=False)
+    despues = EstadisticasRuteo().por_ruta
+    assert {r: despues[r] - antes[r] for r in despues} == {
+        RUTA_LOCAL: 1, RUTA_LOCAL_CONFIABLE: 1, RUTA_MODELO: 1, RUTA_FALLBACK: 0,
+    }
@@ -0,0 +1,12 @@
+from app.servidor import preparar_estado_compartido
+
+
+def test_estado_compartido_solo_borra_sus_archivos(tmp_path, monkeypatch):
+    for nombre in ("valores-w1.bin", "valores-w2.bin", "limitador-modelo.bin", "otro.db"):
+        (tmp_path / nombre).write_bytes(b"x")
+    (tmp_path / "datos").mkdir()
+    monkeypatch.setenv("ESTADO_COMPARTIDO_DIR", str(tmp_path))
+    monkeypatch.setenv("CACHE_BACKEND", "memoria")
+    monkeypatch.setenv("IDEMPOTENCIA_BACKEND", "memoria")
+    assert preparar_estado_compartido() == str(tmp_path)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["datos", "otro.db"]
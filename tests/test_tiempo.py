@@ -0,0 +1,50 @@
+from datetime import datetime
+
+from app.tiempo import TZ, interpretar_ventana
+
+MIERCOLES = TZ.localize(datetime(2026, 1, 7, 9, 0))
+DOMINGO_TARDE = TZ.localize(datetime(2026, 1, 11, 16, 0))
+
+
+def test_rango_que_termina_a_medianoche():
+    ini, fin, _ = interpretar_ventana("hoy entre 11pm y 12am", MIERCOLES)
+    assert (ini, fin) == ("2026-01-07T23:00:00-05:00", "2026-01-08T00:00:00-05:00")
+
+
+def test_rango_que_cruza_medianoche():
+    ini, fin, _ = interpretar_ventana("hoy entre 10pm y 2am", MIERCOLES)
+    assert (ini, fin) == ("2026-01-07T22:00:00-05:00", "2026-01-08T02:00:00-05:00")
+
+
+def test_12am_en_rango_de_la_manana_es_mediodia():
+    ini, fin, _ = interpretar_ventana("hoy entre 11:15am y 12am", MIERCOLES)
+    assert (ini, fin) == ("2026-01-07T11:15:00-05:00", "2026-01-07T12:00:00-05:00")
+
+
+def test_hasta_las_12am_cierra_el_dia():
+    ini, fin, _ = interpretar_ventana("mañana hasta las 12am", MIERCOLES)
+    assert (ini, fin) == ("2026-01-08T00:00:00-05:00", "2026-01-09T00:00:00-05:00")
+
+
+def test_am_pm_heredado_no_invierte_el_rango():
+    ini, fin, _ = interpretar_ventana("hoy entre 10 y 12 pm", MIERCOLES)
+    assert (ini, fin) == ("2026-01-07T10:00:00-05:00", "2026-01-07T12:00:00-05:00")
+    ini, fin, _ = interpretar_ventana("mañana entre 2 y 4 pm", MIERCOLES)
+    assert (ini, fin) == ("2026-01-08T14:00:00-05:00", "2026-01-08T16:00:00-05:00")
+
+
+def test_dia_de_hoy_ya_pasado_es_la_semana_siguiente():
+    ini, fin, _ = interpretar_ventana("el domingo a las 9am", DOMINGO_TARDE)
+    assert (ini, fin) == ("2026-01-18T09:00:00-05:00", "2026-01-18T10:30:00-05:00")
+    ini, fin, _ = interpretar_ventana("el domingo a las 8 pm", DOMINGO_TARDE)
+    assert (ini, fin) == ("2026-01-11T20:00:00-05:00", "2026-01-11T21:30:00-05:00")
+
+
+def test_ventana_invertida_se_descarta():
+    assert interpretar_ventana("mañana después de las 11:59 pm", MIERCOLES) == (None, None, "mañana después de las 11:59 pm")
+
+
+def test_hora_lejos_del_dia():
+    ini, fin, expresion = interpretar_ventana("pedido para el domingo.\n30 panes, entregar a las 3 pm.", MIERCOLES)
+    assert (ini, fin) == ("2026-01-11T15:00:00-05:00", "2026-01-11T16:30:00-05:00")
+    assert expresion == "el domingo a las 3 pm."
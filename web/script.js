@@ -283,6 +283,73 @@ function renderVistaLimpia(data) {
   });
 })();
 
+// ====== Llamadas al backend ======
+async function interpretarNormal(body) {
+  const resp = await fetch(`${API_BASE}/interpretar`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(body),
+  });
+  if (!resp.ok) {
+    const t = await resp.text();
+    throw new Error(`HTTP ${resp.status}: ${t}`);
+  }
+  return resp.json();
+}
+
+// Lee el stream SSE de /interpretar/stream: llama onParcial por cada bloque y retorna el evento final
+async function interpretarStream(body, onParcial) {
+  const resp = await fetch(`${API_BASE}/interpretar/stream`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json", Accept: "text/event-stream" },
+    body: JSON.stringify(body),
+  });
+  if (!resp.ok) {
+    const t = await resp.text();
+    throw new Error(`HTTP ${resp.status}: ${t}`);
+  }
+
+  const reader = resp.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let corte;
+    while ((corte = buffer.indexOf("\n\n")) >= 0) {
+      const bloque = buffer.slice(0, corte);
+      buffer = buffer.slice(corte + 2);
+      let evento = "message";
+      let datos = "";
+      for (const linea of bloque.split("\n")) {
+        if (linea.startsWith("event:")) evento = linea.slice(6).trim();
+        else if (linea.startsWith("data:")) datos += linea.slice(5).trim();
+      }
+      if (!datos) continue;
+      const payload = JSON.parse(datos);
+      if (evento === "parcial") onParcial(payload);
+      else if (evento === "final") return payload;
+      else if (evento === "error")
+        throw new Error(`HTTP ${payload.status}: ${JSON.stringify(payload.detalle)}`);
+    }
+  }
+  throw new Error("El stream terminó sin respuesta final");
+}
+
+// Acumula los bloques parciales en la forma de la respuesta final y re-renderiza la vista limpia
+let parcial = null;
+function renderParcial(evento) {
+  if (!parcial) parcial = { interpretacion_IA: { detalles: { items: [] } } };
+  const d = parcial.interpretacion_IA.detalles;
+  if (evento.campo === "items") d.items[evento.indice ?? d.items.length] = evento.valor;
+  else d[evento.campo] = evento.valor;
+  $salida.textContent = pretty(parcial);
+  renderVistaLimpia(parcial);
+  setStatus("Recibiendo…");
+}
+
 // ====== Enviar ======
 $btnEnviar.onclick = async () => {
   const texto = ($texto.value || "").trim();
@@ -296,22 +363,19 @@ $btnEnviar.onclick = async () => {
   }
 
   setLoading(true);
+  parcial = null;
   setStatus("Procesando…");
   $salida.textContent = "Procesando…";
   $vista.innerHTML = '<span class="muted">Procesando…</span>';
 
   try {
-    const resp = await fetch(`${API_BASE}/interpretar`, {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ texto_libre: texto, canal, usar_modelo }),
-    });
-    if (!resp.ok) {
-      const t = await resp.text();
-      throw new Error(`HTTP ${resp.status}: ${t}`);
-    }
+    const body = { texto_libre: texto, canal, usar_modelo };
+    // Con IA usamos el endpoint SSE para ir mostrando cliente/items mientras responde el modelo
+    const data =
+      usar_modelo && window.ReadableStream && window.TextDecoder
+        ? await interpretarStream(body, renderParcial)
+        : await interpretarNormal(body);
 
-    const data = await resp.json();
     $salida.textContent = pretty(data);
     renderVistaLimpia(data);
     setStatus("Listo", "ok");